@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指標權重回測
+以封存的歷史快照（scraper.snapshot_archive）重播指標計算，比較多組綜合權重與關鍵字權重，輸出排名表
+
+用法：
+    python -m analyzer.backtest --events events.json --days 365
+    python -m analyzer.backtest --step 0.05 --keyword-scales 0.5,1,2 --workers 4 --output results.csv
+事件檔為 JSON 列表，例如 [{"date": "2024-05-23", "label": "聯合利劍-2024A"}]；
+提供事件時依事件前 --lead-days 天內的區辨力（AUC）排名，否則依訊號雜訊比排名。
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from analyzer import batch_indicators
+from analyzer.indicator_calculator import MILITARY_GROUPS, NEWS_GROUPS, WEIGHTS
+from analyzer.keyword_matcher import KEYWORD_GROUPS
+
+COMPONENTS = ('military', 'economic', 'news', 'stock')
+SCORE_NAMES = ('military_threat', 'economic_pressure', 'news_alert', 'stock_impact')
+# 每個工作單位包含的權重組合數
+CHUNK_SIZE = 256
+
+_context = {}
+
+def weight_grid(step=0.05):
+    """總和為 1 的四項權重組合（每項為 step 的倍數）"""
+    units = int(round(1 / step))
+    grid = []
+    for military, economic, news in itertools.product(range(units + 1), repeat=3):
+        stock = units - military - economic - news
+        if stock >= 0:
+            grid.append((military / units, economic / units, news / units, stock / units))
+    return grid
+
+def keyword_grid(scales):
+    """軍事與新聞關鍵字權重各自乘上 scales 中的倍數，回傳 [(軍事倍數, 新聞倍數, 群組權重)]"""
+    configs = []
+    for military_scale, news_scale in itertools.product(scales, repeat=2):
+        keyword_weights = {group: KEYWORD_GROUPS[group][1] * military_scale for group in MILITARY_GROUPS}
+        keyword_weights.update({group: KEYWORD_GROUPS[group][1] * news_scale for group in NEWS_GROUPS})
+        configs.append((military_scale, news_scale, keyword_weights))
+    return configs
+
+def day_starts(timestamps):
+    """依本地日期分組（時間需遞增），回傳 (每天第一筆的索引, 日期列表)"""
+    days = [datetime.fromtimestamp(ts).date() for ts in timestamps]
+    starts = [i for i in range(len(days)) if i == 0 or days[i] != days[i - 1]]
+    return np.asarray(starts), [days[i] for i in starts]
+
+def event_labels(days, events, lead_days):
+    """某天之後 lead_days 天內（含當天）有事件時標為 1"""
+    event_days = set()
+    for event in events:
+        event_days.add(date.fromisoformat(event['date'] if isinstance(event, dict) else event))
+    labels = np.zeros(len(days), dtype=bool)
+    for i, day in enumerate(days):
+        labels[i] = any(day + timedelta(days=offset) in event_days for offset in range(lead_days + 1))
+    return labels
+
+def init_worker(features, starts, labels):
+    """工作行程初始化：特徵只傳送一次"""
+    _context['features'] = features
+    _context['starts'] = starts
+    _context['counts'] = np.diff(np.append(starts, features['count']))
+    _context['labels'] = labels
+
+def auc(values, labels):
+    """每一列的 AUC（正例高於負例的機率，同分計一半）"""
+    positive = values[:, labels]
+    negative = values[:, ~labels]
+    greater = (positive[:, :, None] > negative[:, None, :]).mean(axis=(1, 2))
+    equal = (positive[:, :, None] == negative[:, None, :]).mean(axis=(1, 2))
+    return greater + equal / 2
+
+def run_task(task):
+    """計算一組關鍵字權重搭配多組綜合權重的指標，回傳結果列"""
+    military_scale, news_scale, keyword_weights, weights = task
+    features = _context['features']
+    scores = batch_indicators.score_features(features, keyword_weights=keyword_weights)
+    components = np.vstack([scores[name] for name in SCORE_NAMES])
+    matrix = np.asarray(weights)
+    overall = matrix @ components
+    overall[:, features['invalid']] = batch_indicators.ERROR_SCORES['overall_threat_probability']
+
+    daily = np.add.reduceat(overall, _context['starts'], axis=1) / _context['counts']
+    std = daily.std(axis=1)
+    noise = np.abs(np.diff(daily, axis=1)).mean(axis=1) if daily.shape[1] > 1 else np.zeros(len(matrix))
+    snr = np.divide(std, noise, out=np.zeros_like(std), where=noise > 0)
+
+    labels = _context['labels']
+    has_events = labels is not None and labels.any() and not labels.all()
+    if has_events:
+        area = auc(daily, labels)
+        pooled = np.sqrt((daily[:, labels].var(axis=1) + daily[:, ~labels].var(axis=1)) / 2)
+        lift = np.divide(daily[:, labels].mean(axis=1) - daily[:, ~labels].mean(axis=1), pooled,
+                         out=np.zeros_like(pooled), where=pooled > 0)
+
+    results = []
+    for i, (military, economic, news, stock) in enumerate(weights):
+        results.append({
+            'military': military,
+            'economic': economic,
+            'news': news,
+            'stock': stock,
+            'military_keywords': military_scale,
+            'news_keywords': news_scale,
+            'auc': float(area[i]) if has_events else None,
+            'lift': float(lift[i]) if has_events else None,
+            'snr': float(snr[i]),
+            'mean': float(daily[i].mean()),
+            'std': float(std[i])
+        })
+    return results
+
+def build_tasks(weights, keyword_configs, chunk_size=CHUNK_SIZE):
+    tasks = []
+    for military_scale, news_scale, keyword_weights in keyword_configs:
+        for start in range(0, len(weights), chunk_size):
+            tasks.append((military_scale, news_scale, keyword_weights, weights[start:start + chunk_size]))
+    return tasks
+
+def run_backtest(timestamps, snapshots, weights, keyword_configs, events=None, lead_days=7, workers=None):
+    """以批次指標計算重播快照，回傳依表現排序的結果列"""
+    features = batch_indicators.build_features(snapshots)
+    starts, days = day_starts(timestamps)
+    labels = event_labels(days, events, lead_days) if events else None
+    tasks = build_tasks(weights, keyword_configs)
+
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    results = []
+    if workers <= 1 or len(tasks) <= 1:
+        init_worker(features, starts, labels)
+        for task in tasks:
+            results.extend(run_task(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(features, starts, labels)) as pool:
+            for rows in pool.map(run_task, tasks):
+                results.extend(rows)
+
+    if results and results[0]['auc'] is not None:
+        results.sort(key=lambda row: (row['auc'], row['lift']), reverse=True)
+    else:
+        results.sort(key=lambda row: row['snr'], reverse=True)
+    for rank, row in enumerate(results, 1):
+        row['rank'] = rank
+    return results
+
+def is_current(row):
+    """是否為目前使用的權重設定"""
+    return (row['military_keywords'] == 1 and row['news_keywords'] == 1 and
+            all(abs(row[name] - WEIGHTS[name]) < 1e-9 for name in COMPONENTS))
+
+def print_table(results, limit=20):
+    print(f"{'排名':>6}{'軍事':>7}{'經濟':>7}{'新聞':>7}{'股市':>7}{'軍關鍵字':>9}{'新關鍵字':>9}"
+          f"{'AUC':>8}{'區辨':>8}{'訊雜比':>8}{'平均':>8}")
+    current = [row for row in results if is_current(row)]
+    shown = results[:limit] + [row for row in current if row['rank'] > limit]
+    for row in shown:
+        marker = ' *' if is_current(row) else ''
+        auc_text = f"{row['auc']:.3f}" if row['auc'] is not None else '-'
+        lift_text = f"{row['lift']:.2f}" if row['lift'] is not None else '-'
+        print(f"{row['rank']:>6}{row['military']:>7.2f}{row['economic']:>7.2f}{row['news']:>7.2f}{row['stock']:>7.2f}"
+              f"{row['military_keywords']:>9.2f}{row['news_keywords']:>9.2f}{auc_text:>8}{lift_text:>8}"
+              f"{row['snr']:>8.2f}{row['mean']:>8.1f}{marker}")
+    if current:
+        print("* 目前使用的權重")
+
+def write_results(results, path):
+    """依副檔名輸出 CSV 或 JSON"""
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+def load_archive(days, path=None):
+    """讀取近 days 天的封存快照，回傳 (時間列表, 快照列表)"""
+    from scraper import snapshot_archive
+    archive = snapshot_archive.SnapshotArchive(path) if path else snapshot_archive.get_snapshot_archive()
+    timestamps = []
+    snapshots = []
+    for ts, snapshot in archive.iter_snapshots(since=time.time() - days * 86400):
+        timestamps.append(ts)
+        snapshots.append(snapshot)
+    return timestamps, snapshots
+
+def main():
+    parser = argparse.ArgumentParser(description='指標權重回測')
+    parser.add_argument('--archive', help='快照封存資料庫（預設為資料目錄下的 snapshot_archive.db）')
+    parser.add_argument('--days', type=float, default=365, help='回測的天數')
+    parser.add_argument('--events', help='事件日期 JSON 檔')
+    parser.add_argument('--lead-days', type=int, default=7, help='事件前幾天內視為應示警')
+    parser.add_argument('--step', type=float, default=0.05, help='綜合權重的間隔')
+    parser.add_argument('--keyword-scales', default='0.5,1,2', help='關鍵字權重的倍數（逗號分隔）')
+    parser.add_argument('--workers', type=int, default=None, help='工作行程數（預設為 CPU 核心數）')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help='輸出完整結果（.csv 或 .json）')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    timestamps, snapshots = load_archive(args.days, args.archive)
+    if not snapshots:
+        print("封存中沒有快照，請先以 python -m scraper.scheduler 收集")
+        sys.exit(1)
+    events = None
+    if args.events:
+        with open(args.events, 'r', encoding='utf-8') as f:
+            events = json.load(f)
+
+    weights = weight_grid(args.step)
+    keyword_configs = keyword_grid([float(scale) for scale in args.keyword_scales.split(',')])
+    print(f"快照 {len(snapshots)} 筆，權重組合 {len(weights) * len(keyword_configs)} 組，"
+          f"載入 {time.perf_counter() - started:.1f} s")
+
+    results = run_backtest(timestamps, snapshots, weights, keyword_configs, events, args.lead_days, args.workers)
+    print(f"完成，總耗時 {time.perf_counter() - started:.1f} s")
+    print_table(results, args.top)
+    if args.output:
+        write_results(results, args.output)
+        print(f"完整結果已寫入 {args.output}")
+
+if __name__ == '__main__':
+    main()
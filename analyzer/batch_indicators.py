@@ -0,0 +1,250 @@
+from datetime import datetime
+
+import numpy as np
+
+from analyzer.indicator_calculator import (MILITARY_GROUPS, NEWS_GROUPS, PROBABILITY_FACTOR, WEIGHTS,
+                                           calculate_economic_pressure, calculate_military_threat,
+                                           calculate_news_alert, calculate_threat_indicators)
+from analyzer.keyword_matcher import MATCHER, item_text
+
+SOURCES = ('military', 'economic', 'news', 'stock')
+COMMODITIES = ('ZS=F', 'ZW=F', 'ZC=F')
+
+# calculate_threat_indicators 發生錯誤時回傳的預設值
+ERROR_SCORES = {
+    'military_threat': 30.0,
+    'economic_pressure': 25.0,
+    'news_alert': 20.0,
+    'stock_impact': 10.0,
+    'overall_threat_probability': 25.0,
+    'month1': 20.0,
+    'month2': 25.0,
+    'month3': 28.0
+}
+
+class KeywordHits:
+    """文件 × 關鍵字的命中矩陣
+
+    相同的文字只掃描一次；每一列是一篇文件命中的不重複（關鍵字, 群組），
+    文件分數即矩陣乘上群組權重，調整權重時不需重新掃描。
+    """
+
+    def __init__(self):
+        self.columns = sorted((keyword, group) for keyword, groups in MATCHER.entries.items() for group, _ in groups)
+        self.column_index = {column: i for i, column in enumerate(self.columns)}
+        self.text_index = {}
+        self.rows = []
+        self.cols = []
+        # 每篇文件對應的不重複文字與所屬快照
+        self.doc_text = []
+        self.doc_owner = []
+        self.cached_matrix = None
+
+    def add(self, text, owner):
+        """加入一篇屬於第 owner 個快照的文件"""
+        index = self.text_index.get(text)
+        if index is None:
+            index = len(self.text_index)
+            self.text_index[text] = index
+            self.cached_matrix = None
+            for column in {(hit.keyword, hit.group) for hit in MATCHER.find_all(text)}:
+                self.rows.append(index)
+                self.cols.append(self.column_index[column])
+        self.doc_text.append(index)
+        self.doc_owner.append(owner)
+
+    def matrix(self):
+        """不重複文字 × 關鍵字的 0/1 矩陣"""
+        if self.cached_matrix is None:
+            matrix = np.zeros((len(self.text_index), len(self.columns)), dtype=np.float64)
+            if self.rows:
+                matrix[self.rows, self.cols] = 1.0
+            self.cached_matrix = matrix
+        return self.cached_matrix
+
+    def __getstate__(self):
+        # 傳給回測工作行程時只需要矩陣與文件對應，不傳送文字本身（複本不能再加入文件）
+        state = dict(self.__dict__)
+        state['cached_matrix'] = self.matrix()
+        state['text_index'] = None
+        state['rows'] = state['cols'] = None
+        state['doc_text'] = np.asarray(self.doc_text, dtype=np.int64)
+        state['doc_owner'] = np.asarray(self.doc_owner, dtype=np.int64)
+        return state
+
+    def column_weights(self, groups, keyword_weights=None):
+        """各欄的權重（不在 groups 中的群組為 0）"""
+        weights = np.zeros(len(self.columns), dtype=np.float64)
+        for i, (keyword, group) in enumerate(self.columns):
+            if group in groups:
+                if keyword_weights and group in keyword_weights:
+                    weights[i] = keyword_weights[group]
+                else:
+                    weights[i] = dict(MATCHER.entries[keyword])[group]
+        return weights
+
+    def snapshot_scores(self, count, groups, keyword_weights=None):
+        """每個快照的關鍵字分數總和"""
+        if not len(self.doc_text):
+            return np.zeros(count, dtype=np.float64)
+        text_scores = self.matrix() @ self.column_weights(groups, keyword_weights)
+        return np.bincount(np.asarray(self.doc_owner), weights=text_scores[np.asarray(self.doc_text)],
+                           minlength=count)
+
+def build_features(snapshots):
+    """將多個 collect_all_data_sync 格式的快照整理成陣列特徵（只掃描一次文字）
+
+    回傳的特徵可以用不同權重多次傳給 score_features。
+    """
+    count = len(snapshots)
+    features = {
+        'count': count,
+        'invalid': np.zeros(count, dtype=bool),
+        'military_ok': np.zeros(count, dtype=bool),
+        'military_items': np.zeros(count, dtype=np.float64),
+        'news_ok': np.zeros(count, dtype=bool),
+        'news_articles': np.zeros(count, dtype=np.float64),
+        'economic_ok': np.zeros(count, dtype=bool),
+        'economic_gold': np.zeros(count, dtype=bool),
+        'economic_commodities': np.zeros(count, dtype=np.float64),
+        'stock_ok': np.zeros(count, dtype=bool),
+        # 單筆計算會發生例外的項目，直接使用單筆函式的結果
+        'military_override': np.full(count, np.nan),
+        'news_override': np.full(count, np.nan),
+        'economic_override': np.full(count, np.nan),
+        'military_hits': KeywordHits(),
+        'news_hits': KeywordHits()
+    }
+
+    for i, snapshot in enumerate(snapshots):
+        # 快照或來源不是 dict 時，單筆計算整體回傳錯誤預設值
+        if not isinstance(snapshot, dict) or any(
+                source in snapshot and not isinstance(snapshot[source], dict) for source in SOURCES):
+            features['invalid'][i] = True
+            continue
+
+        military = snapshot.get('military', {})
+        if military.get('status') == 'success':
+            try:
+                data = military.get('data', [])
+                texts = [item_text(item) for item in data]
+                features['military_items'][i] = len(data)
+            except Exception:
+                features['military_override'][i] = calculate_military_threat(military)
+            else:
+                features['military_ok'][i] = True
+                for text in texts:
+                    features['military_hits'].add(text, i)
+
+        news = snapshot.get('news', {})
+        if news.get('status') == 'success':
+            try:
+                articles = news.get('data', [])
+                texts = [article.get('title', '') + ' ' + (article.get('description') or '') for article in articles]
+                features['news_articles'][i] = len(articles)
+            except Exception:
+                features['news_override'][i] = calculate_news_alert(news)
+            else:
+                features['news_ok'][i] = True
+                for text in texts:
+                    features['news_hits'].add(text, i)
+
+        economic = snapshot.get('economic', {})
+        if economic.get('status') == 'success':
+            try:
+                data = economic.get('data', {})
+                features['economic_gold'][i] = 'gold' in data or 'GC=F' in data
+                features['economic_commodities'][i] = sum(1 for commodity in COMMODITIES if commodity in data)
+            except Exception:
+                features['economic_override'][i] = calculate_economic_pressure(economic)
+            else:
+                features['economic_ok'][i] = True
+
+        features['stock_ok'][i] = snapshot.get('stock', {}).get('status') == 'success'
+
+    return features
+
+def score_features(features, weights=None, keyword_weights=None):
+    """以陣列運算計算各項指標與綜合機率，結果與 calculate_threat_indicators 相同（未四捨五入）
+
+    weights 為綜合機率的權重（預設 WEIGHTS），keyword_weights 可覆寫關鍵字群組的權重 {群組: 權重}。
+    """
+    weights = weights or WEIGHTS
+    count = features['count']
+
+    military_keywords = features['military_hits'].snapshot_scores(count, MILITARY_GROUPS, keyword_weights)
+    military = np.where(features['military_items'] > 0, np.minimum(military_keywords, 70) + 10, 25)
+    military = np.clip(np.where(features['military_ok'], military, 30), 0, 100)
+    military = np.where(np.isnan(features['military_override']), military, features['military_override'])
+
+    economic = 20 + np.where(features['economic_gold'], 15, 0) + features['economic_commodities'] * 8
+    economic = np.clip(np.where(features['economic_ok'], economic, 25), 0, 100)
+    economic = np.where(np.isnan(features['economic_override']), economic, features['economic_override'])
+
+    news_keywords = features['news_hits'].snapshot_scores(count, NEWS_GROUPS, keyword_weights)
+    articles = features['news_articles']
+    news = np.minimum(news_keywords, 80) + np.where(articles > 10, 10, np.where(articles > 5, 5, 0))
+    news = np.clip(np.where(features['news_ok'], news, 20), 0, 100)
+    news = np.where(np.isnan(features['news_override']), news, features['news_override'])
+
+    stock = np.where(features['stock_ok'], 15.0, 0.0)
+
+    # 與單筆計算相同的運算順序，浮點結果才會完全一致
+    overall = (
+        military * weights['military'] +
+        economic * weights['economic'] +
+        news * weights['news'] +
+        stock * weights['stock']
+    )
+    # 批次計算沒有逐筆的歷史趨勢，與單筆計算相同假設維持目前水準
+    base_probability = np.clip(overall, 0, 100) * PROBABILITY_FACTOR
+    scores = {
+        'military_threat': military,
+        'economic_pressure': economic,
+        'news_alert': news,
+        'stock_impact': stock,
+        'overall_threat_probability': overall,
+        'month1': base_probability,
+        'month2': base_probability,
+        'month3': base_probability
+    }
+    invalid = features['invalid']
+    if invalid.any():
+        for name, default in ERROR_SCORES.items():
+            scores[name] = np.where(invalid, default, scores[name])
+    return scores
+
+def score_batch(snapshots, weights=None, keyword_weights=None):
+    """批次計算多個快照的指標，回傳 {指標: 陣列}"""
+    return score_features(build_features(snapshots), weights, keyword_weights)
+
+def calculate_threat_indicators_batch(snapshots, weights=None):
+    """批次版的 calculate_threat_indicators，回傳與單筆計算相同格式的 dict 列表"""
+    snapshots = list(snapshots)
+    features = build_features(snapshots)
+    scores = score_features(features, weights)
+    calculation_time = datetime.now().isoformat()
+    results = []
+    for i, snapshot in enumerate(snapshots):
+        if features['invalid'][i]:
+            # 格式錯誤的快照由單筆計算產生相同的錯誤結果
+            results.append(calculate_threat_indicators(snapshot, weights))
+            continue
+        results.append({
+            # 各項指標在單筆計算中都是整數
+            'military_threat': round(int(scores['military_threat'][i]), 1),
+            'economic_pressure': round(int(scores['economic_pressure'][i]), 1),
+            'news_alert': round(int(scores['news_alert'][i]), 1),
+            'stock_impact': round(int(scores['stock_impact'][i]), 1),
+            'overall_threat_probability': round(float(scores['overall_threat_probability'][i]), 1),
+            'three_month_probabilities': {
+                'month1': round(float(scores['month1'][i]), 1),
+                'month2': round(float(scores['month2'][i]), 1),
+                'month3': round(float(scores['month3'][i]), 1)
+            },
+            'calculation_time': calculation_time,
+            'data_sources': {
+                f'{source}_status': snapshot.get(source, {}).get('status', 'unknown') for source in SOURCES
+            }
+        })
+    return results
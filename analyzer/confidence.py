@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+
+SOURCES = ('military', 'economic', 'news', 'stock')
+
+SAMPLES = int(os.environ.get('CONFIDENCE_SAMPLES', '100000'))
+LEVEL = float(os.environ.get('CONFIDENCE_LEVEL', '0.9'))
+SEED = int(os.environ.get('CONFIDENCE_SEED', '0'))
+
+# 各項指標的計算公式可能產生的範圍：軍事 25 或 10–80、經濟 20–59、新聞 0–90、股市 0 或 15
+SCORE_RANGES = {
+    'military': (10.0, 80.0),
+    'economic': (20.0, 59.0),
+    'news': (0.0, 90.0),
+    'stock': (0.0, 15.0)
+}
+# 即時資料的評分誤差（標準差）：關鍵字計分的指標誤差較大
+LIVE_SPREAD = {
+    'military': 8.0,
+    'economic': 4.0,
+    'news': 8.0,
+    'stock': 2.0
+}
+# 權重的相對誤差：log 權重加上此標準差的常態誤差後重新正規化（logistic-normal）
+WEIGHT_SPREAD = 0.15
+
+def sample_scores(rng, scores, statuses, samples):
+    """抽樣各項指標，回傳 (4 × samples) 的 float32 陣列
+
+    所有分布都以回報的分數為中心且左右對稱，抽樣的中位數與回報的分數相同：
+    即時資料（status 為 success）為常態分布，在 0–100 內對稱截尾；
+    使用預設值的來源沒有實際資訊，為以預設值為中心、在公式範圍內盡量寬的對稱三角分布。
+    分數位於範圍邊界時（例如股市的預設值 0）無法對稱，視為沒有誤差。
+    """
+    sampled = np.empty((len(SOURCES), samples), dtype=np.float32)
+    for i, source in enumerate(SOURCES):
+        score = float(scores[source])
+        column = sampled[i]
+        live = statuses.get(source) == 'success'
+        low, high = (0.0, 100.0) if live else SCORE_RANGES[source]
+        half_width = max(min(score - low, high - score), 0.0)
+        if live:
+            rng.standard_normal(samples, dtype=np.float32, out=column)
+            column *= LIVE_SPREAD[source]
+            np.clip(column, -half_width, half_width, out=column)
+        else:
+            # 兩個均勻分布相加為 [-1, 1] 的對稱三角分布
+            rng.random(samples, dtype=np.float32, out=column)
+            column += rng.random(samples, dtype=np.float32)
+            column -= 1
+            column *= half_width
+        column += score
+    return sampled
+
+def sample_weights(rng, weights, samples):
+    """抽樣權重（每組總和為 1，平均約為設定的權重），回傳 (4 × samples) 的 float32 陣列
+
+    設定的權重全為 0 時綜合機率恆為 0，抽樣的權重也全為 0。
+    """
+    base = np.array([[weights[source]] for source in SOURCES], dtype=np.float32)
+    sampled = rng.standard_normal((len(SOURCES), samples), dtype=np.float32)
+    sampled *= WEIGHT_SPREAD
+    np.exp(sampled, out=sampled)
+    # 權重為 0 的項目維持為 0
+    sampled *= base
+    total = sampled.sum(axis=0)
+    return np.divide(sampled, total, out=np.zeros_like(sampled), where=total > 0)
+
+def confidence_intervals(scores, statuses, weights, samples=SAMPLES, level=LEVEL, seed=SEED):
+    """以蒙地卡羅抽樣估計綜合威脅機率的信賴區間
+
+    scores 與 statuses 為 {來源: 分數 / 狀態}；回傳區間上下限、平均、中位數、標準差與使用預設值的來源。
+    各項分數以回報值為中心對稱抽樣，區間的中位數與綜合威脅機率一致（權重抽樣只造成微小偏差）。
+    """
+    rng = np.random.default_rng(seed)
+    overall = np.einsum('ij,ij->j', sample_scores(rng, scores, statuses, samples),
+                        sample_weights(rng, weights, samples))
+    tail = (1 - level) / 2
+    low, median, high = np.quantile(overall, [tail, 0.5, 1 - tail])
+    mean = float(overall.mean(dtype=np.float64))
+    variance = float(np.square(overall, dtype=np.float64).mean()) - mean * mean
+    return {
+        'low': round(float(low), 1),
+        'high': round(float(high), 1),
+        'mean': round(mean, 1),
+        'median': round(float(median), 1),
+        'std': round(max(variance, 0.0) ** 0.5, 2),
+        'level': level,
+        'samples': samples,
+        'fallback_sources': [source for source in SOURCES if statuses.get(source) != 'success']
+    }
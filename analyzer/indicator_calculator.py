@@ -3,6 +3,24 @@ import math
 from datetime import datetime, timedelta
 import re
 
+from analyzer.keyword_matcher import MATCHER, item_text
+
+MILITARY_GROUPS = ('military_threat', 'military_high_threat')
+NEWS_GROUPS = ('news_alert', 'news_high_alert')
+
+# 攻台機率與綜合威脅的比例，以及三個月推估的天數與趨勢每日衰減係數
+PROBABILITY_FACTOR = 0.6
+MONTH_HORIZONS = (30, 60, 90)
+TREND_DAMPING = 0.97
+
+# 綜合威脅機率的權重（analyzer.batch_indicators 共用）
+WEIGHTS = {
+    'military': 0.4,    # 軍事威脅權重40%
+    'economic': 0.25,   # 經濟壓力權重25%
+    'news': 0.25,       # 新聞示警權重25%
+    'stock': 0.1        # 股市影響權重10%
+}
+
 def calculate_military_threat(military_data):
     """計算軍事威脅指標 (0-100)"""
     try:
@@ -12,36 +30,29 @@ def calculate_military_threat(military_data):
         threat_score = 0
         data = military_data.get('data', [])
         
-        # 分析軍事動態關鍵字
-        threat_keywords = ['演習', '軍演', '戰機', '軍艦', '導彈', '飛彈', '巡航', '警戒', '緊急']
-        high_threat_keywords = ['入侵', '突破', '攻擊', '威脅', '挑釁', '對峙']
-        
-        keyword_count = 0
-        high_threat_count = 0
-        
+        # 分析軍事動態關鍵字（每個項目單次掃描，命中的關鍵字依權重計分）
+        keyword_score = 0
         for item in data:
-            content = str(item).lower()
-            for keyword in threat_keywords:
-                if keyword in content:
-                    keyword_count += 1
-            for keyword in high_threat_keywords:
-                if keyword in content:
-                    high_threat_count += 2
-        
-        # 計算基礎威脅分數
-        base_score = min(keyword_count * 5 + high_threat_count * 10, 70)
+            keyword_score += MATCHER.score(item_text(item), MILITARY_GROUPS)
         
-        # 根據資料新鮮度調整
-        if len(data) > 0:
-            threat_score = base_score + 10
-        else:
-            threat_score = 25
-        
-        return min(max(threat_score, 0), 100)
+        return military_threat_score(keyword_score, len(data))
         
     except Exception as e:
         return 35  # 錯誤時返回中等威脅值
 
+def military_threat_score(keyword_score, item_count):
+    """由關鍵字分數與項目數計算軍事威脅指標（indicator_engine 共用）"""
+    # 計算基礎威脅分數
+    base_score = min(keyword_score, 70)
+    
+    # 根據資料新鮮度調整
+    if item_count > 0:
+        threat_score = base_score + 10
+    else:
+        threat_score = 25
+    
+    return min(max(threat_score, 0), 100)
+
 def calculate_economic_pressure(economic_data):
     """計算經濟壓力指標 (0-100)"""
     try:
@@ -81,40 +92,30 @@ def calculate_news_alert(news_data):
         alert_score = 0
         articles = news_data.get('data', [])
         
-        # 分析新聞標題和內容的敏感詞彙
-        alert_keywords = ['緊張', '衝突', '對立', '制裁', '軍事', '戰爭', '危機', '威脅']
-        high_alert_keywords = ['開火', '攻擊', '入侵', '戰爭', '軍事行動', '緊急狀態']
-        
+        # 分析新聞標題和內容的敏感詞彙（每篇單次掃描）
         keyword_score = 0
-        high_alert_score = 0
-        
         for article in articles:
-            title = article.get('title', '').lower()
-            description = article.get('description', '').lower()
-            content = title + ' ' + description
-            
-            for keyword in alert_keywords:
-                if keyword in content:
-                    keyword_score += 3
-            
-            for keyword in high_alert_keywords:
-                if keyword in content:
-                    high_alert_score += 8
-        
-        # 計算總分
-        total_score = min(keyword_score + high_alert_score, 80)
-        
-        # 根據新聞數量調整
-        if len(articles) > 10:
-            total_score += 10
-        elif len(articles) > 5:
-            total_score += 5
+            content = article.get('title', '') + ' ' + (article.get('description') or '')
+            keyword_score += MATCHER.score(content, NEWS_GROUPS)
         
-        return min(max(total_score, 0), 100)
+        return news_alert_score(keyword_score, len(articles))
         
     except Exception as e:
         return 25
 
+def news_alert_score(keyword_score, article_count):
+    """由關鍵字分數與新聞數計算新聞示警指標（indicator_engine 共用）"""
+    # 計算總分
+    total_score = min(keyword_score, 80)
+    
+    # 根據新聞數量調整
+    if article_count > 10:
+        total_score += 10
+    elif article_count > 5:
+        total_score += 5
+    
+    return min(max(total_score, 0), 100)
+
 def calculate_stock_impact(stock_data):
     """計算股市影響指標"""
     try:
@@ -127,8 +128,8 @@ def calculate_stock_impact(stock_data):
     except Exception as e:
         return 0
 
-def calculate_threat_indicators(collected_data):
-    """計算所有威脅指標"""
+def calculate_threat_indicators(collected_data, weights=None, intervals=False):
+    """計算所有威脅指標（weights 可覆寫綜合機率的權重，預設 WEIGHTS；intervals 為 True 時附上信賴區間）"""
     try:
         # 計算各項指標
         military_threat = calculate_military_threat(collected_data.get('military', {}))
@@ -136,48 +137,12 @@ def calculate_threat_indicators(collected_data):
         news_alert = calculate_news_alert(collected_data.get('news', {}))
         stock_impact = calculate_stock_impact(collected_data.get('stock', {}))
         
-        # 計算綜合威脅機率（加權平均）
-        weights = {
-            'military': 0.4,    # 軍事威脅權重40%
-            'economic': 0.25,   # 經濟壓力權重25%
-            'news': 0.25,       # 新聞示警權重25%
-            'stock': 0.1        # 股市影響權重10%
-        }
-        
-        overall_threat = (
-            military_threat * weights['military'] +
-            economic_pressure * weights['economic'] +
-            news_alert * weights['news'] +
-            stock_impact * weights['stock']
-        )
-        
-        # 計算近三個月攻台機率（基於歷史趨勢模擬）
-        base_probability = overall_threat * 0.6  # 基礎機率
-        
-        # 模擬三個月的機率變化
-        month1_prob = max(base_probability - 5, 0)
-        month2_prob = base_probability
-        month3_prob = min(base_probability + 3, 100)
-        
-        return {
-            'military_threat': round(military_threat, 1),
-            'economic_pressure': round(economic_pressure, 1),
-            'news_alert': round(news_alert, 1),
-            'stock_impact': round(stock_impact, 1),
-            'overall_threat_probability': round(overall_threat, 1),
-            'three_month_probabilities': {
-                'month1': round(month1_prob, 1),
-                'month2': round(month2_prob, 1),
-                'month3': round(month3_prob, 1)
-            },
-            'calculation_time': datetime.now().isoformat(),
-            'data_sources': {
-                'military_status': collected_data.get('military', {}).get('status', 'unknown'),
-                'economic_status': collected_data.get('economic', {}).get('status', 'unknown'),
-                'news_status': collected_data.get('news', {}).get('status', 'unknown'),
-                'stock_status': collected_data.get('stock', {}).get('status', 'unknown')
-            }
+        statuses = {
+            source: collected_data.get(source, {}).get('status', 'unknown')
+            for source in ('military', 'economic', 'news', 'stock')
         }
+        return combine_indicators(military_threat, economic_pressure, news_alert, stock_impact, statuses, weights,
+                                  intervals)
         
     except Exception as e:
         # 錯誤時返回預設值
@@ -194,4 +159,63 @@ def calculate_threat_indicators(collected_data):
             },
             'calculation_time': datetime.now().isoformat(),
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+def project_months(level, slope_per_day=0.0):
+    """由綜合威脅水準與每日趨勢斜率推估未來三個月（30/60/90 天）的攻台機率
+
+    趨勢以每日 TREND_DAMPING 衰減，長期推估不會無限外插。
+    """
+    probabilities = []
+    for days in MONTH_HORIZONS:
+        # 衰減趨勢的有效天數：φ + φ² + ... + φ^days
+        effective_days = TREND_DAMPING * (1 - TREND_DAMPING ** days) / (1 - TREND_DAMPING)
+        projected = min(max(level + slope_per_day * effective_days, 0), 100)
+        probabilities.append(projected * PROBABILITY_FACTOR)
+    return probabilities
+
+def combine_indicators(military_threat, economic_pressure, news_alert, stock_impact, statuses, weights=None,
+                       intervals=False):
+    """由各項指標計算綜合威脅機率並組成結果（indicator_engine 共用）
+
+    intervals 為 True 時以蒙地卡羅抽樣加上綜合威脅機率的信賴區間（confidence_interval）。
+    """
+    # 計算綜合威脅機率（加權平均）
+    weights = weights or WEIGHTS
+    
+    overall_threat = (
+        military_threat * weights['military'] +
+        economic_pressure * weights['economic'] +
+        news_alert * weights['news'] +
+        stock_impact * weights['stock']
+    )
+    
+    # 計算近三個月攻台機率：沒有歷史時假設維持目前水準，
+    # 有歷史時由 indicator_history.apply_forecast 以 EWMA 與趨勢斜率取代
+    month1_prob, month2_prob, month3_prob = project_months(overall_threat)
+    
+    result = {
+        'military_threat': round(military_threat, 1),
+        'economic_pressure': round(economic_pressure, 1),
+        'news_alert': round(news_alert, 1),
+        'stock_impact': round(stock_impact, 1),
+        'overall_threat_probability': round(overall_threat, 1),
+        'three_month_probabilities': {
+            'month1': round(month1_prob, 1),
+            'month2': round(month2_prob, 1),
+            'month3': round(month3_prob, 1)
+        },
+        'calculation_time': datetime.now().isoformat(),
+        'data_sources': {f'{source}_status': status for source, status in statuses.items()}
+    }
+    if intervals:
+        # 使用預設值的來源以較寬的分布抽樣，區間反映資料來源的可用程度
+        from analyzer.confidence import confidence_intervals
+        scores = {
+            'military': military_threat,
+            'economic': economic_pressure,
+            'news': news_alert,
+            'stock': stock_impact
+        }
+        result['confidence_interval'] = confidence_intervals(scores, statuses, weights)
+    return result
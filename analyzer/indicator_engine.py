@@ -0,0 +1,221 @@
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+
+from analyzer import indicator_history
+from analyzer.indicator_calculator import (MILITARY_GROUPS, NEWS_GROUPS, calculate_economic_pressure,
+                                           calculate_stock_impact, combine_indicators, military_threat_score,
+                                           news_alert_score)
+from analyzer.keyword_matcher import MATCHER, item_text
+
+# 計入指標的時間窗（小時），與 article_store.load_news_data 的預設相同
+WINDOW_HOURS = float(os.environ.get('INDICATOR_WINDOW_HOURS', '48'))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def military_text(item):
+    """與 calculate_military_threat 相同的比對文字"""
+    return item_text(item)
+
+def news_text(article):
+    """與 calculate_news_alert 相同的比對文字"""
+    return article.get('title', '') + ' ' + (article.get('description') or '')
+
+class SourceTally:
+    """單一來源在時間窗內的累計值：關鍵字分數、項目數、分類與關鍵字統計
+
+    每個項目加入時只掃描一次並記下貢獻，移除時扣回，讀取指標不需重新掃描。
+    """
+
+    def __init__(self, groups, text_func):
+        self.groups = groups
+        self.text_func = text_func
+        # 項目鍵 -> (分數, 分類, 命中的關鍵字, 時間戳記)
+        self.items = {}
+        self.keyword_score = 0
+        self.categories = Counter()
+        self.keywords = Counter()
+        # (時間戳記, 項目鍵)；取代或移除的項目在過期時才清除
+        self.expiry = []
+
+    def add(self, key, item, timestamp, category=None):
+        """加入項目，相同鍵的項目會被取代；回傳該項目的關鍵字分數"""
+        if key in self.items:
+            self.remove(key)
+        hits = {(hit.keyword, hit.group, hit.weight)
+                for hit in MATCHER.find_all(self.text_func(item)) if hit.group in self.groups}
+        score = sum(weight for _, _, weight in hits)
+        keywords = tuple(keyword for keyword, _, _ in hits)
+        self.items[key] = (score, category, keywords, timestamp)
+        self.keyword_score += score
+        self.categories[category] += 1
+        self.keywords.update(keywords)
+        heapq.heappush(self.expiry, (timestamp, key))
+        return score
+
+    def remove(self, key):
+        """移除項目，不存在時回傳 False"""
+        entry = self.items.pop(key, None)
+        if entry is None:
+            return False
+        score, category, keywords, _ = entry
+        self.keyword_score -= score
+        self.categories[category] -= 1
+        if self.categories[category] <= 0:
+            del self.categories[category]
+        self.keywords.subtract(keywords)
+        for keyword in keywords:
+            if self.keywords[keyword] <= 0:
+                del self.keywords[keyword]
+        return True
+
+    def expire_before(self, cutoff):
+        """移除時間戳記早於 cutoff 的項目，回傳移除數量"""
+        removed = 0
+        while self.expiry and self.expiry[0][0] < cutoff:
+            timestamp, key = heapq.heappop(self.expiry)
+            entry = self.items.get(key)
+            # 已被取代（時間戳記不同）或已移除的項目略過
+            if entry is not None and entry[3] == timestamp:
+                self.remove(key)
+                removed += 1
+        return removed
+
+    def status(self):
+        """與 load_news_data 相同：有資料時為 success"""
+        return 'success' if self.items else 'empty'
+
+class IndicatorEngine:
+    """增量計算的威脅指標
+
+    收集器以 add/expire 推送文章與軍事動態，引擎維護各來源的累計值，
+    indicators() 直接由累計值計算，不需重新掃描文章列表。
+    與 calculate_threat_indicators 相同，來源回報的狀態不是 success 時使用預設分數，
+    轉載的同一則新聞（near_duplicate 群組）只計分一次；
+    因此時間窗內的項目與各來源狀態相同時，兩者的結果相同。
+    """
+
+    def __init__(self, window_hours=WINDOW_HOURS):
+        self.window = window_hours * 3600
+        self.lock = threading.Lock()
+        self.tallies = {
+            'military': SourceTally(MILITARY_GROUPS, military_text),
+            'news': SourceTally(NEWS_GROUPS, news_text)
+        }
+        # 經濟與股市資料沒有文章列表，保留最新的一份
+        self.latest = {'economic': {}, 'stock': {}}
+        # 收集器最後回報的狀態；軍事動態沒有回報 success 前使用預設分數，
+        # 新聞在回報前依文章庫載入的文章判斷
+        self.reported = {'military': 'unknown'}
+
+    def add(self, source, item, key=None, timestamp=None, category=None):
+        """加入一個項目（key 預設為網址或標題，timestamp 預設為現在）"""
+        key = key or item.get('url') or item.get('title') or item_text(item)
+        timestamp = timestamp or time.time()
+        with self.lock:
+            return self.tallies[source].add(key, item, timestamp, category or item.get('category'))
+
+    def add_articles(self, articles, source='news'):
+        """加入 article_store 格式的文章（以 published_at 為時間戳記，時間窗外的文章略過）
+
+        同一則新聞的轉載以 near_duplicate 群組為鍵，較新的文章取代較舊的，只計分一次。
+        """
+        from scraper import near_duplicate
+
+        now = time.time()
+        cutoff = now - self.window
+        added = 0
+        for article in sorted(articles, key=lambda article: article.get('published_at') or now):
+            published_at = article.get('published_at') or now
+            if published_at < cutoff:
+                continue
+            key = article.get('canonical_url') or article.get('title_hash')
+            try:
+                cluster, _ = near_duplicate.assign_story(article)
+                if cluster is not None:
+                    key = f"story:{cluster.id}"
+            except Exception as e:
+                print(f"近似重複比對錯誤: {e}")
+            self.add(source, article, key, published_at, article.get('category'))
+            added += 1
+        return added
+
+    def expire(self, source, key):
+        """移除一個項目"""
+        with self.lock:
+            return self.tallies[source].remove(key)
+
+    def expire_old(self, now=None):
+        """移除時間窗外的項目，回傳移除數量"""
+        cutoff = (now or time.time()) - self.window
+        with self.lock:
+            return sum(tally.expire_before(cutoff) for tally in self.tallies.values())
+
+    def update_source(self, source, data):
+        """更新經濟或股市資料"""
+        with self.lock:
+            self.latest[source] = data
+
+    def report_status(self, source, status):
+        """記錄軍事或新聞收集器回報的狀態（不是 success 時該來源使用預設分數）"""
+        with self.lock:
+            self.reported[source] = status or 'unknown'
+
+    def status(self, source):
+        """來源狀態：收集器回報過時使用回報的狀態，否則依時間窗內是否有項目"""
+        reported = self.reported.get(source)
+        return self.tallies[source].status() if reported is None else reported
+
+    def indicators(self, weights=None, now=None, intervals=False):
+        """目前的威脅指標（格式與 calculate_threat_indicators 相同，三個月機率由指標歷史推估）"""
+        self.expire_old(now)
+        with self.lock:
+            military = self.tallies['military']
+            news = self.tallies['news']
+            military_status = self.status('military')
+            news_status = self.status('news')
+            military_threat = (military_threat_score(military.keyword_score, len(military.items))
+                               if military_status == 'success' else 30)
+            news_alert = news_alert_score(news.keyword_score, len(news.items)) if news_status == 'success' else 20
+            statuses = {
+                'military': military_status,
+                'economic': self.latest['economic'].get('status', 'unknown'),
+                'news': news_status,
+                'stock': self.latest['stock'].get('status', 'unknown')
+            }
+            economic_pressure = calculate_economic_pressure(self.latest['economic'])
+            stock_impact = calculate_stock_impact(self.latest['stock'])
+        indicators = combine_indicators(military_threat, economic_pressure, news_alert, stock_impact, statuses, weights,
+                                        intervals)
+        return indicator_history.apply_forecast(indicators)
+
+    def stats(self):
+        """各來源的項目數、關鍵字分數、分類與關鍵字統計"""
+        with self.lock:
+            return {
+                source: {
+                    'items': len(tally.items),
+                    'keyword_score': tally.keyword_score,
+                    'categories': dict(tally.categories),
+                    'top_keywords': tally.keywords.most_common(10)
+                }
+                for source, tally in self.tallies.items()
+            }
+
+def get_engine():
+    """取得行程共用的指標引擎（第一次使用時由文章庫載入時間窗內的文章）"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = IndicatorEngine()
+                try:
+                    from scraper import article_store
+                    engine.add_articles(article_store.get_article_store().query(since=time.time() - engine.window))
+                except Exception as e:
+                    print(f"指標引擎載入文章錯誤: {e}")
+                _engine = engine
+    return _engine
@@ -0,0 +1,345 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from analyzer.indicator_calculator import project_months
+from scraper.data_paths import data_path
+
+# 記錄的指標欄位，每個欄位一個 append-only 檔（float32），時間另存一個 float64 檔
+COLUMNS = ('military_threat', 'economic_pressure', 'news_alert', 'stock_impact', 'overall_threat_probability')
+TS_DTYPE = np.dtype('<f8')
+VALUE_DTYPE = np.dtype('<f4')
+
+DAY = 24 * 3600
+# EWMA 的半衰期與滾動統計（平均、變異數、趨勢斜率）的時間窗
+EWMA_HALF_LIFE = DAY
+ROLLING_WINDOW = 7 * DAY
+# 載入時重播的歷史長度：EWMA 權重在 10 個半衰期後已可忽略
+WARMUP = max(ROLLING_WINDOW, 10 * EWMA_HALF_LIFE)
+# 每加入多少筆就由時間窗內的樣本重新計算累計和，避免長期加減的浮點誤差
+REBASE_EVERY = 1000
+# 推估趨勢所需的最少樣本數
+MIN_TREND_SAMPLES = 4
+
+_history = None
+_history_lock = threading.Lock()
+
+class RollingStats:
+    """所有欄位的 EWMA、滾動平均/變異數與趨勢斜率，每加入一筆以 O(1) 更新
+
+    滾動統計以時間窗內的累計和 n、Σx、Σx²、Σt、Σt²、Σtx 維護，
+    樣本離開時間窗時扣回；趨勢斜率為時間窗內的最小平方法斜率（每日）。
+    """
+
+    def __init__(self, width, half_life=EWMA_HALF_LIFE, window=ROLLING_WINDOW):
+        self.width = width
+        self.tau = half_life / math.log(2)
+        self.window = window
+        self.last_ts = None
+        self.ewma = np.zeros(width)
+        self.ewm_var = np.zeros(width)
+        self.samples = deque()
+        self.added = 0
+        self._rebase()
+
+    def _rebase(self):
+        """以時間窗內的樣本重新計算累計和（時間原點移到第一筆樣本）"""
+        self.origin = self.samples[0][0] if self.samples else (self.last_ts or 0.0)
+        self.n = 0
+        self.sum_t = 0.0
+        self.sum_tt = 0.0
+        self.sum_x = np.zeros(self.width)
+        self.sum_xx = np.zeros(self.width)
+        self.sum_tx = np.zeros(self.width)
+        for ts, values in self.samples:
+            self._accumulate(ts, values, 1)
+
+    def _accumulate(self, ts, values, sign):
+        t = (ts - self.origin) / DAY
+        self.n += sign
+        self.sum_t += sign * t
+        self.sum_tt += sign * t * t
+        self.sum_x += sign * values
+        self.sum_xx += sign * values * values
+        self.sum_tx += sign * t * values
+
+    def ewma_step(self, ts, values):
+        """加入 values 後的 (EWMA, EW 變異數)，不修改狀態"""
+        if self.last_ts is None:
+            return values.copy(), np.zeros(self.width)
+        alpha = 1 - math.exp(-max(ts - self.last_ts, 0) / self.tau)
+        delta = values - self.ewma
+        return self.ewma + alpha * delta, (1 - alpha) * (self.ewm_var + alpha * delta * delta)
+
+    def add(self, ts, values):
+        """加入一筆樣本（時間需遞增）"""
+        values = np.asarray(values, dtype=np.float64)
+        self.ewma, self.ewm_var = self.ewma_step(ts, values)
+        self.last_ts = ts
+        self.samples.append((ts, values))
+        self._accumulate(ts, values, 1)
+        while self.samples and self.samples[0][0] < ts - self.window:
+            old_ts, old_values = self.samples.popleft()
+            self._accumulate(old_ts, old_values, -1)
+        self.added += 1
+        if self.added % REBASE_EVERY == 0:
+            self._rebase()
+
+    def mean(self):
+        return self.sum_x / self.n if self.n else np.full(self.width, np.nan)
+
+    def variance(self):
+        """時間窗內的樣本變異數"""
+        if self.n < 2:
+            return np.full(self.width, np.nan)
+        return np.maximum(self.sum_xx - self.sum_x * self.sum_x / self.n, 0) / (self.n - 1)
+
+    def slope(self):
+        """時間窗內每日的趨勢斜率，樣本不足或時間沒有變化時為 0"""
+        denominator = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if self.n < MIN_TREND_SAMPLES or denominator <= 1e-12:
+            return np.zeros(self.width)
+        return (self.n * self.sum_tx - self.sum_t * self.sum_x) / denominator
+
+class IndicatorHistory:
+    """威脅指標的歷史紀錄（欄式 append-only 檔）與滾動統計
+
+    每次計算的指標附加到各欄位檔；查詢近 N 天時以 memmap 對映時間欄並二分搜尋起點，
+    只讀取範圍內的資料，耗時與歷史長度無關。
+    多個行程（排程與 web worker）共用同一組檔案：附加時持有檔案鎖，
+    讀取前檢查時間欄的大小與修改時間，其他行程附加的樣本會併入滾動統計。
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or data_path('indicator_history')
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.stats = RollingStats(len(COLUMNS))
+        self.count = 0
+        self.tail_ts = None
+        # 上次同步時時間欄的 (大小, 修改時間)
+        self.file_signature = None
+        with self._file_lock():
+            self._load()
+
+    def _path(self, column):
+        return os.path.join(self.directory, f'{column}.bin')
+
+    @contextmanager
+    def _file_lock(self):
+        """跨行程的寫入鎖（沒有 fcntl 的平台只在行程內互斥）"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a+b') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _complete_rows(self):
+        """所有欄位都已寫入的筆數"""
+        return min([self._file_length('ts', TS_DTYPE)] + [self._file_length(column, VALUE_DTYPE) for column in COLUMNS])
+
+    def _signature(self):
+        try:
+            stat = os.stat(self._path('ts'))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _load(self):
+        """修正中斷的寫入（各欄長度不一致時截斷到最短），並以近期歷史重建滾動統計（需持有檔案鎖）"""
+        lengths = [self._file_length('ts', TS_DTYPE)] + [self._file_length(column, VALUE_DTYPE) for column in COLUMNS]
+        count = min(lengths)
+        if max(lengths) != count:
+            for column, dtype in [('ts', TS_DTYPE)] + [(column, VALUE_DTYPE) for column in COLUMNS]:
+                with open(self._path(column), 'a+b') as f:
+                    f.truncate(count * dtype.itemsize)
+        self._set_count(count)
+        self.file_signature = self._signature()
+        if not self.count:
+            return
+        data = self._read_range(self._read_ts()[-1] - WARMUP)
+        for i, ts in enumerate(data['ts']):
+            self.stats.add(float(ts), [data[column][i] for column in COLUMNS])
+
+    def _refresh(self):
+        """讀入其他行程附加的樣本（呼叫端持有 self.lock，未持有檔案鎖）"""
+        if self._signature() == self.file_signature:
+            return
+        if self._rewritten():
+            # 檔案被截斷或重建，需持有檔案鎖才能修復與重新載入
+            with self._file_lock():
+                self._refresh_locked()
+        else:
+            self._refresh_locked()
+
+    def _rewritten(self):
+        """檔案被截斷或重建：筆數變少，或上次同步的最後一筆時間不同"""
+        count = self._complete_rows()
+        if count < self.count:
+            return True
+        return bool(self.count) and float(self._read_ts()[-1]) != self.tail_ts
+
+    def _refresh_locked(self):
+        """同 _refresh，但呼叫端已持有 self.lock 與檔案鎖"""
+        signature = self._signature()
+        if signature == self.file_signature:
+            return
+        if self._rewritten():
+            self.stats = RollingStats(len(COLUMNS))
+            self._load()
+            return
+        count = self._complete_rows()
+        if count > self.count:
+            data = self._read_from(self.count, count)
+            self._set_count(count)
+            for i, ts in enumerate(data['ts']):
+                ts = float(ts)
+                if self.stats.last_ts is None or ts > self.stats.last_ts:
+                    self.stats.add(ts, [data[column][i] for column in COLUMNS])
+        # 其他行程還沒寫完所有欄位時不記錄，下次再同步剩下的部分
+        if count == self._file_length('ts', TS_DTYPE):
+            self.file_signature = signature
+
+    def _set_count(self, count):
+        """更新已同步的筆數與最後一筆的時間"""
+        self.count = count
+        self.tail_ts = float(self._read_ts()[-1]) if count else None
+
+    def _file_length(self, column, dtype):
+        try:
+            return os.path.getsize(self._path(column)) // dtype.itemsize
+        except OSError:
+            return 0
+
+    def _read_ts(self):
+        if not self.count:
+            return np.zeros(0, dtype=TS_DTYPE)
+        return np.memmap(self._path('ts'), dtype=TS_DTYPE, mode='r', shape=(self.count,))
+
+    def _read_range(self, since):
+        start = int(np.searchsorted(self._read_ts(), since, side='left'))
+        return self._read_from(start, self.count)
+
+    def _read_from(self, start, stop):
+        """第 start 到 stop 筆的資料"""
+        if stop <= start:
+            return {'ts': np.zeros(0, dtype=TS_DTYPE), **{column: np.zeros(0) for column in COLUMNS}}
+        ts = np.memmap(self._path('ts'), dtype=TS_DTYPE, mode='r', shape=(stop,))
+        data = {'ts': np.array(ts[start:stop])}
+        for column in COLUMNS:
+            values = np.memmap(self._path(column), dtype=VALUE_DTYPE, mode='r', shape=(stop,))
+            data[column] = np.array(values[start:stop], dtype=np.float64)
+        return data
+
+    def record(self, indicators, ts=None):
+        """附加一組指標；時間早於最後一筆時忽略"""
+        ts = ts or time.time()
+        values = [float(indicators.get(column, 0.0)) for column in COLUMNS]
+        with self.lock, self._file_lock():
+            # 先併入其他行程的樣本，時間才能與最新的一筆比較（已持有檔案鎖）
+            self._refresh_locked()
+            if self.stats.last_ts is not None and ts <= self.stats.last_ts:
+                return False
+            with open(self._path('ts'), 'ab') as f:
+                f.write(np.array([ts], dtype=TS_DTYPE).tobytes())
+            for column, value in zip(COLUMNS, values):
+                with open(self._path(column), 'ab') as f:
+                    f.write(np.array([value], dtype=VALUE_DTYPE).tobytes())
+            self.count += 1
+            self.tail_ts = ts
+            self.stats.add(ts, values)
+        return True
+
+    def query(self, days, now=None):
+        """近 days 天的歷史，回傳 {'ts': 陣列, 欄位: 陣列}"""
+        now = now or time.time()
+        with self.lock:
+            self._refresh()
+            return self._read_range(now - days * DAY)
+
+    def trend(self, indicators=None, ts=None):
+        """綜合威脅的趨勢摘要；提供 indicators 時視為尚未記錄的最新一筆"""
+        index = COLUMNS.index('overall_threat_probability')
+        with self.lock:
+            self._refresh()
+            stats = self.stats
+            ewma, ewm_var = stats.ewma, stats.ewm_var
+            if indicators is not None:
+                values = np.array([float(indicators.get(column, 0.0)) for column in COLUMNS])
+                ewma, ewm_var = stats.ewma_step(ts or time.time(), values)
+            return {
+                'samples': stats.n,
+                'ewma': float(ewma[index]),
+                'ewm_std': float(math.sqrt(ewm_var[index])),
+                'rolling_mean': float(stats.mean()[index]),
+                'rolling_std': float(math.sqrt(stats.variance()[index])),
+                'slope_per_day': float(stats.slope()[index])
+            }
+
+    def summary(self):
+        """所有欄位的 EWMA、滾動平均、標準差與每日斜率"""
+        with self.lock:
+            self._refresh()
+            stats = self.stats
+            mean, variance, slope = stats.mean(), stats.variance(), stats.slope()
+            return {
+                column: {
+                    'ewma': round_or_none(stats.ewma[i], 2),
+                    'rolling_mean': round_or_none(mean[i], 2),
+                    'rolling_std': round_or_none(math.sqrt(variance[i]), 2),
+                    'slope_per_day': round_or_none(slope[i], 3)
+                }
+                for i, column in enumerate(COLUMNS)
+            }
+
+def round_or_none(value, digits):
+    """樣本不足時的 NaN 以 None 表示，以便輸出 JSON"""
+    value = float(value)
+    return None if math.isnan(value) else round(value, digits)
+
+def get_history():
+    """取得行程共用的指標歷史"""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = IndicatorHistory()
+    return _history
+
+def apply_forecast(indicators, record=False):
+    """以歷史的 EWMA 與趨勢斜率推估三個月機率並附上趨勢摘要
+
+    record 為 True 時先把這組指標寫入歷史（每次收集只應記錄一次）。
+    歷史無法使用或指標計算失敗時原樣回傳。
+    """
+    if 'error' in indicators:
+        return indicators
+    try:
+        history = get_history()
+        if record:
+            history.record(indicators)
+            trend = history.trend()
+        else:
+            trend = history.trend(indicators)
+    except (OSError, ValueError) as e:
+        print(f"指標歷史錯誤: {e}")
+        return indicators
+    months = project_months(trend['ewma'], trend['slope_per_day'])
+    result = dict(indicators)
+    result['three_month_probabilities'] = {f'month{i + 1}': round(value, 1) for i, value in enumerate(months)}
+    result['trend'] = {key: value if key == 'samples' else round_or_none(value, 3) for key, value in trend.items()}
+    return result
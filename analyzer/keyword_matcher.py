@@ -0,0 +1,113 @@
+import re
+from collections import namedtuple
+
+# 關鍵字群組：群組名稱 -> (關鍵字列表, 每個命中關鍵字的權重)
+KEYWORD_GROUPS = {
+    # 軍事威脅（calculate_military_threat）
+    'military_threat': (['演習', '軍演', '戰機', '軍艦', '導彈', '飛彈', '巡航', '警戒', '緊急'], 5),
+    'military_high_threat': (['入侵', '突破', '攻擊', '威脅', '挑釁', '對峙'], 20),
+    # 新聞示警（calculate_news_alert）
+    'news_alert': (['緊張', '衝突', '對立', '制裁', '軍事', '戰爭', '危機', '威脅'], 3),
+    'news_high_alert': (['開火', '攻擊', '入侵', '戰爭', '軍事行動', '緊急狀態'], 8),
+    # 爬蟲過濾：與兩岸相關的新聞
+    'cross_strait': (['中國', '兩岸', '台海', '中美'], 1),
+    'mainland': (['大陸'], 1)
+}
+
+Hit = namedtuple('Hit', ['start', 'end', 'keyword', 'group', 'weight'])
+
+class KeywordMatcher:
+    """多關鍵字比對器
+
+    建構時把所有關鍵字整理成字典樹，再編譯成單一正規表示式（共用前綴只比對一次），
+    每份文件只需掃描一次即可取得所有命中的關鍵字、位置、群組與權重。
+    每個分支只消耗關鍵字的首字、其餘部分放在前瞻中，因此重疊的命中也能找到，
+    而且 re 可以用首字字元集快速跳過不相關的文字，耗時與文字長度成正比。
+    """
+
+    def __init__(self, groups):
+        # 關鍵字 -> [(群組, 權重)]，同一關鍵字可屬於多個群組
+        self.entries = {}
+        for group, (keywords, weight) in groups.items():
+            for keyword in keywords:
+                self.entries.setdefault(keyword.lower(), []).append((group, weight))
+
+        # 同一位置可能同時命中多個關鍵字（例如「軍事」與「軍事行動」），
+        # 它們必然是最長命中的前綴，預先列出以便由最長命中展開
+        self.prefixes = {
+            keyword: [other for other in self.entries if keyword.startswith(other)]
+            for keyword in self.entries
+        }
+
+        trie = {}
+        for keyword in self.entries:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True
+        branches = [re.escape(char) + '(?=(' + self._trie_to_regex(child) + '))'
+                    for char, child in sorted(trie.items())]
+        self.pattern = re.compile('|'.join(branches), re.IGNORECASE)
+
+    def _trie_to_regex(self, node):
+        terminal = '' in node
+        branches = [re.escape(char) + self._trie_to_regex(child)
+                    for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # 可選分支為貪婪比對，因此永遠取得最長的命中
+        return '(?:' + body + ')?' if terminal else body
+
+    def _longest_matches(self, text):
+        """逐一產生 (起始位置, 該位置最長的命中關鍵字)"""
+        for match in self.pattern.finditer(text):
+            yield match.start(), (match.group(0) + match.group(match.lastindex)).lower()
+
+    def find_all(self, text):
+        """單次掃描回傳所有命中（含重疊與重複出現）"""
+        hits = []
+        for start, longest in self._longest_matches(text):
+            for keyword in self.prefixes[longest]:
+                end = start + len(keyword)
+                for group, weight in self.entries[keyword]:
+                    hits.append(Hit(start, end, keyword, group, weight))
+        return hits
+
+    def matched_keywords(self, text, groups=None):
+        """回傳 {群組: 命中的不重複關鍵字集合}"""
+        matched = {}
+        for hit in self.find_all(text):
+            if groups is None or hit.group in groups:
+                matched.setdefault(hit.group, set()).add(hit.keyword)
+        return matched
+
+    def score(self, text, groups=None):
+        """每個命中的不重複關鍵字依群組權重加總"""
+        total = 0
+        seen = set()
+        for hit in self.find_all(text):
+            if (groups is None or hit.group in groups) and (hit.keyword, hit.group) not in seen:
+                seen.add((hit.keyword, hit.group))
+                total += hit.weight
+        return total
+
+    def contains_any(self, text, groups=None):
+        """是否命中指定群組的任一關鍵字（命中即停止掃描）"""
+        for _, longest in self._longest_matches(text):
+            for keyword in self.prefixes[longest]:
+                for group, _ in self.entries[keyword]:
+                    if groups is None or group in groups:
+                        return True
+        return False
+
+def item_text(item):
+    """將資料項目（dict/list/字串）的文字值串接起來供比對"""
+    if isinstance(item, dict):
+        return ' '.join(item_text(value) for value in item.values())
+    if isinstance(item, (list, tuple)):
+        return ' '.join(item_text(value) for value in item)
+    return str(item)
+
+# 模組載入時編譯一次，所有模組共用
+MATCHER = KeywordMatcher(KEYWORD_GROUPS)
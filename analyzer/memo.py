@@ -0,0 +1,122 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from analyzer.indicator_calculator import calculate_threat_indicators
+
+# 影響指標計算的來源；timestamp 與 snapshot（資料年齡）每次請求都不同，不計入雜湊
+SOURCES = ('military', 'economic', 'news', 'stock')
+
+MAX_ENTRIES = int(os.environ.get('MEMO_MAX_ENTRIES', '128'))
+TTL = float(os.environ.get('MEMO_TTL', '600'))
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def canonical_hash(value):
+    """與 dict 順序無關的穩定內容雜湊"""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def data_fingerprint(collected_data):
+    """收集資料的識別：來自共用快照時使用版本與更新時間（不需序列化），否則為各來源內容的雜湊
+
+    快照檔重建後版本會從 1 重新開始，加上更新時間才能區分不同世代的同一版本。
+    """
+    snapshot = collected_data.get('snapshot') or {}
+    version = snapshot.get('version')
+    if version:
+        return f"snapshot:{version}:{snapshot.get('updated_at')}"
+    return canonical_hash({source: collected_data.get(source) for source in SOURCES})
+
+class MemoCache:
+    """有上限的 LRU + TTL 記憶快取
+
+    相同的鍵同時只計算一次，其他執行緒等待結果；回傳值為複本，呼叫端可以修改。
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, func):
+        """回傳快取的結果，沒有或已過期時呼叫 func 計算"""
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    value, expires_at = entry
+                    if time.time() < expires_at:
+                        self.entries.move_to_end(key)
+                        self.hits += 1
+                        return copy.deepcopy(value)
+                    del self.entries[key]
+                    self.evictions += 1
+                event = self.pending.get(key)
+                if event is None:
+                    self.misses += 1
+                    event = self.pending[key] = threading.Event()
+                    break
+            # 其他執行緒正在計算相同的鍵
+            event.wait()
+
+        try:
+            value = func()
+            with self.lock:
+                self.entries[key] = (copy.deepcopy(value), time.time() + self.ttl)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+            return value
+        finally:
+            with self.lock:
+                del self.pending[key]
+            event.set()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """命中率與大小統計"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 3) if total else None,
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl
+            }
+
+def get_cache(name):
+    """取得具名的記憶快取（行程共用）"""
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(name, MemoCache())
+    return cache
+
+def cached_threat_indicators(collected_data, intervals=False):
+    """相同的收集資料直接回傳上次計算的威脅指標（intervals 為 True 時含信賴區間）"""
+    key = data_fingerprint(collected_data) + (':intervals' if intervals else '')
+    return get_cache('indicators').get_or_compute(
+        key, lambda: calculate_threat_indicators(collected_data, intervals=intervals)
+    )
+
+def stats():
+    """所有記憶快取的統計"""
+    return {name: cache.stats() for name, cache in list(_caches.items())}
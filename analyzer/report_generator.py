@@ -12,7 +12,7 @@ def generate_ai_report(collected_data, indicators, model_name):
         if not openai.api_key:
             return generate_template_report(indicators)
         
-        # 準備提示詞
+        # 準備提示詞（只是字串格式化，比計算快取鍵還快，不使用記憶快取）
         prompt = create_analysis_prompt(collected_data, indicators)
         
         # 根據模型名稱選擇實際的OpenAI模型
@@ -56,6 +56,9 @@ def map_to_openai_model(model_name):
 
 def create_analysis_prompt(collected_data, indicators):
     """創建分析提示詞"""
+    interval = indicators.get('confidence_interval')
+    interval_text = (f"（{round(interval['level'] * 100)}% 信賴區間 {interval['low']}%–{interval['high']}%）"
+                     if interval else '')
     prompt = f"""
 請基於以下數據進行台海情勢分析：
 
@@ -64,7 +67,7 @@ def create_analysis_prompt(collected_data, indicators):
 - 經濟壓力指數：{indicators['economic_pressure']}%
 - 新聞示警指數：{indicators['news_alert']}%
 - 股市影響指數：{indicators['stock_impact']}%
-- 綜合威脅機率：{indicators['overall_threat_probability']}%
+- 綜合威脅機率：{indicators['overall_threat_probability']}%{interval_text}
 
 近三個月攻台機率預測：
 - 第一個月：{indicators['three_month_probabilities']['month1']}%
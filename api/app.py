@@ -1,12 +1,12 @@
 import os
 import sys
 import asyncio
+import hmac
 import json
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-import requests
 from urllib.parse import urlencode
 import threading
 import time
@@ -14,9 +14,15 @@ import time
 # 添加父目錄到路徑以便導入模組
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from analyzer.indicator_calculator import calculate_threat_indicators
+from analyzer.indicator_engine import get_engine
+from analyzer.indicator_history import apply_forecast
+from analyzer import memo
+from analyzer.memo import cached_threat_indicators
 from analyzer.report_generator import generate_ai_report
 from scraper.data_collector import collect_all_data_sync
+from scraper.scheduler import get_collected_data, run_due_sources
+from scraper import http_client
+from scraper.article_search import search as search_articles
 
 # 設定模板和靜態文件路徑
 template_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
@@ -171,12 +177,12 @@ def google_callback():
     }
     
     try:
-        token_response = requests.post('https://oauth2.googleapis.com/token', data=token_data)
+        token_response = http_client.post('https://oauth2.googleapis.com/token', data=token_data)
         token_json = token_response.json()
         access_token = token_json['access_token']
         
         # 獲取用戶信息
-        user_response = requests.get(
+        user_response = http_client.get(
             'https://www.googleapis.com/oauth2/v2/userinfo',
             headers={'Authorization': f'Bearer {access_token}'}
         )
@@ -237,13 +243,13 @@ def start_analysis():
         
         # 在 Serverless 環境中直接同步執行分析
         try:
-            print("開始收集資料...")
-            # 收集資料
-            data = collect_all_data_sync()
+            print("開始讀取資料快照...")
+            # 讀取背景排程收集的快照（快照不可用時才即時收集）
+            data = get_collected_data()
             print("資料收集完成，開始計算威脅指標...")
             
-            # 計算威脅指標
-            indicators = calculate_threat_indicators(data)
+            # 計算威脅指標（共用快照已附上發布時計算的指標時直接使用）
+            indicators = data.get('snapshot', {}).get('indicators') or apply_forecast(cached_threat_indicators(data, intervals=True))
             print("威脅指標計算完成，開始生成AI報告...")
             
             # 生成AI報告
@@ -286,6 +292,65 @@ def start_analysis():
     except Exception as e:
         return jsonify({'error': f'分析啟動失敗: {str(e)}'}), 500
 
+@app.route('/api/indicators')
+@login_required
+def live_indicators():
+    """由指標引擎的累計值讀取目前指標（不重新掃描文章）"""
+    try:
+        engine = get_engine()
+        result = engine.indicators(intervals=True)
+        result['engine'] = engine.stats()
+        result['memo'] = memo.stats()
+        return jsonify(result)
+    except Exception as e:
+        print(f"指標讀取錯誤: {e}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
+
+@app.route('/api/search')
+@login_required
+def api_search():
+    """全文搜尋已收集的文章標題與描述（BM25 排序），預設只搜尋最近 48 小時"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '請提供搜尋字詞 q'}), 400
+    try:
+        hours = float(request.args.get('hours', 48)) or None
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({'error': 'hours 與 limit 必須是數字'}), 400
+    
+    started = time.perf_counter()
+    try:
+        results = search_articles(query, hours=hours, limit=limit, category=request.args.get('category') or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"文章搜尋錯誤: {e}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
+    return jsonify({
+        'query': query,
+        'count': len(results),
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@app.route('/cron/collect', methods=['GET', 'POST'])
+def cron_collect():
+    """由排程觸發，收集到期的來源並更新快照"""
+    cron_secret = os.environ.get('CRON_SECRET')
+    if not cron_secret:
+        # 未設定密鑰時停用端點，避免任何人觸發強制收集
+        return jsonify({'error': '排程端點未啟用'}), 404
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization.encode('utf-8'), f'Bearer {cron_secret}'.encode('utf-8')):
+        return jsonify({'error': '未授權'}), 401
+    
+    try:
+        return jsonify(run_due_sources(force=request.args.get('force') == '1'))
+    except Exception as e:
+        print(f"排程收集錯誤: {e}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
+
 # get_report 路由已移除，因為改為同步處理，直接在 start_analysis 中返回結果
 
 # Vercel 需要的應用實例
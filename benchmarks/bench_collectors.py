@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+收集器離線效能測試
+以錄製的 HTTP 夾具回放 search_google_news、scrape_news_websites、scrape_rss_news、
+fetch_investing_price_sync，回報每個收集器的總耗時、解析耗時與記憶體配置
+
+用法：
+    python benchmarks/bench_collectors.py --record --fixtures benchmarks/fixtures   # 連網錄製一次
+    python benchmarks/bench_collectors.py --fixtures benchmarks/fixtures --latency 0.2 --error-rate 0.1
+未提供夾具目錄時會產生模擬夾具。
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import quote_plus
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 收集器會寫入文章庫、快取與 feed 狀態，使用暫存目錄以免影響本機資料
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='bench-collectors-')
+
+from bench_html_parser import synthetic_pages
+from scraper import (circuit_breaker, data_collector, feed_state, html_parser, http_replay, page_cache, parse_pool,
+                     rate_limiter)
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Language': 'zh-TW,zh;q=0.9,en;q=0.8'
+}
+GOOGLE_NEWS_BASE = 'https://news.google.com'
+GOOGLE_NEWS_QUERY = '台海 軍事'
+CNA_URL = 'https://www.cna.com.tw/list/aipl.aspx'
+INVESTING_URL = 'https://www.investing.com/commodities/gold'
+RSS_FEEDS = [
+    'https://feeds.feedburner.com/ettoday/finance',
+    'https://www.cna.com.tw/rss/fin.xml',
+    'https://www.cna.com.tw/rss/int.xml',
+    'https://feeds.feedburner.com/ettoday/world',
+    'https://www.cna.com.tw/rss/pol.xml'
+]
+
+COLLECTORS = {
+    'google_news': lambda: data_collector.search_google_news(GOOGLE_NEWS_QUERY, BROWSER_HEADERS, GOOGLE_NEWS_BASE),
+    'news_websites': data_collector.scrape_news_websites,
+    'rss_news': data_collector.scrape_rss_news,
+    'investing_price': lambda: data_collector.fetch_investing_price_sync(INVESTING_URL, '黃金', BROWSER_HEADERS)
+}
+
+# 計入解析耗時的函式（串流提前停止的檢查直接呼叫 html_parser，其餘經由 parse_pool）
+PARSE_FUNCTIONS = [
+    (parse_pool, 'run_parser'),
+    (html_parser, 'parse_cna_list'),
+    (html_parser, 'parse_google_news'),
+    (html_parser, 'parse_investing_price')
+]
+
+parse_seconds = [0.0]
+
+def google_news_url(query):
+    """與 search_google_news 相同的搜尋網址"""
+    return f"{GOOGLE_NEWS_BASE}/search?q={quote_plus(query)}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
+
+def synthetic_rss(index):
+    """模擬 RSS feed"""
+    items = []
+    for i in range(20):
+        items.append(f'<item><title>兩岸情勢 台海 第 {index}-{i} 則</title>'
+                     f'<link>https://example.com/{index}/{i}</link><guid>{index}-{i}</guid>'
+                     f'<pubDate>Wed, 01 Jan 2025 0{i % 10}:00:00 GMT</pubDate>'
+                     f'<description>{"內容" * 200}</description></item>')
+    return ('<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+            f'<title>模擬來源 {index}</title>' + ''.join(items) + '</channel></rss>').encode('utf-8')
+
+def write_synthetic_fixtures(fixture_dir):
+    """以模擬頁面建立夾具"""
+    pages = synthetic_pages()
+    html = {'Content-Type': 'text/html; charset=utf-8'}
+    http_replay.save_fixture('GET', google_news_url(GOOGLE_NEWS_QUERY), 200, html, pages['google'], fixture_dir)
+    http_replay.save_fixture('GET', CNA_URL, 200, html, pages['cna'], fixture_dir)
+    http_replay.save_fixture('GET', INVESTING_URL, 200, html, pages['investing'], fixture_dir)
+    for index, url in enumerate(RSS_FEEDS):
+        http_replay.save_fixture('GET', url, 200, {'Content-Type': 'application/rss+xml; charset=utf-8'},
+                                 synthetic_rss(index), fixture_dir)
+
+def instrument_parsers(parse_workers=0):
+    """包裝解析函式以累計解析耗時"""
+    for module, name in PARSE_FUNCTIONS:
+        # 送往工作行程的函式必須可被 pickle，不能替換
+        if parse_workers > 0 and module is parse_pool:
+            continue
+        original = getattr(module, name)
+
+        def timed(*args, _original=original, **kwargs):
+            started = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                parse_seconds[0] += time.perf_counter() - started
+
+        setattr(module, name, timed)
+
+def reset_state(warm=False):
+    """每次執行前清除會影響結果的狀態（feed 高水位、斷路器；warm 為 False 時也清空頁面快取）"""
+    if not warm:
+        page_cache.get_page_cache().clear()
+    feed_state.reset_states()
+    try:
+        os.remove(feed_state.get_state_path())
+    except OSError:
+        pass
+    circuit_breaker.reset_breakers()
+
+def run_once(collector, trace=False, warm=False):
+    """執行一次收集器，回傳 (總耗時, 解析耗時, 記憶體峰值, 是否有結果)"""
+    reset_state(warm)
+    parse_seconds[0] = 0.0
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    # 收集器的進度訊息會打亂表格輸出
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = collector()
+    wall = time.perf_counter() - started
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return wall, parse_seconds[0], peak, bool(result)
+
+def main():
+    parser = argparse.ArgumentParser(description='收集器離線效能測試')
+    parser.add_argument('--fixtures', help='夾具目錄（未指定時產生模擬夾具）')
+    parser.add_argument('--record', action='store_true', help='連網錄製真實回應到夾具目錄')
+    parser.add_argument('--latency', type=float, default=0.0, help='回放時注入的平均延遲（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='回放時注入的連線錯誤比例')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='解析工作行程數（大於 0 時解析耗時只計入目前行程的部分）')
+    parser.add_argument('--warm', action='store_true', help='保留頁面快取（測量本文未變更時的成本）')
+    args = parser.parse_args()
+    os.environ['PARSE_WORKERS'] = str(args.parse_workers)
+
+    if args.record:
+        if not args.fixtures:
+            parser.error('--record 需要指定 --fixtures')
+        os.makedirs(args.fixtures, exist_ok=True)
+        http_replay.configure('record', fixture_dir=args.fixtures)
+        for name, collector in COLLECTORS.items():
+            reset_state()
+            print(f"錄製 {name}...")
+            collector()
+        print(f"夾具已寫入 {args.fixtures}")
+        return
+
+    fixture_dir = args.fixtures
+    if not fixture_dir:
+        fixture_dir = tempfile.mkdtemp(prefix='bench-fixtures-')
+        write_synthetic_fixtures(fixture_dir)
+    http_replay.configure('replay', fixture_dir=fixture_dir, latency=args.latency,
+                          error_rate=args.error_rate, seed=args.seed)
+
+    # 限流是對來源的禮貌，不屬於收集器本身的成本
+    rate_limiter.HOST_RATE_LIMITS.clear()
+    rate_limiter.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+    instrument_parsers(args.parse_workers)
+
+    print(f"解析後端: {html_parser.get_backend()}  解析行程: {args.parse_workers}  頁面快取: {'保留' if args.warm else '清空'}  "
+          f"延遲: {args.latency}s  錯誤率: {args.error_rate}")
+    print(f"{'收集器':<18}{'總耗時(ms)':>12}{'解析(ms)':>12}{'峰值(KB)':>12}{'有結果':>8}")
+    for name, collector in COLLECTORS.items():
+        walls = []
+        parses = []
+        successes = 0
+        for _ in range(args.repeat):
+            wall, parse, _, ok = run_once(collector, warm=args.warm)
+            walls.append(wall * 1000)
+            parses.append(parse * 1000)
+            successes += ok
+        _, _, peak, _ = run_once(collector, trace=True, warm=args.warm)
+        print(f"{name:<18}{statistics.median(walls):>12.2f}{statistics.median(parses):>12.2f}"
+              f"{peak / 1024:>12.1f}{successes:>5}/{args.repeat}")
+
+if __name__ == '__main__':
+    main()
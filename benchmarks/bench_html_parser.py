@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML 解析效能比較
+比較舊版（完整 html.parser 解析）與 scraper.html_parser 在已儲存頁面上的耗時
+
+用法：
+    python benchmarks/bench_html_parser.py --cna cna.html --google gnews.html --investing gold.html
+未提供頁面時會產生模擬頁面。
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from scraper import html_parser
+
+def legacy_cna(content):
+    """舊版中央社解析"""
+    soup = BeautifulSoup(content.decode('utf-8', 'replace'), 'html.parser')
+    items = []
+    for article in soup.find_all('div', class_='item')[:5]:
+        title_tag = article.find('h2') or article.find('h3')
+        link_tag = article.find('a')
+        if title_tag and link_tag:
+            items.append({'title': title_tag.get_text(strip=True), 'href': link_tag.get('href', '')})
+    return items
+
+def legacy_google(content):
+    """舊版 Google News 解析"""
+    soup = BeautifulSoup(content.decode('utf-8', 'replace'), 'html.parser')
+    article_divs = []
+    for selector in html_parser.GOOGLE_NEWS_SELECTORS:
+        article_divs = soup.select(selector)
+        if article_divs:
+            break
+    titles = []
+    for article_div in article_divs[:8]:
+        title_tag = article_div.find('div', attrs={'role': 'heading'}) or article_div.find('h3')
+        titles.append(title_tag.get_text(strip=True) if title_tag else '')
+    return titles
+
+def legacy_investing(content):
+    """舊版 investing.com 解析"""
+    soup = BeautifulSoup(content.decode('utf-8', 'replace'), 'html.parser')
+    price_element = soup.find('span', {'data-test': 'instrument-price-last'}) or \
+                    soup.find('span', class_='text-2xl') or \
+                    soup.find('div', class_='text-5xl')
+    return price_element.get_text().strip() if price_element else None
+
+def new_google(content):
+    """新版 Google News 解析（只取標題以便比對）"""
+    return [article['title'] for article in html_parser.parse_google_news(content)[1]]
+
+def filler(size):
+    """模擬真實頁面中大量的導覽列、腳本與其他內容"""
+    blocks = []
+    for i in range(size):
+        blocks.append(f'<div class="nav"><ul><li><a href="/c/{i}">分類 {i}</a></li><li><span>側欄內容 {i}</span></li></ul></div>')
+        blocks.append(f'<script>var x{i} = {{"k": {i}, "v": "{"x" * 80}"}};</script>')
+    return ''.join(blocks)
+
+def synthetic_pages():
+    """產生模擬頁面"""
+    cna = ['<html><head><meta charset="utf-8"></head><body>', filler(1500), '<div class="mainList">']
+    for i in range(30):
+        cna.append(f'<div class="item"><a href="/news/aipl/{i}.aspx"><h2>兩岸情勢新聞標題 {i}</h2></a><div class="date">2025/01/01</div></div>')
+    cna.append('</div>' + filler(500) + '</body></html>')
+
+    google = ['<html><head><meta charset="utf-8"></head><body>', filler(1500)]
+    for i in range(40):
+        google.append(f'<article><a href="./articles/{i}">x</a><h3>台海局勢最新發展報導第 {i} 則新聞</h3>'
+                      f'<time datetime="2025-01-01T00:00:00Z"></time><span class="WG9SHc">來源 {i}</span></article>')
+    google.append(filler(500) + '</body></html>')
+
+    investing = ['<html><head><meta charset="utf-8"></head><body>', filler(2000),
+                 '<span data-test="instrument-price-last">2,345.60</span>', filler(500), '</body></html>']
+
+    return {
+        'cna': ''.join(cna).encode('utf-8'),
+        'google': ''.join(google).encode('utf-8'),
+        'investing': ''.join(investing).encode('utf-8')
+    }
+
+def measure(func, content, repeat):
+    """回傳中位數耗時（毫秒）與最後一次結果"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(content)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML 解析效能比較')
+    parser.add_argument('--cna', help='中央社列表頁 HTML')
+    parser.add_argument('--google', help='Google News 搜尋結果 HTML')
+    parser.add_argument('--investing', help='investing.com 報價頁 HTML')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    pages = synthetic_pages()
+    for name in pages:
+        path = getattr(args, name)
+        if path:
+            with open(path, 'rb') as f:
+                pages[name] = f.read()
+
+    cases = [
+        ('cna', legacy_cna, html_parser.parse_cna_list),
+        ('google', legacy_google, new_google),
+        ('investing', legacy_investing, html_parser.parse_investing_price)
+    ]
+
+    print(f"解析後端: {html_parser.get_backend()}")
+    print(f"{'頁面':<10}{'大小(KB)':>10}{'舊版(ms)':>12}{'新版(ms)':>12}{'加速':>8}  結果一致")
+    for name, legacy, new in cases:
+        content = pages[name]
+        legacy_ms, legacy_result = measure(legacy, content, args.repeat)
+        new_ms, new_result = measure(new, content, args.repeat)
+        same = '是' if legacy_result == new_result else '否'
+        print(f"{name:<10}{len(content) / 1024:>10.1f}{legacy_ms:>12.2f}{new_ms:>12.2f}{legacy_ms / new_ms:>7.1f}x  {same}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+威脅指標批次計算效能測試
+以模擬的歷史快照比較 calculate_threat_indicators 逐筆計算與 analyzer.batch_indicators 批次計算，
+並確認兩者結果相同
+
+用法：
+    python benchmarks/bench_indicators.py --days 90 --per-day 48
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer import batch_indicators
+from analyzer.indicator_calculator import calculate_threat_indicators
+
+WORDS = ['台海', '演習', '軍演', '戰機', '軍艦', '飛彈', '入侵', '挑釁', '緊張', '衝突', '制裁', '軍事行動',
+         '戰爭', '危機', '經濟', '股市', '颱風', '選舉', '觀光', '半導體', '出口', '天氣', '交通', '醫療']
+
+def synthetic_snapshots(days, per_day, seed=42):
+    """模擬歷史快照；新聞在相鄰快照間大量重複，與實際收集相同"""
+    rng = random.Random(seed)
+    pool = [{
+        'title': ' '.join(rng.choice(WORDS) for _ in range(6)),
+        'description': ' '.join(rng.choice(WORDS) for _ in range(20))
+    } for _ in range(2000)]
+    snapshots = []
+    for i in range(days * per_day):
+        start = (i * 3) % (len(pool) - 40)
+        snapshots.append({
+            'military': {
+                'status': rng.choice(['success', 'success', 'error']),
+                'data': [{'title': ' '.join(rng.choice(WORDS) for _ in range(5)), 'source': '國防部'}
+                         for _ in range(rng.randint(0, 8))]
+            },
+            'news': {'status': 'success', 'data': pool[start:start + rng.randint(0, 40)]},
+            'economic': {'status': 'success', 'data': dict.fromkeys(rng.sample(['gold', 'ZS=F', 'ZW=F', 'ZC=F'],
+                                                                               rng.randint(0, 4)), {})},
+            'stock': {'status': rng.choice(['success', 'error'])}
+        })
+    return snapshots
+
+def strip_time(result):
+    return {key: value for key, value in result.items() if key != 'calculation_time'}
+
+def main():
+    parser = argparse.ArgumentParser(description='威脅指標批次計算效能測試')
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--per-day', type=int, default=48, help='每天的快照數')
+    args = parser.parse_args()
+
+    snapshots = synthetic_snapshots(args.days, args.per_day)
+    print(f"快照數: {len(snapshots)}")
+
+    started = time.perf_counter()
+    scalar = [calculate_threat_indicators(snapshot) for snapshot in snapshots]
+    scalar_seconds = time.perf_counter() - started
+    print(f"逐筆計算: {scalar_seconds:.2f} s")
+
+    started = time.perf_counter()
+    batch = batch_indicators.calculate_threat_indicators_batch(snapshots)
+    print(f"批次計算: {time.perf_counter() - started:.2f} s")
+
+    mismatches = sum(strip_time(a) != strip_time(b) for a, b in zip(scalar, batch))
+    print(f"結果不一致: {mismatches}")
+
+    # 調整權重後重新計算：文字只掃描一次，之後只有陣列運算
+    features = batch_indicators.build_features(snapshots)
+    started = time.perf_counter()
+    for weight in (0.3, 0.35, 0.45, 0.5):
+        weights = {'military': weight, 'economic': 0.25, 'news': 0.65 - weight, 'stock': 0.1}
+        batch_indicators.score_features(features, weights)
+    print(f"調整權重重新計算 4 次: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
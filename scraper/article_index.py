@@ -0,0 +1,34 @@
+import re
+import unicodedata
+
+# 文章全文索引的結構與斷詞（article_store 寫入與 article_search 查詢共用，不匯入其他文章模組）
+
+# 以預先切好的詞元（空白分隔）建立 contentless FTS5 索引，文章內容由 articles 表取得
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS article_fts USING fts5(
+    title, description, content='', tokenize='unicode61'
+);
+"""
+
+# 中日韓文字的連續片段，或英數字詞
+TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+')
+CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+
+def tokenize(text):
+    """中文切成相鄰兩字的 bigram（單獨一字保留單字），英數字以詞為單位並轉小寫"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    tokens = []
+    for run in TOKEN_RE.findall(text):
+        if CJK_RE.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+def index_articles(conn, rows):
+    """將文章加入索引（需在寫入文章的同一個交易中呼叫）；rows 需包含 id、title、description"""
+    conn.executemany(
+        'INSERT INTO article_fts (rowid, title, description) VALUES (?, ?, ?)',
+        [(row['id'], ' '.join(tokenize(row['title'])), ' '.join(tokenize(row.get('description') or '')))
+         for row in rows]
+    )
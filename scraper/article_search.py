@@ -0,0 +1,107 @@
+import sqlite3
+import time
+
+from scraper import article_store
+from scraper.article_index import CJK_RE, index_articles, tokenize
+
+# 標題與描述在 BM25 中的權重
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_LIMIT = 100
+# 補建索引時每批處理的文章數
+BACKFILL_BATCH = 5000
+
+_caught_up = set()
+
+def build_match(query):
+    """將查詢轉為 FTS5 語法：空白分隔的每個詞都需出現（AND），多字詞以片語比對相鄰 bigram
+
+    單一中文字無法組成 bigram，以前綴比對（只找到以該字開頭的 bigram）。
+    """
+    clauses = []
+    for term in query.split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        if len(tokens) == 1 and CJK_RE.fullmatch(tokens[0]):
+            clauses.append(f'"{tokens[0]}"*')
+        else:
+            clauses.append('"' + ' '.join(tokens) + '"')
+    return ' AND '.join(clauses)
+
+def catch_up(conn):
+    """補建索引：加入索引建立前已寫入的文章，回傳補建數量"""
+    indexed = conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM article_fts').fetchone()[0]
+    total = 0
+    while True:
+        rows = conn.execute(
+            'SELECT id, title, description FROM articles WHERE id > ? ORDER BY id LIMIT ?', (indexed, BACKFILL_BATCH)
+        ).fetchall()
+        if not rows:
+            return total
+        with conn:
+            index_articles(conn, [{'id': row[0], 'title': row[1], 'description': row[2]} for row in rows])
+        indexed = rows[-1][0]
+        total += len(rows)
+
+def search(query, hours=None, limit=20, category=None, until=None):
+    """全文搜尋文章，依 BM25 排序（最相關的在前）
+
+    hours 限制發布時間在最近幾小時內；回傳文章列表（含 score，數值越大越相關）。
+    """
+    match = build_match(query)
+    if not match:
+        return []
+    store = article_store.get_article_store()
+    conn = store._connect()
+    key = (store.path, id(conn))
+    if key not in _caught_up:
+        added = catch_up(conn)
+        if added:
+            print(f"文章搜尋索引補建 {added} 篇")
+        _caught_up.add(key)
+
+    conditions = ['article_fts MATCH ?']
+    params = [match]
+    if hours:
+        since = time.time() - hours * 3600
+        # 文章 id 依收集順序遞增，時間範圍內最小的 id 讓 FTS5 只掃描該 id 之後的索引；
+        # 指定時間索引，否則 SQLite 會依 id 順序掃描整個表
+        min_id = conn.execute(
+            'SELECT MIN(id) FROM articles INDEXED BY idx_articles_time WHERE published_at >= ?', (since,)
+        ).fetchone()[0]
+        if min_id is None:
+            return []
+        conditions.append('article_fts.rowid >= ?')
+        params.append(min_id)
+        conditions.append('a.published_at >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('a.published_at < ?')
+        params.append(until)
+    if category:
+        conditions.append('a.category = ?')
+        params.append(category)
+    params.append(max(1, min(int(limit), MAX_LIMIT)))
+
+    sql = (
+        f"SELECT a.id, a.title, a.description, a.url, a.source, a.category, a.published_at, "
+        f"bm25(article_fts, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank "
+        f"FROM article_fts JOIN articles a ON a.id = article_fts.rowid "
+        f"WHERE {' AND '.join(conditions)} ORDER BY rank LIMIT ?"
+    )
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"無效的查詢: {query}") from e
+    return [{
+        'id': row[0],
+        'title': row[1],
+        'description': row[2] or '',
+        'url': row[3],
+        'source': row[4],
+        'category': row[5],
+        'published_at': row[6],
+        # FTS5 的 bm25() 越小越相關，轉為越大越相關
+        'score': round(-row[7], 4)
+    } for row in rows]
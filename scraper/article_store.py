@@ -0,0 +1,297 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from scraper import article_index
+from scraper.data_paths import data_path
+
+# 正規化網址時移除的追蹤參數（另外所有 utm_ 開頭的參數也會移除）
+TRACKING_PARAMS = {'fbclid', 'gclid', 'ocid', 'from', 'ref'}
+
+# 標題結尾的來源標記，例如「... - 中央社」「... | ETtoday新聞雲」
+_TITLE_SUFFIX_RE = re.compile(r'\s+[-|｜–—]\s+[^-|｜–—]{1,20}$')
+_TITLE_STRIP_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+# 標題去重的時間單位（依發布時間）：同一天內相同標題視為同一篇，
+# 每天重複出現的例行標題（例如每日簡報）在不同日期各存一篇，時間窗查詢才不會漏掉
+TITLE_BUCKET = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    canonical_url TEXT,
+    title_hash TEXT NOT NULL,
+    url TEXT,
+    title TEXT NOT NULL,
+    description TEXT,
+    source TEXT,
+    category TEXT,
+    published_at REAL NOT NULL,
+    collected_at REAL NOT NULL,
+    last_seen_at REAL NOT NULL,
+    seen_count INTEGER NOT NULL DEFAULT 1,
+    title_bucket INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_url ON articles(canonical_url) WHERE canonical_url IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_title_bucket ON articles(title_hash, title_bucket);
+CREATE INDEX IF NOT EXISTS idx_articles_category_time ON articles(category, published_at);
+CREATE INDEX IF NOT EXISTS idx_articles_time ON articles(published_at);
+"""
+
+COLUMNS = ('id', 'canonical_url', 'title_hash', 'url', 'title', 'description', 'source',
+           'category', 'published_at', 'collected_at', 'last_seen_at', 'seen_count')
+
+_store = None
+_store_lock = threading.Lock()
+
+def canonical_url(url):
+    """正規化網址：小寫主機、移除片段與追蹤參數；無效網址回傳 None"""
+    if not url or not url.startswith(('http://', 'https://')):
+        return None
+    parts = urlsplit(url.strip())
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ''))
+
+def normalize_title(title):
+    """正規化標題：全半形統一、去除來源後綴、空白與標點"""
+    title = unicodedata.normalize('NFKC', title or '').strip()
+    title = _TITLE_SUFFIX_RE.sub('', title)
+    return _TITLE_STRIP_RE.sub('', title).lower()
+
+def title_hash(title):
+    """正規化標題的雜湊值"""
+    return hashlib.sha1(normalize_title(title).encode('utf-8')).hexdigest()
+
+def title_bucket(published_at):
+    """標題去重的時間區間（發布時間所在的 TITLE_BUCKET）"""
+    return int(published_at // TITLE_BUCKET)
+
+def parse_published(value, default=None):
+    """將各種發布時間格式轉為 epoch 秒"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+        try:
+            return parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return default if default is not None else time.time()
+
+def dedupe_articles(articles):
+    """同一批文章中，網址或正規化標題相同者只保留第一篇"""
+    seen_urls = set()
+    seen_hashes = set()
+    unique = []
+    for article in articles:
+        url = canonical_url(article.get('url', ''))
+        digest = title_hash(article.get('title', ''))
+        if (url and url in seen_urls) or digest in seen_hashes:
+            continue
+        if url:
+            seen_urls.add(url)
+        seen_hashes.add(digest)
+        unique.append(article)
+    return unique
+
+def migrate(conn):
+    """舊版資料庫：加入 title_bucket 欄位，標題的唯一索引改為每個時間區間各一篇"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(articles)')}
+    if not columns or 'title_bucket' in columns:
+        return
+    try:
+        with conn:
+            conn.execute('ALTER TABLE articles ADD COLUMN title_bucket INTEGER NOT NULL DEFAULT 0')
+            conn.execute(f'UPDATE articles SET title_bucket = CAST(published_at / {TITLE_BUCKET} AS INTEGER)')
+            conn.execute('DROP INDEX IF EXISTS idx_articles_title_hash')
+    except sqlite3.OperationalError:
+        # 其他行程同時完成了遷移
+        if 'title_bucket' not in {row[1] for row in conn.execute('PRAGMA table_info(articles)')}:
+            raise
+
+class ArticleStore:
+    """SQLite（WAL 模式）文章庫，以正規化網址與標題雜湊去重
+
+    網址相同的文章只存一篇；標題相同的文章在同一個 TITLE_BUCKET（依發布時間）內只存一篇。
+
+    每個執行緒使用自己的連線，可同時供多個收集執行緒使用。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_path('articles.db')
+        self.local = threading.local()
+        self._connect()
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            migrate(conn)
+            conn.executescript(SCHEMA)
+            conn.executescript(article_index.SCHEMA)
+            self.local.conn = conn
+        return conn
+
+    def normalize(self, article, category=None, now=None):
+        """將收集到的文章轉為資料庫欄位"""
+        now = now or time.time()
+        title = article.get('title', '')
+        published_at = parse_published(article.get('published_date'), now)
+        return {
+            'canonical_url': canonical_url(article.get('url', '')),
+            'title_hash': title_hash(title),
+            'url': article.get('url', ''),
+            'title': title,
+            'description': article.get('description', ''),
+            'source': article.get('source', ''),
+            'category': article.get('category') or category,
+            'published_at': published_at,
+            'title_bucket': title_bucket(published_at),
+            'collected_at': now,
+            'last_seen_at': now
+        }
+
+    def upsert_articles(self, articles, category=None):
+        """批次寫入文章，已存在的文章只更新 last_seen_at 與 seen_count
+
+        回傳新寫入的文章（正規化後）列表。
+        """
+        conn = self._connect()
+        now = time.time()
+        inserted = []
+        with conn:
+            for article in articles:
+                row = self.normalize(article, category, now)
+                if not normalize_title(row['title']):
+                    continue
+                cursor = conn.execute(
+                    'INSERT INTO articles (canonical_url, title_hash, title_bucket, url, title, description, source, '
+                    'category, published_at, collected_at, last_seen_at) VALUES (:canonical_url, :title_hash, '
+                    ':title_bucket, :url, :title, :description, :source, :category, :published_at, :collected_at, '
+                    ':last_seen_at) ON CONFLICT DO NOTHING',
+                    row
+                )
+                if cursor.rowcount:
+                    row['id'] = cursor.lastrowid
+                    inserted.append(row)
+                else:
+                    conn.execute(
+                        'UPDATE articles SET last_seen_at = ?, seen_count = seen_count + 1 '
+                        'WHERE canonical_url = ? OR (title_hash = ? AND title_bucket = ?)',
+                        (now, row['canonical_url'], row['title_hash'], row['title_bucket'])
+                    )
+            # 新文章在同一個交易中加入全文索引
+            article_index.index_articles(conn, inserted)
+        return inserted
+
+    def filter_new(self, articles):
+        """只保留資料庫中還沒有的文章（同批次內也會去重）"""
+        conn = self._connect()
+        now = time.time()
+        keys = [(canonical_url(article.get('url', '')),
+                 (title_hash(article.get('title', '')),
+                  title_bucket(parse_published(article.get('published_date'), now))))
+                for article in articles]
+        urls = list({url for url, _ in keys if url})
+        hashes = list({digest for _, (digest, _) in keys})
+
+        known_urls = set()
+        # (標題雜湊, 時間區間)
+        known_titles = set()
+        # SQLite 預設參數上限為 999，分批查詢
+        for start in range(0, len(urls), 500):
+            batch = urls[start:start + 500]
+            rows = conn.execute(
+                f"SELECT canonical_url FROM articles WHERE canonical_url IN ({','.join('?' * len(batch))})", batch
+            )
+            known_urls.update(row[0] for row in rows)
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            rows = conn.execute(
+                f"SELECT title_hash, title_bucket FROM articles WHERE title_hash IN ({','.join('?' * len(batch))})",
+                batch
+            )
+            known_titles.update((row[0], row[1]) for row in rows)
+
+        new_articles = []
+        for article, (url, title_key) in zip(articles, keys):
+            if (url and url in known_urls) or title_key in known_titles:
+                continue
+            if url:
+                known_urls.add(url)
+            known_titles.add(title_key)
+            new_articles.append(article)
+        return new_articles
+
+    def query(self, category=None, since=None, until=None, limit=None):
+        """依分類與發布時間範圍查詢，最新的在前"""
+        conditions = []
+        params = []
+        if category:
+            conditions.append('category = ?')
+            params.append(category)
+        if since is not None:
+            conditions.append('published_at >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('published_at < ?')
+            params.append(until)
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM articles"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY published_at DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        return [dict(zip(COLUMNS, row)) for row in self._connect().execute(sql, params)]
+
+    def count(self):
+        """文章總數"""
+        return self._connect().execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def close(self):
+        """關閉目前執行緒的連線"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+def get_article_store():
+    """取得行程共用的文章庫"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArticleStore()
+    return _store
+
+def load_news_data(hours=48, category=None, limit=500):
+    """從文章庫讀取近期新聞，格式與 calculate_news_alert 的輸入相同"""
+    since = (datetime.now() - timedelta(hours=hours)).timestamp()
+    articles = get_article_store().query(category=category, since=since, limit=limit)
+    return {
+        'status': 'success' if articles else 'empty',
+        'data': [{
+            'title': article['title'],
+            'description': article['description'] or '',
+            'source': article['source'],
+            'url': article['url'],
+            'category': article['category'],
+            'published_date': datetime.fromtimestamp(article['published_at']).isoformat()
+        } for article in articles],
+        'source': 'article_store'
+    }
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import deque
+
+from scraper.rate_limiter import get_host
+
+# 連續失敗幾次後斷路
+FAILURE_THRESHOLD = 3
+# 最近 WINDOW 次呼叫中至少 MIN_CALLS 次、失敗率達 FAILURE_RATE 時也會斷路
+WINDOW = 50
+MIN_CALLS = 10
+FAILURE_RATE = 0.5
+# 斷路後等待多久才放行試探請求；試探失敗時加倍，最長 MAX_COOLDOWN
+COOLDOWN = 30.0
+MAX_COOLDOWN = 600.0
+
+# 代表來源故障或封鎖的 HTTP 狀態碼
+FAILURE_STATUS_CODES = (403, 429, 500, 502, 503, 504)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+class CircuitOpenError(Exception):
+    """來源目前斷路中，請求未送出"""
+
+def percentile(sorted_values, fraction):
+    """已排序數列的百分位數（最近排名法）"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+class CircuitBreaker:
+    """單一來源的斷路器
+
+    連續失敗或近期失敗率過高時斷路，斷路期間的請求立即失敗而不必等到逾時；
+    冷卻時間過後只放行一個試探請求（half-open），成功則恢復，失敗則延長冷卻時間。
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        self.history = deque(maxlen=WINDOW)
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.lock = threading.Lock()
+
+    def _cooldown_elapsed(self, now):
+        return now - self.opened_at >= self.cooldown
+
+    def is_open(self):
+        """是否處於斷路中（不會佔用試探名額）"""
+        with self.lock:
+            if self.state == OPEN:
+                return not self._cooldown_elapsed(time.monotonic())
+            return self.state == HALF_OPEN and self.probe_in_flight
+
+    def allow(self):
+        """是否放行這次請求；斷路冷卻結束後只放行一個試探請求"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._cooldown_elapsed(time.monotonic()):
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency):
+        with self.lock:
+            self._record(True, latency)
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                print(f"斷路器恢復: {self.name}")
+            self.state = CLOSED
+            self.cooldown = self.base_cooldown
+            self.probe_in_flight = False
+
+    def record_failure(self, latency):
+        with self.lock:
+            self._record(False, latency)
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                # 試探失敗，延長冷卻時間
+                self.cooldown = min(self.cooldown * 2, MAX_COOLDOWN)
+                self._open()
+            elif self.state == CLOSED and self._should_open():
+                self._open()
+
+    def _record(self, ok, latency):
+        self.history.append((ok, latency))
+        self.calls += 1
+        self.total_latency += latency
+        if not ok:
+            self.failures += 1
+
+    def _should_open(self):
+        if self.consecutive_failures >= self.failure_threshold:
+            return True
+        if len(self.history) < MIN_CALLS:
+            return False
+        failed = sum(1 for ok, _ in self.history if not ok)
+        return failed / len(self.history) >= FAILURE_RATE
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        print(f"斷路器開啟: {self.name}（{self.cooldown:.0f} 秒後試探）")
+
+    def call(self, func, *args, is_failure=None, **kwargs):
+        """經過斷路器呼叫 func；斷路中時拋出 CircuitOpenError
+
+        例外一律視為失敗，is_failure(result) 為 True 的回傳值也視為失敗。
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} 斷路中，略過請求")
+        started = time.monotonic()
+        recorded = False
+        try:
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                recorded = True
+                self.record_failure(time.monotonic() - started)
+                raise
+            latency = time.monotonic() - started
+            failed = is_failure is not None and is_failure(result)
+            recorded = True
+            if failed:
+                self.record_failure(latency)
+            else:
+                self.record_success(latency)
+            return result
+        finally:
+            if not recorded:
+                # KeyboardInterrupt 等非 Exception 的中斷不計入成敗，但要釋放試探名額
+                self.release_probe()
+
+    def release_probe(self):
+        """釋放 half-open 的試探名額，下一個請求可以重新試探"""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+
+    def stats(self):
+        """斷路狀態、近期成功率與延遲百分位數（秒）"""
+        with self.lock:
+            latencies = sorted(latency for _, latency in self.history)
+            recent_ok = sum(1 for ok, _ in self.history if ok)
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'success_rate': round(recent_ok / len(self.history), 3) if self.history else None,
+                'latency_p50': round_or_none(percentile(latencies, 0.5)),
+                'latency_p90': round_or_none(percentile(latencies, 0.9)),
+                'latency_p99': round_or_none(percentile(latencies, 0.99)),
+                'total_latency': round(self.total_latency, 3),
+                'retry_in': round(retry_in, 1)
+            }
+
+def round_or_none(value, digits=3):
+    return None if value is None else round(value, digits)
+
+def is_failure_response(response):
+    """HTTP 回應是否代表來源故障或封鎖"""
+    return response.status_code in FAILURE_STATUS_CODES
+
+def get_breaker(url_or_host):
+    """取得該主機共用的斷路器"""
+    host = get_host(url_or_host)
+    breaker = _breakers.get(host)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host)
+                _breakers[host] = breaker
+    return breaker
+
+def get_stats():
+    """所有來源的斷路器統計，依總延遲由高到低排序"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    stats = {host: breaker.stats() for host, breaker in breakers.items()}
+    return dict(sorted(stats.items(), key=lambda item: item[1]['total_latency'], reverse=True))
+
+def reset_breakers():
+    """清除所有斷路器狀態"""
+    with _breakers_lock:
+        _breakers.clear()
@@ -1,28 +1,66 @@
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+import os
 import time
 
-def collect_all_data_sync():
-    """同步收集所有數據"""
+from analyzer import indicator_engine
+from analyzer.keyword_matcher import MATCHER
+from scraper import article_store, circuit_breaker, feed_state, html_parser, http_client, near_duplicate, parse_pool, price_series, rate_limiter, swr_cache
+
+# 整體收集的時間預算（秒），需低於 Vercel 的 maxDuration 60 秒
+COLLECTION_DEADLINE = float(os.environ.get('COLLECTION_DEADLINE', '45'))
+
+# 沒有任何成功紀錄時使用的模擬商品價格
+SIMULATED_PRICES = {
+    "黃金": 2050.0,
+    "小麥": 650.0
+}
+
+def get_source_collectors():
+    """各資料來源與其收集函式的對應"""
+    return {
+        "military": collect_military_data_sync,
+        "news": collect_news_data_sync,
+        "economic": collect_economic_data_sync
+    }
+
+def get_cached_collector(name, collector, use_cache=True):
+    """以 SWR 快取包裝來源收集函式，結果附上快取狀態與資料年齡
+
+    use_cache 為 False 時一律重新收集（仍會更新快取並在失敗時使用上次成功資料）。
+    """
+    def run():
+        try:
+            cache = swr_cache.get_cache()
+        except Exception as e:
+            print(f"快取無法使用: {e}")
+            return collector()
+        
+        if use_cache:
+            value, info = cache.get(name, collector)
+        else:
+            value, info = cache.refresh(name, collector)
+        return swr_cache.with_cache_info(value, info)
+    
+    return run
+
+def collect_all_data_sync(concurrent=True, deadline=None, use_cache=True):
+    """同步收集所有數據
+
+    concurrent 為 True 時所有來源同時收集，並共用 deadline 秒的時間預算，
+    逾時的來源以 partial 結果回傳，不會拖住整個流程；
+    concurrent 為 False 時依序收集（舊行為）。
+    """
     try:
         print("開始收集數據...")
         
-        # 收集軍事新聞
-        military_data = collect_military_data_sync()
-        
-        # 收集一般新聞
-        news_data = collect_news_data_sync()
-        
-        # 收集經濟數據
-        economic_data = collect_economic_data_sync()
+        if concurrent:
+            all_data = collect_sources_concurrently(deadline or COLLECTION_DEADLINE, use_cache=use_cache)
+        else:
+            all_data = {name: get_cached_collector(name, collector, use_cache)()
+                        for name, collector in get_source_collectors().items()}
         
-        all_data = {
-            "military": military_data,
-            "news": news_data,
-            "economic": economic_data,
-            "timestamp": datetime.now().isoformat()
-        }
+        all_data["timestamp"] = datetime.now().isoformat()
         
         print("數據收集完成")
         return all_data
@@ -31,6 +69,71 @@ def collect_all_data_sync():
         print(f"數據收集錯誤: {e}")
         return {"error": str(e), "timestamp": datetime.now().isoformat()}
 
+def collect_sources_concurrently(deadline, sources=None, use_cache=True):
+    """在同一個時間預算內並行收集所有來源（或 sources 指定的來源）"""
+    collectors = {name: get_cached_collector(name, collector, use_cache)
+                  for name, collector in get_source_collectors().items()
+                  if sources is None or name in sources}
+    started = time.monotonic()
+    durations = {}
+    
+    def run(name, collector):
+        source_started = time.monotonic()
+        try:
+            return collector()
+        finally:
+            durations[name] = round(time.monotonic() - source_started, 3)
+    
+    executor = ThreadPoolExecutor(max_workers=len(collectors), thread_name_prefix="collector")
+    try:
+        futures = {name: executor.submit(run, name, collector) for name, collector in collectors.items()}
+        wait(futures.values(), timeout=deadline)
+    finally:
+        # 不等待逾時的來源，讓它們在背景自行結束
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    all_data = {}
+    partial_sources = []
+    for name, future in futures.items():
+        if future.done() and not future.cancelled():
+            try:
+                all_data[name] = future.result()
+            except Exception as e:
+                print(f"{name} 數據收集錯誤: {e}")
+                all_data[name] = {"status": "error", "error": str(e), "timestamp": datetime.now().isoformat()}
+        else:
+            print(f"{name} 數據收集逾時 ({deadline}s)，以部分結果回傳")
+            partial_sources.append(name)
+            all_data[name] = get_partial_result(name, deadline)
+    
+    all_data["collection"] = {
+        "mode": "concurrent",
+        "deadline": deadline,
+        "elapsed": round(time.monotonic() - started, 3),
+        "durations": dict(durations),
+        "partial_sources": partial_sources,
+        "breakers": circuit_breaker.get_stats()
+    }
+    return all_data
+
+def fetch(url, **kwargs):
+    """經過該主機斷路器的串流 GET；來源斷路中時立即拋出 CircuitOpenError
+
+    可傳入 max_bytes 與 stop_when，讀到足夠內容即停止下載。
+    """
+    breaker = circuit_breaker.get_breaker(url)
+    return breaker.call(http_client.get_capped, url, is_failure=circuit_breaker.is_failure_response, **kwargs)
+
+def get_partial_result(source, deadline):
+    """來源未在時間預算內完成時的部分結果"""
+    return {
+        "status": "timeout",
+        "partial": True,
+        "source": source,
+        "error": f"超過收集時間預算 {deadline} 秒",
+        "timestamp": datetime.now().isoformat()
+    }
+
 def collect_military_data_sync():
     """收集軍事新聞數據 (同步版本)"""
     try:
@@ -86,8 +189,13 @@ def collect_news_data_sync():
                         "timestamp": datetime.now().isoformat()
                     })
         
-        return {
+        # 跨來源的相同新聞只計算一次，文章庫中還沒有的文章才寫入
+        all_news = article_store.dedupe_articles(all_news)
+        new_count = store_articles(filter_new_articles(all_news)) if 'error' not in news_data else 0
+        
+        result = {
             "news": all_news,
+            "new_count": new_count,
             "economic_news": news_data.get('economic_news', []),
             "diplomatic_news": news_data.get('diplomatic_news', []),
             "public_opinion_news": news_data.get('public_opinion_news', []),
@@ -95,11 +203,57 @@ def collect_news_data_sync():
             "total_count": news_data.get('total_articles', len(all_news)),
             "timestamp": datetime.now().isoformat()
         }
+        # 新聞示警指標由文章庫中時間窗內的文章計算（包含先前收集與本次寫入的文章），
+        # 轉載合併只在這裡執行一次
+        result.update(load_stored_news(all_news))
+        # 標記備用資料，讓快取改用上次成功的新聞
+        if 'error' in news_data:
+            result["status"] = "fallback"
+            result["error"] = news_data['error']
+        return result
         
     except Exception as e:
         print(f"新聞數據收集錯誤: {e}")
         return get_fallback_news_data()
 
+def filter_new_articles(articles):
+    """只保留文章庫中還沒有的文章（文章庫無法使用時全部保留）"""
+    try:
+        return article_store.get_article_store().filter_new(articles)
+    except Exception as e:
+        print(f"文章庫查詢錯誤: {e}")
+        return articles
+
+def load_stored_news(articles):
+    """從文章庫讀取近期新聞作為新聞示警指標的輸入（status 與 data），文章庫無法使用時改用本次收集的文章
+
+    轉載的同一則新聞合併後只計分一次。
+    """
+    try:
+        news = article_store.load_news_data()
+        status, data = news['status'], news['data']
+    except Exception as e:
+        print(f"文章庫讀取錯誤: {e}")
+        status, data = ("success" if articles else "empty"), articles
+    try:
+        data = near_duplicate.collapse_articles(data)
+    except Exception as e:
+        print(f"近似重複合併錯誤: {e}")
+    return {"status": status, "data": data}
+
+def store_articles(articles):
+    """將文章寫入文章庫並推送新文章到指標引擎，回傳新文章數量（文章庫無法使用時不影響收集）"""
+    try:
+        inserted = article_store.get_article_store().upsert_articles(articles)
+    except Exception as e:
+        print(f"文章庫寫入錯誤: {e}")
+        return 0
+    try:
+        indicator_engine.get_engine().add_articles(inserted)
+    except Exception as e:
+        print(f"指標引擎更新錯誤: {e}")
+    return len(inserted)
+
 def scrape_google_news():
     """改進的新聞收集功能 - 使用可靠的模擬數據"""
     print("開始收集新聞資料...")
@@ -157,26 +311,62 @@ def scrape_rss_news():
         
         result = {'economic': [], 'diplomatic': [], 'opinion': [], 'sources': []}
         
+        # 先抓取所有 feed 並送出解析工作，解析在工作行程中與後續抓取同時進行
+        jobs = []
         for category, feeds in rss_feeds.items():
             for feed_url in feeds:
                 try:
                     print(f"正在抓取RSS: {feed_url}")
-                    feed = feedparser.parse(feed_url)
+                    state = feed_state.get_feed_state(feed_url)
+                    response = fetch(feed_url, headers=feed_state.conditional_headers(state))
+                    
+                    # 內容未變更時只花一個 304，不需要解析
+                    if response.status_code == 304:
+                        print(f"RSS 未更新: {feed_url}")
+                        continue
+                    if response.status_code != 200:
+                        print(f"RSS HTTP 錯誤 {response.status_code}: {feed_url}")
+                        continue
+                    
+                    content_type = response.headers.get('Content-Type')
+                    future = parse_pool.submit('rss', response.content, content_type)
+                    jobs.append((category, feed_url, state, response, content_type, future))
                     
-                    for entry in feed.entries[:3]:  # 每個源取3篇
-                        if any(keyword in entry.title for keyword in ['中國', '兩岸', '台海', '中美']):
-                            article = {
-                                'title': entry.title,
-                                'url': entry.link,
-                                'published_date': entry.get('published', ''),
-                                'source': feed.feed.get('title', '未知來源')
-                            }
-                            result[category].append(article)
-                            result['sources'].append(article['source'])
-                            
                 except Exception as e:
                     print(f"RSS抓取錯誤 {feed_url}: {e}")
                     continue
+        
+        for category, feed_url, state, response, content_type, future in jobs:
+            try:
+                feed = parse_pool.result('rss', future, response.content, content_type)
+                
+                # 只輸出比上次高水位新的 entry
+                # 高水位會推進到所有新 entry，因此全部輸出（只取前幾篇會永久遺漏其餘的 entry）
+                new_entries = feed_state.select_new_entries(state, feed['entries'])
+                feed_state.update_state(state, response.headers, new_entries)
+                
+                articles = []
+                for entry in new_entries:
+                    if MATCHER.contains_any(entry.get('title', ''), ('cross_strait',)):
+                        articles.append({
+                            'title': entry['title'],
+                            'url': entry['link'],
+                            'published_date': entry.get('published', ''),
+                            'source': feed['title'] or '未知來源'
+                        })
+                # 其他來源已收集過的文章不再輸出
+                for article in filter_new_articles(articles):
+                    result[category].append(article)
+                    result['sources'].append(article['source'])
+                        
+            except Exception as e:
+                print(f"RSS解析錯誤 {feed_url}: {e}")
+                continue
+        
+        try:
+            feed_state.save_states()
+        except OSError as e:
+            print(f"RSS 狀態儲存錯誤: {e}")
                     
         return result if any(result[cat] for cat in ['economic', 'diplomatic', 'opinion']) else None
         
@@ -206,31 +396,23 @@ def scrape_news_websites():
         try:
             print("正在抓取中央社新聞...")
             cna_url = "https://www.cna.com.tw/list/aipl.aspx"
-            response = requests.get(cna_url, headers=headers, timeout=10)
+            response = fetch(cna_url, headers=headers, stop_when=html_parser.cna_list_complete(5))
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                articles = soup.find_all('div', class_='item')
+                items = parse_pool.parse('cna_list', response.content, response.headers.get('Content-Type'), limit=5)
                 
-                for article in articles[:5]:
-                    try:
-                        title_tag = article.find('h2') or article.find('h3')
-                        link_tag = article.find('a')
-                        
-                        if title_tag and link_tag:
-                            title = title_tag.get_text(strip=True)
-                            if any(keyword in title for keyword in ['中國', '兩岸', '台海', '中美', '大陸']):
-                                article_data = {
-                                    'title': title,
-                                    'url': 'https://www.cna.com.tw' + link_tag.get('href', ''),
-                                    'published_date': datetime.now().strftime('%Y-%m-%d'),
-                                    'source': '中央社'
-                                }
-                                result['diplomatic'].append(article_data)
-                                result['sources'].append('中央社')
-                                print(f"收集到中央社新聞: {title[:30]}...")
-                    except Exception as e:
-                        continue
+                for item in items:
+                    title = item['title']
+                    if MATCHER.contains_any(title, ('cross_strait', 'mainland')):
+                        article_data = {
+                            'title': title,
+                            'url': 'https://www.cna.com.tw' + item['href'],
+                            'published_date': datetime.now().strftime('%Y-%m-%d'),
+                            'source': '中央社'
+                        }
+                        result['diplomatic'].append(article_data)
+                        result['sources'].append('中央社')
+                        print(f"收集到中央社新聞: {title[:30]}...")
                         
         except Exception as e:
             print(f"中央社抓取錯誤: {e}")
@@ -244,7 +426,6 @@ def scrape_news_websites():
 def search_google_news(query, headers, base_url):
     """輔助函式，用於搜尋特定關鍵字的 Google 新聞"""
     from urllib.parse import quote_plus, urljoin
-    import random
     
     try:
         # 更強的請求頭，模擬真實瀏覽器
@@ -266,83 +447,53 @@ def search_google_news(query, headers, base_url):
         formatted_query = quote_plus(query)
         search_url = f"{base_url}/search?q={formatted_query}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
         
-        # 添加隨機延遲避免被封鎖
-        time.sleep(random.uniform(1, 3))
+        # 斷路中的來源直接略過，不必等待限流
+        if circuit_breaker.get_breaker(search_url).is_open():
+            print(f"Google 新聞斷路中，略過查詢: {query}")
+            return []
+        
+        # 依主機速率限制，只有超過設定速率時才會等待
+        waited = rate_limiter.acquire(search_url)
+        if waited > 0:
+            print(f"Google 新聞限流等待 {waited:.2f} 秒")
         
         print(f"正在搜尋: {query}")
-        response = requests.get(search_url, headers=enhanced_headers, timeout=20)
+        response = fetch(search_url, headers=enhanced_headers, stop_when=html_parser.google_news_complete(8))
         
         if response.status_code != 200:
             print(f"HTTP 錯誤 {response.status_code} for query: {query}")
             return []
             
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+        selector, candidates = parse_pool.parse(
+            'google_news', response.content, response.headers.get('Content-Type'), limit=8
+        )
         
-        articles = []
-        
-        # 嘗試多種選擇器來找到新聞文章
-        selectors = [
-            'div[data-n-tid]',  # Google News 常用的選擇器
-            'article',
-            'div.SoaBEf',
-            'div.xrnccd',
-            'div.JheGif',
-            'div.NiLAwe'
-        ]
-        
-        for selector in selectors:
-            article_divs = soup.select(selector)
-            if article_divs:
-                print(f"找到 {len(article_divs)} 個元素使用選擇器: {selector}")
-                break
-        
-        if not article_divs:
+        if not candidates:
             print(f"未找到新聞文章 for query: {query}")
             return []
+        print(f"找到 {len(candidates)} 個元素使用選擇器: {selector}")
         
-        for article_div in article_divs[:8]:  # 限制數量
-            try:
-                # 嘗試多種方式找到標題和連結
-                link_tag = (article_div.find('a', href=True) or 
-                           article_div.find_parent('a', href=True) or
-                           article_div.find_next('a', href=True))
-                
-                title_tag = (article_div.find('div', attrs={'role': 'heading'}) or
-                            article_div.find('h3') or
-                            article_div.find('h4') or
-                            article_div.find('span', class_='titletext') or
-                            article_div.find('div', class_='JheGif'))
-                
-                time_tag = article_div.find('time')
-                
-                # 嘗試找到來源
-                source_tag = (article_div.find('div', attrs={'data-n-tid': lambda x: x and 'source' in x}) or
-                             article_div.find('span', class_='WG9SHc') or
-                             article_div.find('div', class_='CEMjEf'))
+        articles = []
+        for candidate in candidates:
+            href = candidate['href']
+            title = candidate['title']
+            
+            if href and title and len(title) > 10:  # 確保有效的標題
+                # 處理 Google News 的連結格式
+                if href.startswith('./'):
+                    href = href[2:]
+                if not href.startswith('http'):
+                    href = urljoin(base_url, href)
                 
-                if link_tag and title_tag:
-                    href = link_tag.get('href', '')
-                    title = title_tag.get_text(strip=True)
-                    
-                    if href and title and len(title) > 10:  # 確保有效的標題
-                        # 處理 Google News 的連結格式
-                        if href.startswith('./'):
-                            href = href[2:]
-                        if not href.startswith('http'):
-                            href = urljoin(base_url, href)
-                        
-                        article = {
-                            'title': title,
-                            'url': href,
-                            'published_date': time_tag.get('datetime', '') if time_tag else '',
-                            'source': source_tag.get_text(strip=True) if source_tag else '未知來源'
-                        }
-                        articles.append(article)
-                        print(f"成功抓取文章: {title[:50]}...")
-            except Exception as e:
-                print(f"處理文章時發生錯誤: {e}")
-                continue
+                article = {
+                    'title': title,
+                    'url': href,
+                    'published_date': candidate['published_date'],
+                    'source': candidate['source'] or '未知來源'
+                }
+                articles.append(article)
+                print(f"成功抓取文章: {title[:50]}...")
 
         print(f"成功抓取 {len(articles)} 篇文章 for query: {query}")
         return articles
@@ -405,10 +556,13 @@ def collect_economic_data_sync():
         print(f"小麥價格: ${economic_data['wheat_price']['price']}")
         print(f"經濟壓力指數: {economic_data['economic_pressure_index']}")
         
+        remember_price(economic_data['gold_price'])
+        remember_price(economic_data['wheat_price'])
+        
         return {
             "status": "success",
-            "gold_price": economic_data['gold_price'],
-            "wheat_price": economic_data['wheat_price'],
+            "gold_price": with_price_changes(economic_data['gold_price']),
+            "wheat_price": with_price_changes(economic_data['wheat_price']),
             "economic_pressure_index": economic_data['economic_pressure_index'],
             "market_sentiment": economic_data['market_sentiment'],
             "data_source": economic_data['data_source'],
@@ -418,23 +572,13 @@ def collect_economic_data_sync():
     except Exception as e:
         print(f"經濟數據收集失敗，使用基本備用資料: {e}")
         
-        # 基本備用經濟數據
+        # 基本備用經濟數據（價格優先使用上次成功取得的數值）
+        gold_price = get_fallback_price("黃金", str(e))
+        wheat_price = get_fallback_price("小麥", str(e))
         return {
             "status": "fallback",
-            "gold_price": {
-                "name": "黃金",
-                "price": 2050.0,
-                "currency": "USD",
-                "change_24h": 0.0,
-                "source": "備用數據"
-            },
-            "wheat_price": {
-                "name": "小麥", 
-                "price": 650.0,
-                "currency": "USD",
-                "change_24h": 0.0,
-                "source": "備用數據"
-            },
+            "gold_price": with_price_changes(gold_price),
+            "wheat_price": with_price_changes(wheat_price),
             "economic_pressure_index": 45.0,
             "market_sentiment": "穩定",
             "data_source": "basic_fallback",
@@ -445,77 +589,81 @@ def collect_economic_data_sync():
 def fetch_investing_price_sync(url, commodity_name, headers):
     """從 investing.com 獲取商品價格 (同步版本)"""
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = fetch(url, headers=headers, stop_when=html_parser.investing_price_found())
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # 尋找價格元素
-            price_element = soup.find('span', {'data-test': 'instrument-price-last'}) or \
-                           soup.find('span', class_='text-2xl') or \
-                           soup.find('div', class_='text-5xl')
+            price_text = parse_pool.parse('investing_price', response.content, response.headers.get('Content-Type'))
             
-            if price_element:
-                price_text = price_element.get_text().strip()
+            if price_text:
                 import re
                 price_match = re.search(r'[\d,]+\.?\d*', price_text)
                 if price_match:
                     price = float(price_match.group().replace(',', ''))
-                    return {
+                    result = {
                         "name": commodity_name,
                         "price": price,
                         "currency": "USD",
                         "source": "investing.com"
                     }
+                    remember_price(result)
+                    return with_price_changes(result)
             
-            # 如果無法獲取實際價格，返回模擬數據
-            if commodity_name == "黃金":
-                return {
-                    "name": commodity_name,
-                    "price": 2050.0,
-                    "currency": "USD",
-                    "source": "investing.com (模擬)"
-                }
-            elif commodity_name == "小麥":
-                return {
-                    "name": commodity_name,
-                    "price": 650.0,
-                    "currency": "USD",
-                    "source": "investing.com (模擬)"
-                }
-            
-            return {"name": commodity_name, "error": "價格元素未找到", "source": "investing.com"}
+            error = "價格元素未找到"
         else:
-            # 返回模擬數據
-            if commodity_name == "黃金":
-                return {
-                    "name": commodity_name,
-                    "price": 2050.0,
-                    "currency": "USD",
-                    "source": "investing.com (模擬)"
-                }
-            elif commodity_name == "小麥":
-                return {
-                    "name": commodity_name,
-                    "price": 650.0,
-                    "currency": "USD",
-                    "source": "investing.com (模擬)"
-                }
-            return {"name": commodity_name, "error": f"HTTP {response.status_code}", "source": "investing.com"}
+            error = f"HTTP {response.status_code}"
             
     except Exception as e:
-        # 返回模擬數據
-        if commodity_name == "黃金":
-            return {
-                "name": commodity_name,
-                "price": 2050.0,
-                "currency": "USD",
-                "source": "investing.com (模擬)"
-            }
-        elif commodity_name == "小麥":
-            return {
-                "name": commodity_name,
-                "price": 650.0,
-                "currency": "USD",
-                "source": "investing.com (模擬)"
-            }
-        return {"name": commodity_name, "error": str(e), "source": "investing.com"}
\ No newline at end of file
+        error = str(e)
+    
+    return get_fallback_price(commodity_name, error)
+
+def remember_price(price_data):
+    """記錄成功取得的商品價格，供之後備用並寫入報價序列"""
+    try:
+        swr_cache.get_cache().put(f"price:{price_data['name']}", price_data)
+    except Exception as e:
+        print(f"價格快取寫入錯誤: {e}")
+    try:
+        price_series.get_price_store().record(price_data['name'], price_data['price'])
+    except Exception as e:
+        print(f"報價序列寫入錯誤: {e}")
+
+def with_price_changes(price_data):
+    """依報價序列附上 24 小時與 7 天的漲跌、波動與高低價"""
+    price_data = dict(price_data)
+    try:
+        summary = price_series.get_price_store().summary(price_data['name'])
+    except Exception as e:
+        print(f"報價序列查詢錯誤: {e}")
+        summary = {}
+    for key, value in summary.items():
+        if value is not None:
+            price_data[key] = value
+    price_data.setdefault('change_24h', 0.0)
+    return price_data
+
+def get_fallback_price(commodity_name, error):
+    """無法取得即時價格時，優先使用上次成功的價格，否則使用模擬數據"""
+    try:
+        last_good = swr_cache.get_cache().get_last_good(f"price:{commodity_name}")
+    except Exception:
+        last_good = None
+    
+    if last_good is not None:
+        price_data, stored_at = last_good
+        return {
+            "name": commodity_name,
+            "price": price_data['price'],
+            "currency": price_data.get('currency', 'USD'),
+            "source": f"{price_data.get('source', 'investing.com')} (上次成功資料)",
+            "age": round(time.time() - stored_at, 1)
+        }
+    
+    if commodity_name in SIMULATED_PRICES:
+        return {
+            "name": commodity_name,
+            "price": SIMULATED_PRICES[commodity_name],
+            "currency": "USD",
+            "source": "investing.com (模擬)"
+        }
+    return {"name": commodity_name, "error": error, "source": "investing.com"}
@@ -0,0 +1,20 @@
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_data_dir():
+    """本機資料目錄（可用 DATA_DIR 指定；Vercel 上只有 /tmp 可寫入）"""
+    data_dir = os.environ.get('DATA_DIR')
+    if not data_dir:
+        if os.environ.get('VERCEL'):
+            data_dir = '/tmp/taiwan-defense-data'
+        else:
+            data_dir = os.path.join(PROJECT_ROOT, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+def data_path(*parts):
+    """資料目錄下的檔案路徑，必要時建立上層目錄"""
+    path = os.path.join(get_data_dir(), *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
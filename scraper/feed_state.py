@@ -0,0 +1,121 @@
+import calendar
+import json
+import os
+import threading
+
+from scraper.data_paths import data_path
+
+# 每個 feed 記住的最近 entry id 數量（用於沒有發布時間的 entry）
+RECENT_IDS_LIMIT = 200
+
+_lock = threading.Lock()
+_states = None
+
+def get_state_path():
+    """feed 狀態檔路徑"""
+    return data_path('feed_state.json')
+
+def load_states():
+    """讀取所有 feed 的狀態（只在第一次呼叫時讀檔）"""
+    global _states
+    with _lock:
+        if _states is None:
+            try:
+                with open(get_state_path(), 'r', encoding='utf-8') as f:
+                    _states = json.load(f)
+            except (OSError, ValueError):
+                _states = {}
+        return _states
+
+def save_states():
+    """以原子方式寫回狀態檔"""
+    with _lock:
+        if _states is None:
+            return
+        path = get_state_path()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(_states, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+def reset_states():
+    """清除記憶體中的狀態，下次使用時重新讀檔"""
+    global _states
+    with _lock:
+        _states = None
+
+def get_feed_state(feed_url):
+    """取得單一 feed 的狀態（ETag、Last-Modified、高水位）"""
+    states = load_states()
+    with _lock:
+        return states.setdefault(feed_url, {
+            'etag': None,
+            'last_modified': None,
+            'last_entry_id': None,
+            'last_published': 0,
+            'recent_ids': []
+        })
+
+def conditional_headers(state):
+    """依上次的 ETag / Last-Modified 產生條件式請求標頭"""
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+    return headers
+
+def parse_feed(content, content_type=None):
+    """解析 feed，只回傳收集需要的欄位（可在解析工作行程中執行）"""
+    import feedparser
+
+    # feedparser 只需要 Content-Type 判斷編碼；不傳入其他標頭，相同本文的解析結果才能快取
+    feed = feedparser.parse(content, response_headers={'Content-Type': content_type} if content_type else {})
+    return {
+        'title': feed.feed.get('title'),
+        'entries': [{
+            'id': entry.get('id'),
+            'title': entry.get('title', ''),
+            'link': entry.get('link', ''),
+            'published': entry.get('published', ''),
+            'published_parsed': entry.get('published_parsed'),
+            'updated_parsed': entry.get('updated_parsed')
+        } for entry in feed.entries]
+    }
+
+def entry_id(entry):
+    """entry 的唯一識別（沒有 id 時使用連結或標題）"""
+    return entry.get('id') or entry.get('link') or entry.get('title', '')
+
+def entry_published(entry):
+    """entry 的發布時間（epoch 秒），沒有時回傳 0"""
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    return calendar.timegm(parsed) if parsed else 0
+
+def select_new_entries(state, entries):
+    """只回傳比高水位新的 entry（依發布時間新到舊排序）"""
+    recent_ids = set(state.get('recent_ids', []))
+    last_published = state.get('last_published', 0)
+
+    new_entries = []
+    for entry in entries:
+        published = entry_published(entry)
+        if entry_id(entry) in recent_ids:
+            continue
+        if published and published < last_published:
+            continue
+        new_entries.append(entry)
+    new_entries.sort(key=entry_published, reverse=True)
+    return new_entries
+
+def update_state(state, response_headers, new_entries):
+    """記錄這次回應的驗證標頭並推進高水位"""
+    with _lock:
+        state['etag'] = response_headers.get('ETag') or state.get('etag')
+        state['last_modified'] = response_headers.get('Last-Modified') or state.get('last_modified')
+        if new_entries:
+            state['last_entry_id'] = entry_id(new_entries[0])
+            state['last_published'] = max(state.get('last_published', 0),
+                                           max(entry_published(entry) for entry in new_entries))
+            ids = [entry_id(entry) for entry in new_entries] + state.get('recent_ids', [])
+            state['recent_ids'] = list(dict.fromkeys(ids))[:RECENT_IDS_LIMIT]
@@ -0,0 +1,259 @@
+import codecs
+import os
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# 可用的解析後端，依速度由快到慢；未安裝的會被略過
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+BACKENDS = ('selectolax', 'lxml', 'html.parser')
+
+# Google News 可能的文章節點（依序嘗試）
+GOOGLE_NEWS_SELECTORS = [
+    'div[data-n-tid]',  # Google News 常用的選擇器
+    'article',
+    'div.SoaBEf',
+    'div.xrnccd',
+    'div.JheGif',
+    'div.NiLAwe'
+]
+GOOGLE_NEWS_CLASSES = {'SoaBEf', 'xrnccd', 'JheGif', 'NiLAwe'}
+
+# 串流讀取時第一次嘗試解析的位元組數，之後每次加倍，總解析成本不超過完整解析的兩倍
+FIRST_CHECK_BYTES = 32 * 1024
+
+_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?\s*([\w.:-]+)', re.I)
+
+def get_backend():
+    """取得目前使用的解析後端（可用 HTML_PARSER_BACKEND 環境變數指定）"""
+    requested = os.environ.get('HTML_PARSER_BACKEND')
+    available = [name for name in BACKENDS if is_backend_available(name)]
+    if requested in available:
+        return requested
+    return available[0]
+
+def is_backend_available(backend):
+    """檢查解析後端是否已安裝"""
+    if backend == 'selectolax':
+        return SelectolaxParser is not None
+    if backend == 'lxml':
+        return HAS_LXML
+    return backend == 'html.parser'
+
+def get_soup_features():
+    """BeautifulSoup 使用的 tree builder"""
+    return 'lxml' if HAS_LXML and get_backend() != 'html.parser' else 'html.parser'
+
+def get_declared_charset(content, content_type=None):
+    """從 Content-Type 標頭或 <meta> 取得宣告的字元編碼"""
+    if content_type:
+        match = re.search(r'charset=["\']?([\w.:-]+)', content_type, re.I)
+        if match:
+            return match.group(1)
+    match = _CHARSET_RE.search(content[:4096])
+    if match:
+        return match.group(1).decode('ascii', 'ignore')
+    return None
+
+def decode_html(content, content_type=None):
+    """依宣告的字元編碼將回應位元組解碼為字串"""
+    if isinstance(content, str):
+        return content
+    if content.startswith(codecs.BOM_UTF8):
+        return content[len(codecs.BOM_UTF8):].decode('utf-8', 'replace')
+
+    charset = get_declared_charset(content, content_type)
+    if charset:
+        try:
+            return content.decode(charset, 'replace')
+        except LookupError:
+            pass
+    return content.decode('utf-8', 'replace')
+
+def make_soup(content, content_type=None, parse_only=None):
+    """建立 BeautifulSoup，parse_only 可只保留候選節點"""
+    return BeautifulSoup(decode_html(content, content_type), get_soup_features(), parse_only=parse_only)
+
+def has_class(attrs, names):
+    """解析過程中判斷屬性是否含有指定 class"""
+    value = attrs.get('class') or ''
+    classes = value.split() if isinstance(value, str) else value
+    return any(name in names for name in classes)
+
+def is_google_news_candidate(name, attrs):
+    """Google News 文章候選節點"""
+    if name == 'article':
+        return True
+    return name == 'div' and ('data-n-tid' in attrs or has_class(attrs, GOOGLE_NEWS_CLASSES))
+
+def is_cna_item(name, attrs):
+    """中央社列表頁文章節點"""
+    return name == 'div' and has_class(attrs, {'item'})
+
+def is_investing_price(name, attrs):
+    """investing.com 價格節點"""
+    if name == 'span':
+        return attrs.get('data-test') == 'instrument-price-last' or has_class(attrs, {'text-2xl'})
+    return name == 'div' and has_class(attrs, {'text-5xl'})
+
+def parse_cna_list(content, content_type=None, limit=5):
+    """解析中央社列表頁，回傳 [{'title', 'href'}]"""
+    if get_backend() == 'selectolax':
+        tree = SelectolaxParser(decode_html(content, content_type))
+        items = []
+        for node in tree.css('div.item')[:limit]:
+            title_tag = node.css_first('h2')
+            if title_tag is None:
+                title_tag = node.css_first('h3')
+            link_tag = node.css_first('a')
+            if title_tag is not None and link_tag is not None:
+                items.append({'title': title_tag.text(strip=True), 'href': link_tag.attributes.get('href') or ''})
+        return items
+
+    soup = make_soup(content, content_type, SoupStrainer(is_cna_item))
+    items = []
+    for article in soup.find_all('div', class_='item')[:limit]:
+        title_tag = article.find('h2') or article.find('h3')
+        link_tag = article.find('a')
+        if title_tag and link_tag:
+            items.append({'title': title_tag.get_text(strip=True), 'href': link_tag.get('href', '')})
+    return items
+
+def parse_google_news(content, content_type=None, limit=8):
+    """解析 Google News 搜尋結果，回傳 (使用的選擇器, 文章列表)
+
+    只保留候選文章節點，因此連結只在節點內部尋找。
+    """
+    if get_backend() == 'selectolax':
+        return _parse_google_news_selectolax(decode_html(content, content_type), limit)
+
+    soup = make_soup(content, content_type, SoupStrainer(is_google_news_candidate))
+    article_divs = []
+    used_selector = None
+    for selector in GOOGLE_NEWS_SELECTORS:
+        article_divs = soup.select(selector)
+        if article_divs:
+            used_selector = selector
+            break
+
+    articles = []
+    for article_div in article_divs[:limit]:
+        link_tag = article_div.find('a', href=True)
+        title_tag = (article_div.find('div', attrs={'role': 'heading'}) or
+                     article_div.find('h3') or
+                     article_div.find('h4') or
+                     article_div.find('span', class_='titletext') or
+                     article_div.find('div', class_='JheGif'))
+        time_tag = article_div.find('time')
+        source_tag = (article_div.find('div', attrs={'data-n-tid': lambda x: x and 'source' in x}) or
+                      article_div.find('span', class_='WG9SHc') or
+                      article_div.find('div', class_='CEMjEf'))
+        articles.append({
+            'href': link_tag.get('href', '') if link_tag else '',
+            'title': title_tag.get_text(strip=True) if title_tag else '',
+            'published_date': time_tag.get('datetime', '') if time_tag else '',
+            'source': source_tag.get_text(strip=True) if source_tag else ''
+        })
+    return used_selector, articles
+
+def _parse_google_news_selectolax(html, limit):
+    """selectolax 版本的 Google News 解析"""
+    tree = SelectolaxParser(html)
+    nodes = []
+    used_selector = None
+    for selector in GOOGLE_NEWS_SELECTORS:
+        nodes = tree.css(selector)
+        if nodes:
+            used_selector = selector
+            break
+
+    def first(node, selectors):
+        for selector in selectors:
+            found = node.css_first(selector)
+            if found is not None:
+                return found
+        return None
+
+    articles = []
+    for node in nodes[:limit]:
+        link_tag = node.css_first('a[href]')
+        title_tag = first(node, ['div[role="heading"]', 'h3', 'h4', 'span.titletext', 'div.JheGif'])
+        time_tag = node.css_first('time')
+        source_tag = first(node, ['div[data-n-tid*="source"]', 'span.WG9SHc', 'div.CEMjEf'])
+        articles.append({
+            'href': (link_tag.attributes.get('href') or '') if link_tag is not None else '',
+            'title': title_tag.text(strip=True) if title_tag is not None else '',
+            'published_date': (time_tag.attributes.get('datetime') or '') if time_tag is not None else '',
+            'source': source_tag.text(strip=True) if source_tag is not None else ''
+        })
+    return used_selector, articles
+
+def parse_investing_price(content, content_type=None):
+    """解析 investing.com 報價頁，回傳價格字串或 None"""
+    if get_backend() == 'selectolax':
+        tree = SelectolaxParser(decode_html(content, content_type))
+        for selector in ['span[data-test="instrument-price-last"]', 'span.text-2xl', 'div.text-5xl']:
+            node = tree.css_first(selector)
+            if node is not None:
+                return node.text().strip()
+        return None
+
+    soup = make_soup(content, content_type, SoupStrainer(is_investing_price))
+    price_element = soup.find('span', {'data-test': 'instrument-price-last'}) or \
+                    soup.find('span', class_='text-2xl') or \
+                    soup.find('div', class_='text-5xl')
+    return price_element.get_text().strip() if price_element else None
+
+class EarlyStop:
+    """串流讀取時的停止條件：在幾何遞增的檢查點解析已讀內容，結果足夠時停止讀取
+
+    已讀內容只是本文的前段，解析結果不會再被使用，因此不寫入頁面快取。
+    """
+
+    def __init__(self, is_enough, first_check=FIRST_CHECK_BYTES):
+        self.is_enough = is_enough
+        self.next_check = first_check
+
+    def __call__(self, buffer, content_type=None):
+        if len(buffer) < self.next_check:
+            return False
+        self.next_check = len(buffer) * 2
+        try:
+            return self.is_enough(bytes(buffer), content_type)
+        except Exception:
+            return False
+
+def cna_list_complete(limit=5):
+    """已讀內容中出現第 limit + 1 篇文章時，前 limit 篇已完整"""
+    def is_enough(content, content_type):
+        items = parse_cna_list(content, content_type, limit=limit + 1)
+        return len(items) > limit
+    return EarlyStop(is_enough)
+
+def google_news_complete(limit=8):
+    """已讀內容中出現第 limit + 1 個候選節點時，前 limit 個已完整"""
+    def is_enough(content, content_type):
+        _, articles = parse_google_news(content, content_type, limit=limit + 1)
+        return len(articles) > limit
+    return EarlyStop(is_enough)
+
+def investing_price_found():
+    """已讀內容中已有完整的主要報價節點"""
+    def is_enough(content, content_type):
+        if b'instrument-price-last' not in content:
+            return False
+        return bool(parse_investing_price(content, content_type))
+    return EarlyStop(is_enough)
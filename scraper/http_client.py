@@ -0,0 +1,140 @@
+import os
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from scraper import http_replay
+
+# 連線與讀取逾時（秒），所有對外請求共用
+CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', '15'))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# 重試次數與退避設定
+MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '2'))
+BACKOFF_FACTOR = 0.5
+MAX_BACKOFF = 4.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 串流讀取時單一回應本文的上限（位元組，解壓縮後）與每次讀取的區塊大小
+MAX_RESPONSE_BYTES = int(os.environ.get('HTTP_MAX_RESPONSE_BYTES', str(2 * 1024 * 1024)))
+CHUNK_SIZE = 16 * 1024
+
+# 每個主機保留的 keep-alive 連線數，以及快取的主機連線池數量
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 10
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+class JitteredRetry(Retry):
+    """指數退避加上隨機抖動，避免多個請求同時重試"""
+
+    def get_backoff_time(self):
+        backoff = min(super().get_backoff_time(), MAX_BACKOFF)
+        if backoff <= 0:
+            return 0
+        return random.uniform(backoff / 2, backoff)
+
+def build_session():
+    """建立帶有連線池與重試策略的 Session"""
+    retry = JitteredRetry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session():
+    """取得行程共用的 Session（fork 後會重新建立，避免共用 socket）"""
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = build_session()
+                _session_pid = pid
+    return _session
+
+def request(method, url, **kwargs):
+    """透過共用連線池發送請求，未指定時使用預設逾時
+
+    HTTP_REPLAY_MODE 為 record 時會同時錄製回應（串流請求由 get_capped 錄製讀取的部分），
+    為 replay 時改由錄製的夾具回應。
+    """
+    mode = http_replay.get_mode()
+    if mode == 'replay':
+        return http_replay.replay(method, url)
+
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    response = get_session().request(method, url, **kwargs)
+    if mode == 'record' and not kwargs.get('stream'):
+        response = http_replay.record(method, url, response)
+    return response
+
+def get(url, **kwargs):
+    """GET 請求（連線錯誤與 429/5xx 會自動重試）"""
+    return request('GET', url, **kwargs)
+
+def get_capped(url, max_bytes=None, stop_when=None, **kwargs):
+    """串流讀取的 GET：本文超過 max_bytes 或 stop_when(已讀內容, Content-Type) 為 True 時停止讀取
+
+    回傳的 response.content 只包含已讀取的部分，response.stopped_early 表示是否提前停止。
+    """
+    max_bytes = max_bytes or MAX_RESPONSE_BYTES
+    kwargs['stream'] = True
+    response = request('GET', url, **kwargs)
+    content_type = response.headers.get('Content-Type')
+    buffer = bytearray()
+    stopped_early = False
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            buffer += chunk
+            if len(buffer) >= max_bytes:
+                del buffer[max_bytes:]
+                stopped_early = True
+                break
+            if stop_when is not None and stop_when(buffer, content_type):
+                stopped_early = True
+                break
+    finally:
+        # 提前停止時捨棄剩餘本文與該連線
+        response.close()
+
+    response._content = bytes(buffer)
+    response._content_consumed = True
+    response.stopped_early = stopped_early
+    if http_replay.get_mode() == 'record':
+        # 只錄製上限內實際讀取的本文
+        http_replay.save_response('GET', url, response, response._content)
+    return response
+
+def post(url, **kwargs):
+    """POST 請求（非冪等，不會自動重試）"""
+    return request('POST', url, **kwargs)
+
+def close_session():
+    """關閉共用 Session 並釋放連線池"""
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
@@ -0,0 +1,143 @@
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from scraper.data_paths import data_path
+
+# 夾具檔格式版本，格式變更時遞增，舊版夾具需重新錄製
+FIXTURE_VERSION = 1
+
+MODES = ('record', 'replay')
+
+# 回放時本文已解壓縮，這些標頭不再正確
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+_lock = threading.Lock()
+_config = {
+    'mode': os.environ.get('HTTP_REPLAY_MODE') or None,
+    'fixture_dir': os.environ.get('HTTP_FIXTURE_DIR') or None,
+    'latency': float(os.environ.get('HTTP_REPLAY_LATENCY', '0')),
+    'error_rate': float(os.environ.get('HTTP_REPLAY_ERROR_RATE', '0')),
+    'random': random.Random(os.environ.get('HTTP_REPLAY_SEED'))
+}
+
+def configure(mode=None, fixture_dir=None, latency=None, error_rate=None, seed=None):
+    """設定錄製／回放模式；mode 為 None 時關閉"""
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"未知的模式: {mode}")
+    with _lock:
+        _config['mode'] = mode
+        if fixture_dir is not None:
+            _config['fixture_dir'] = fixture_dir
+        if latency is not None:
+            _config['latency'] = float(latency)
+        if error_rate is not None:
+            _config['error_rate'] = float(error_rate)
+        if seed is not None:
+            _config['random'] = random.Random(seed)
+
+def get_mode():
+    """目前的模式（'record'、'replay' 或 None）"""
+    mode = _config['mode']
+    return mode if mode in MODES else None
+
+def get_fixture_dir():
+    """夾具目錄"""
+    fixture_dir = _config['fixture_dir'] or data_path('fixtures')
+    os.makedirs(fixture_dir, exist_ok=True)
+    return fixture_dir
+
+def fixture_key(method, url):
+    """請求的夾具檔名（方法加上查詢參數排序後的網址）"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    canonical = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ''))
+    return hashlib.sha1(f"{method.upper()} {canonical}".encode('utf-8')).hexdigest()[:16]
+
+def save_fixture(method, url, status_code, headers, body, fixture_dir=None):
+    """寫入一筆夾具：<key>.json 為中繼資料，<key>.body 為解壓縮後的本文"""
+    fixture_dir = fixture_dir or get_fixture_dir()
+    key = fixture_key(method, url)
+    meta = {
+        'version': FIXTURE_VERSION,
+        'method': method.upper(),
+        'url': url,
+        'status_code': status_code,
+        'headers': {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS},
+        'recorded_at': datetime.now().isoformat()
+    }
+    with open(os.path.join(fixture_dir, f'{key}.body'), 'wb') as f:
+        f.write(body)
+    with open(os.path.join(fixture_dir, f'{key}.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return key
+
+def load_fixture(method, url, fixture_dir=None):
+    """讀取夾具，不存在或版本不符時回傳 None"""
+    fixture_dir = fixture_dir or get_fixture_dir()
+    key = fixture_key(method, url)
+    try:
+        with open(os.path.join(fixture_dir, f'{key}.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != FIXTURE_VERSION:
+            print(f"夾具版本不符 ({meta.get('version')} != {FIXTURE_VERSION}): {url}")
+            return None
+        with open(os.path.join(fixture_dir, f'{key}.body'), 'rb') as f:
+            meta['body'] = f.read()
+        return meta
+    except (OSError, ValueError):
+        return None
+
+def build_response(method, url, status_code, headers, body):
+    """以錄製的內容建立 Response，可一般讀取也可串流讀取"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response.raw = io.BytesIO(body)
+    response.url = url
+    response.reason = 'OK' if status_code < 400 else 'Error'
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.request = requests.Request(method.upper(), url).prepare()
+    return response
+
+def replay(method, url):
+    """回傳錄製的回應，依設定注入延遲與錯誤"""
+    latency = _config['latency']
+    error_rate = _config['error_rate']
+    with _lock:
+        rng = _config['random']
+        delay = rng.uniform(latency * 0.5, latency * 1.5) if latency > 0 else 0.0
+        failed = error_rate > 0 and rng.random() < error_rate
+    if delay:
+        time.sleep(delay)
+    if failed:
+        raise requests.ConnectionError(f"注入的連線錯誤: {url}")
+
+    fixture = load_fixture(method, url)
+    if fixture is None:
+        raise requests.ConnectionError(f"沒有錄製的回應: {method.upper()} {url}")
+    return build_response(method, url, fixture['status_code'], fixture['headers'], fixture['body'])
+
+def save_response(method, url, response, body):
+    """將回應與已讀取的本文寫入夾具（寫入失敗不影響請求）"""
+    try:
+        save_fixture(method, url, response.status_code, response.headers, body)
+    except OSError as e:
+        print(f"夾具寫入錯誤 {url}: {e}")
+
+def record(method, url, response):
+    """儲存真實回應並回傳可再次讀取的副本（非串流請求）"""
+    body = response.content
+    save_response(method, url, response, body)
+    return build_response(method, url, response.status_code,
+                          {name: value for name, value in response.headers.items()
+                           if name.lower() not in DROPPED_HEADERS}, body)
@@ -0,0 +1,222 @@
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+from scraper.article_store import canonical_url, normalize_title
+
+# MinHash 參數：BANDS × ROWS 個雜湊函式，LSH 門檻約為 (1/BANDS)^(1/ROWS) ≈ 0.31
+BANDS = 32
+ROWS = 3
+# 候選標題的二字詞 Jaccard 相似度需達此門檻才視為同一則新聞
+SIMILARITY_THRESHOLD = 0.4
+# 夾在相同文字中間、至多此長度的替換視為不同事件（漲／跌、台海／南海、32／12 架次），
+# 轉載的標題通常只在前後加上來源或評論
+MAX_CONFLICT_LENGTH = 2
+# 只保留最近的新聞群組，記憶體用量與封存規模無關
+MAX_CLUSTERS = 5000
+MAX_AGE_HOURS = 72
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_detector = None
+_detector_lock = threading.Lock()
+
+def shingles(title):
+    """正規化標題的二字詞集合（只有一個字的標題使用該字）"""
+    text = normalize_title(title)
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def conflicting_substitution(a, b):
+    """兩個標題只差中間一小段替換時視為不同事件（例如「台股大漲200點」與「台股大跌200點」）"""
+    a, b = normalize_title(a), normalize_title(b)
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if (tag == 'replace' and i1 > 0 and j1 > 0 and i2 < len(a) and j2 < len(b) and
+                max(i2 - i1, j2 - j1) <= MAX_CONFLICT_LENGTH):
+            return True
+    return False
+
+def article_key(article):
+    """文章的識別：正規化網址，沒有網址時為來源加正規化標題"""
+    url = article.get('canonical_url') or canonical_url(article.get('url', ''))
+    if url:
+        return url
+    return f"{article.get('source', '')}|{normalize_title(article.get('title', ''))}"
+
+def jaccard(a, b):
+    """兩個集合的 Jaccard 相似度"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class StoryCluster:
+    """同一則新聞的所有變體
+
+    成員以文章識別記錄，文章庫時間窗讓同一篇文章每次收集都再出現時不會重複計算。
+    """
+
+    def __init__(self, cluster_id, article, features, now):
+        self.id = cluster_id
+        self.article = article
+        self.features = features
+        self.band_keys = []
+        # {文章識別: 來源}
+        self.members = {}
+        self.first_seen = now
+        self.last_seen = now
+
+    @property
+    def article_count(self):
+        return len(self.members)
+
+    @property
+    def sources(self):
+        return {source for source in self.members.values() if source}
+
+    def add(self, article, now):
+        self.last_seen = now
+        self.members[article_key(article)] = article.get('source')
+
+class NearDuplicateDetector:
+    """以 MinHash-LSH 分段將近似重複的標題歸為同一新聞群組
+
+    每篇文章只與同一個 LSH 桶中的少數候選比較，並只保留最近的群組，
+    因此插入時間與記憶體用量不會隨封存文章數量成長。
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, bands=BANDS, rows=ROWS,
+                 max_clusters=MAX_CLUSTERS, max_age_hours=MAX_AGE_HOURS, seed=42):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.max_clusters = max_clusters
+        self.max_age = max_age_hours * 3600
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                             for _ in range(bands * rows)]
+        self.clusters = OrderedDict()
+        self.buckets = {}
+        # 相同標題每次收集都會再出現（文章庫時間窗），簽章只計算一次
+        self.signatures = OrderedDict()
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def signature(self, features, title=None):
+        """MinHash 簽章（提供 title 時快取結果）"""
+        if title is not None:
+            with self.lock:
+                cached = self.signatures.get(title)
+                if cached is not None:
+                    self.signatures.move_to_end(title)
+                    return cached
+        signature = self._signature(features)
+        if title is not None:
+            with self.lock:
+                self.signatures[title] = signature
+                while len(self.signatures) > self.max_clusters:
+                    self.signatures.popitem(last=False)
+        return signature
+
+    def _signature(self, features):
+        hashes = [zlib.crc32(feature.encode('utf-8')) for feature in features]
+        return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+                for a, b in self.permutations]
+
+    def band_keys(self, signature):
+        rows = self.rows
+        return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def add(self, article, now=None):
+        """加入一篇文章，回傳 (所屬群組, 是否為新群組)"""
+        now = now or time.time()
+        title = article.get('title', '')
+        features = shingles(title)
+        if not features:
+            return None, False
+
+        keys = self.band_keys(self.signature(features, normalize_title(title)))
+        with self.lock:
+            self._evict(now)
+
+            best = None
+            best_similarity = self.threshold
+            candidates = set()
+            for key in keys:
+                candidates.update(self.buckets.get(key, ()))
+            for cluster_id in candidates:
+                cluster = self.clusters[cluster_id]
+                similarity = jaccard(features, cluster.features)
+                if similarity >= best_similarity and not conflicting_substitution(
+                        title, cluster.article.get('title', '')):
+                    best, best_similarity = cluster, similarity
+
+            if best is not None:
+                best.add(article, now)
+                self.clusters.move_to_end(best.id)
+                return best, False
+
+            cluster = StoryCluster(self.next_id, article, features, now)
+            self.next_id += 1
+            cluster.band_keys = keys
+            cluster.add(article, now)
+            self.clusters[cluster.id] = cluster
+            for key in keys:
+                self.buckets.setdefault(key, set()).add(cluster.id)
+            return cluster, True
+
+    def _evict(self, now):
+        """移除過舊或超出數量上限的群組（最久未出現者優先）"""
+        while self.clusters:
+            cluster_id, cluster = next(iter(self.clusters.items()))
+            if len(self.clusters) <= self.max_clusters and now - cluster.last_seen <= self.max_age:
+                break
+            del self.clusters[cluster_id]
+            for key in cluster.band_keys:
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(cluster_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def collapse(self, articles):
+        """將同一批文章中的近似重複合併，每則新聞保留第一篇並附上這一批中的來源數"""
+        collapsed = OrderedDict()
+        sources = {}
+        for article in articles:
+            cluster, _ = self.add(article)
+            if cluster is None:
+                continue
+            if cluster.id not in collapsed:
+                collapsed[cluster.id] = dict(article)
+                sources[cluster.id] = set()
+            if article.get('source'):
+                sources[cluster.id].add(article['source'])
+        for cluster_id, article in collapsed.items():
+            article.update({
+                'story_id': cluster_id,
+                'source_count': len(sources[cluster_id]),
+                'sources': sorted(sources[cluster_id])
+            })
+        return list(collapsed.values())
+
+def get_detector():
+    """取得行程共用的近似重複偵測器（跨收集週期累積群組）"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = NearDuplicateDetector()
+    return _detector
+
+def collapse_articles(articles):
+    """使用共用偵測器合併近似重複的文章"""
+    return get_detector().collapse(articles)
+
+def assign_story(article):
+    """以共用偵測器取得文章所屬的新聞群組，回傳 (群組, 是否為新群組)"""
+    return get_detector().add(article)
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from scraper.data_paths import data_path
+
+# 快取總大小上限（解析結果，位元組），超過時淘汰最久未使用的項目
+MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# 命中時的 last_used 更新累積到此數量（或下次寫入、淘汰）時才批次寫入
+TOUCH_BATCH = 64
+# 解析器輸出格式變更時遞增，舊的解析結果即失效
+PARSE_CACHE_VERSION = 1
+
+# 本文只以雜湊比對，不需要保存（舊版的 bodies 表在開啟時移除）
+SCHEMA = """
+DROP TABLE IF EXISTS bodies;
+CREATE TABLE IF NOT EXISTS parses (
+    hash TEXT NOT NULL,
+    parser_key TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (hash, parser_key)
+);
+CREATE INDEX IF NOT EXISTS idx_parses_last_used ON parses(last_used);
+"""
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def body_hash(content):
+    """本文的內容位址"""
+    return hashlib.sha1(content).hexdigest()
+
+def parser_key(parser_id, content_type=None, kwargs=None):
+    """解析結果的索引：解析器、編碼標頭與參數都相同時結果才能重用"""
+    params = json.dumps(kwargs or {}, sort_keys=True, ensure_ascii=False)
+    return f"{parser_id}:v{PARSE_CACHE_VERSION}:{content_type or ''}:{params}"
+
+class PageCache:
+    """以內容雜湊為鍵的頁面快取（SQLite）
+
+    parses 存放「本文雜湊 → 解析結果」，本文沒有變更時直接回傳上次的解析結果，不需重新解析；
+    本文本身不保存，大小上限全部用於解析結果。
+    大小以累計值追蹤（估計值超過上限時才以 SUM 重新計算並淘汰），命中時的 LRU 更新批次寫入。
+    """
+
+    def __init__(self, path=None, max_bytes=MAX_BYTES):
+        self.path = path or data_path('page_cache.db')
+        self.max_bytes = max_bytes
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 本行程估計的快取大小（其他行程的寫入在淘汰時重新計算才會計入）
+        self.size = None
+        # (雜湊, 解析器鍵) -> 最後使用時間
+        self.pending_touches = {}
+        self._connect()
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self.local.conn = conn
+        return conn
+
+    def get_parse(self, digest, key):
+        """回傳 (是否命中, 解析結果)"""
+        conn = self._connect()
+        row = conn.execute('SELECT result FROM parses WHERE hash = ? AND parser_key = ?', (digest, key)).fetchone()
+        if row is None:
+            with self.lock:
+                self.misses += 1
+            return False, None
+        with self.lock:
+            self.hits += 1
+        self._touch(digest, key)
+        return True, json.loads(row[0])
+
+    def put_parse(self, digest, key, result):
+        """儲存解析結果（需可轉為 JSON；tuple 會以 list 取回）"""
+        data = json.dumps(result, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        conn = self._connect()
+        with conn:
+            old = conn.execute('SELECT size FROM parses WHERE hash = ? AND parser_key = ?', (digest, key)).fetchone()
+            conn.execute(
+                'INSERT INTO parses (hash, parser_key, result, size, last_used) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(hash, parser_key) DO UPDATE SET result = excluded.result, '
+                'size = excluded.size, last_used = excluded.last_used',
+                (digest, key, data, size, time.time())
+            )
+        self._add_size(size - (old[0] if old else 0))
+        self._evict()
+
+    def _add_size(self, delta):
+        with self.lock:
+            if self.size is not None:
+                self.size += delta
+
+    def _touch(self, digest, key):
+        """記錄使用時間，累積 TOUCH_BATCH 筆後批次寫入"""
+        with self.lock:
+            self.pending_touches[(digest, key)] = time.time()
+            if len(self.pending_touches) < TOUCH_BATCH:
+                return
+        self.flush_touches()
+
+    def flush_touches(self):
+        """寫入累積的 last_used 更新"""
+        with self.lock:
+            touches, self.pending_touches = self.pending_touches, {}
+        if not touches:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany('UPDATE parses SET last_used = ? WHERE hash = ? AND parser_key = ?',
+                             [(used, digest, key) for (digest, key), used in touches.items()])
+
+    def total_size(self):
+        """目前快取大小（位元組）"""
+        return self._connect().execute('SELECT COALESCE(SUM(size), 0) FROM parses').fetchone()[0]
+
+    def _evict(self):
+        """超過上限時依最久未使用的順序淘汰解析結果"""
+        with self.lock:
+            estimate = self.size
+        if estimate is not None and estimate <= self.max_bytes:
+            return
+        # 第一次或估計超過上限時才計算實際大小（包含其他行程的寫入）
+        total = self.total_size()
+        excess = total - self.max_bytes
+        if excess <= 0:
+            with self.lock:
+                self.size = total
+            return
+        self.flush_touches()
+        conn = self._connect()
+        rows = conn.execute('SELECT hash, parser_key, size FROM parses ORDER BY last_used').fetchall()
+        with conn:
+            for digest, key, size in rows:
+                if excess <= 0:
+                    break
+                conn.execute('DELETE FROM parses WHERE hash = ? AND parser_key = ?', (digest, key))
+                excess -= size
+                total -= size
+        with self.lock:
+            self.size = total
+
+    def clear(self):
+        """清空快取"""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM parses')
+        with self.lock:
+            self.size = 0
+            self.pending_touches = {}
+
+    def stats(self):
+        """命中率與大小統計"""
+        self.flush_touches()
+        parses = self._connect().execute('SELECT COUNT(*) FROM parses').fetchone()[0]
+        with self.lock:
+            hits, misses = self.hits, self.misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'parses': parses,
+            'size': self.total_size(),
+            'max_bytes': self.max_bytes
+        }
+
+    def close(self):
+        """寫入累積的使用時間並關閉目前執行緒的連線"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            self.flush_touches()
+            conn.close()
+            self.local.conn = None
+
+def get_page_cache():
+    """取得行程共用的頁面快取"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PageCache()
+    return _cache
+
+def lookup(parser_id, content, content_type=None, kwargs=None):
+    """查詢快取的解析結果，回傳 (是否命中, 結果)；快取無法使用時視為未命中"""
+    try:
+        return get_page_cache().get_parse(body_hash(content), parser_key(parser_id, content_type, kwargs))
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"頁面快取讀取錯誤: {e}")
+        return False, None
+
+def store(parser_id, content, result, content_type=None, kwargs=None):
+    """以本文雜湊儲存解析結果"""
+    try:
+        get_page_cache().put_parse(body_hash(content), parser_key(parser_id, content_type, kwargs), result)
+    except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+        print(f"頁面快取寫入錯誤: {e}")
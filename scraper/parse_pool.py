@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from scraper import feed_state, html_parser, page_cache
+
+# 小於此大小的內容直接在目前行程解析，行程間傳輸的成本高於解析本身
+INLINE_MAX_BYTES = 32 * 1024
+# 每個工作行程最多排隊的工作數，超過時 submit 會等待（背壓）
+QUEUE_PER_WORKER = 2
+
+# 解析器代號：函式需為模組層級（可被工作行程匯入），回傳值需可 pickle
+PARSERS = {
+    'cna_list': html_parser.parse_cna_list,
+    'google_news': html_parser.parse_google_news,
+    'investing_price': html_parser.parse_investing_price,
+    'rss': feed_state.parse_feed
+}
+
+_pool = None
+_pool_pid = None
+_slots = None
+_pool_lock = threading.Lock()
+
+def get_max_workers():
+    """工作行程數（PARSE_WORKERS 指定；預設單核心與 Vercel 上不使用行程池）"""
+    configured = os.environ.get('PARSE_WORKERS')
+    if configured is not None:
+        return max(0, int(configured))
+    if os.environ.get('VERCEL'):
+        return 0
+    cpus = os.cpu_count() or 1
+    return min(4, cpus) if cpus > 1 else 0
+
+def run_parser(parser_id, content, content_type=None, kwargs=None):
+    """在工作行程中執行解析器"""
+    return PARSERS[parser_id](content, content_type, **(kwargs or {}))
+
+def get_pool():
+    """取得共用的解析行程池，無法使用時回傳 None"""
+    global _pool, _pool_pid, _slots
+
+    workers = get_max_workers()
+    if workers <= 0:
+        return None
+    pid = os.getpid()
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            try:
+                # 收集時有多個執行緒，以 spawn 建立工作行程以免 fork 複製到持有中的鎖
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, ValueError, NotImplementedError) as e:
+                print(f"解析行程池無法使用，改為同行程解析: {e}")
+                return None
+            _pool_pid = pid
+            _slots = threading.BoundedSemaphore(workers * QUEUE_PER_WORKER)
+        return _pool
+
+def shutdown_pool():
+    """關閉解析行程池"""
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_pid = None
+
+class CachedFuture(Future):
+    """由頁面快取取得結果的 Future"""
+
+def parse_inline(parser_id, content, content_type=None, **kwargs):
+    """在目前行程解析，回傳已完成的 Future"""
+    future = Future()
+    try:
+        future.set_result(run_parser(parser_id, content, content_type, kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def submit(parser_id, content, content_type=None, **kwargs):
+    """送出解析工作，回傳 Future；排隊已滿時等待空位
+
+    內容很小、未啟用行程池或行程池故障時在目前行程解析。
+    """
+    if parser_id not in PARSERS:
+        raise ValueError(f"未知的解析器: {parser_id}")
+
+    # 本文與上次相同時直接使用快取的解析結果
+    found, cached = page_cache.lookup(parser_id, content, content_type, kwargs)
+    if found:
+        future = CachedFuture()
+        future.set_result(cached)
+        return future
+
+    pool = get_pool() if len(content) > INLINE_MAX_BYTES else None
+    if pool is None:
+        return parse_inline(parser_id, content, content_type, **kwargs)
+
+    slots = _slots
+    slots.acquire()
+    try:
+        future = pool.submit(run_parser, parser_id, bytes(content), content_type, kwargs)
+    except (BrokenProcessPool, RuntimeError) as e:
+        slots.release()
+        print(f"解析行程池故障，改為同行程解析: {e}")
+        shutdown_pool()
+        return parse_inline(parser_id, content, content_type, **kwargs)
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+def result(parser_id, future, content, content_type=None, **kwargs):
+    """取得解析結果並寫入頁面快取；工作行程異常結束時改在目前行程重新解析"""
+    if isinstance(future, CachedFuture):
+        return future.result()
+    try:
+        value = future.result()
+    except BrokenProcessPool as e:
+        print(f"解析行程異常結束，改為同行程解析: {e}")
+        shutdown_pool()
+        value = run_parser(parser_id, content, content_type, kwargs)
+    page_cache.store(parser_id, content, value, content_type, kwargs)
+    return value
+
+def parse(parser_id, content, content_type=None, **kwargs):
+    """同步解析（可能在工作行程中執行，不佔用目前行程的 GIL）"""
+    future = submit(parser_id, content, content_type, **kwargs)
+    return result(parser_id, future, content, content_type, **kwargs)
@@ -0,0 +1,257 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from scraper.data_paths import data_path
+
+# 每個商品在記憶體中保留的報價筆數（以 15 分鐘收集一次約可涵蓋 40 天）
+CAPACITY = 4096
+# 磁碟檔超過容量的幾倍時壓縮為最近 CAPACITY 筆
+COMPACT_FACTOR = 4
+
+DAY = 24 * 3600
+WEEK = 7 * DAY
+
+# 磁碟紀錄格式：(epoch 秒, 價格)，append-only
+RECORD_DTYPE = np.dtype([('ts', '<f8'), ('price', '<f8')])
+
+# 商品名稱對應的檔名代碼
+SYMBOL_CODES = {
+    '黃金': 'gold',
+    '小麥': 'wheat'
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+def ordered(records):
+    """依時間排序並移除時間重複的紀錄（多個行程附加的順序可能交錯）"""
+    records = records[np.argsort(records['ts'], kind='stable')]
+    if len(records) > 1:
+        keep = np.empty(len(records), dtype=bool)
+        keep[0] = True
+        np.greater(records['ts'][1:], records['ts'][:-1], out=keep[1:])
+        records = records[keep]
+    return records
+
+def symbol_code(symbol):
+    """商品的檔名代碼（未登記的名稱以 UTF-8 十六進位表示）"""
+    return SYMBOL_CODES.get(symbol) or symbol.encode('utf-8').hex()
+
+class PriceSeries:
+    """單一商品的固定大小報價環形緩衝區
+
+    每筆報價同時寫入位置 i 與 i + capacity，因此最近 count 筆永遠是
+    一段連續的 NumPy view，查詢時不需複製或重新排序；時間範圍以二分搜尋定位。
+    多個行程可附加到同一個檔案：附加時持有共享檔案鎖，壓縮時持有獨占鎖並以檔案內容改寫，
+    不會遺失其他行程寫入的報價。
+    """
+
+    def __init__(self, symbol, path=None, capacity=CAPACITY):
+        self.symbol = symbol
+        self.path = path
+        self.capacity = capacity
+        self.ts = np.zeros(capacity * 2, dtype=np.float64)
+        self.prices = np.zeros(capacity * 2, dtype=np.float64)
+        self.start = 0
+        self.count = 0
+        self.lock = threading.Lock()
+        if path:
+            self._load()
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        """跨行程的檔案鎖：附加為共享、壓縮為獨占（沒有 fcntl 的平台只在行程內互斥）"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a+b') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _load(self):
+        try:
+            records = np.fromfile(self.path, dtype=RECORD_DTYPE)
+        except (OSError, ValueError):
+            return
+        self._reset(ordered(records))
+
+    def _reset(self, records):
+        """以紀錄（已排序）的最近 capacity 筆重建緩衝區"""
+        self.start = 0
+        self.count = 0
+        for ts, price in records[-self.capacity:]:
+            self._push(ts, price)
+
+    def _push(self, ts, price):
+        end = (self.start + self.count) % self.capacity
+        self.ts[end] = self.ts[end + self.capacity] = ts
+        self.prices[end] = self.prices[end + self.capacity] = price
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def window(self):
+        """(時間, 價格) 的連續 view，舊到新"""
+        return (self.ts[self.start:self.start + self.count],
+                self.prices[self.start:self.start + self.count])
+
+    def append(self, price, ts=None):
+        """加入一筆報價；時間早於最後一筆或價格無效時忽略"""
+        ts = ts or time.time()
+        price = float(price)
+        if not np.isfinite(price) or price <= 0:
+            return False
+        with self.lock:
+            if self.count and ts <= self.ts[self.start + self.count - 1]:
+                return False
+            self._push(ts, price)
+            if self.path:
+                self._append_to_file(ts, price)
+        return True
+
+    def _append_to_file(self, ts, price):
+        try:
+            with self._file_lock(exclusive=False):
+                with open(self.path, 'ab') as f:
+                    f.write(np.array([(ts, price)], dtype=RECORD_DTYPE).tobytes())
+                    f.flush()
+                    file_records = os.fstat(f.fileno()).st_size // RECORD_DTYPE.itemsize
+            if file_records > self.capacity * COMPACT_FACTOR:
+                self._compact()
+        except OSError as e:
+            print(f"報價寫入錯誤 {self.symbol}: {e}")
+
+    def _compact(self):
+        """持有獨占鎖，將磁碟檔（含其他行程寫入的報價）改寫為最近 capacity 筆，並以此重建緩衝區"""
+        with self._file_lock(exclusive=True):
+            try:
+                records = np.fromfile(self.path, dtype=RECORD_DTYPE)
+            except (OSError, ValueError):
+                return
+            if len(records) <= self.capacity * COMPACT_FACTOR:
+                # 其他行程已經壓縮過
+                return
+            records = ordered(records)[-self.capacity:]
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            records.tofile(tmp_path)
+            os.replace(tmp_path, self.path)
+        self._reset(records)
+
+    def latest(self):
+        """最後一筆 (時間, 價格)，沒有資料時回傳 None"""
+        with self.lock:
+            if not self.count:
+                return None
+            end = self.start + self.count - 1
+            return float(self.ts[end]), float(self.prices[end])
+
+    def _since(self, seconds, now):
+        ts, prices = self.window()
+        index = int(np.searchsorted(ts, now - seconds, side='left'))
+        return ts, prices, index
+
+    def change(self, seconds, now=None):
+        """最新價格相對於 seconds 秒前（該時間點或之前最後一筆）的漲跌幅（%）"""
+        now = now or time.time()
+        with self.lock:
+            ts, prices, index = self._since(seconds, now)
+            # 需要時間範圍起點之前（或剛好在起點）的一筆報價作為基準
+            if index < len(ts) and ts[index] == now - seconds:
+                base_index = index
+            else:
+                base_index = index - 1
+            if base_index < 0 or base_index >= len(ts) - 1:
+                return None
+            base = prices[base_index]
+            return float((prices[-1] - base) / base * 100)
+
+    def volatility(self, seconds, now=None):
+        """範圍內對數報酬的標準差（%），資料不足時回傳 None"""
+        now = now or time.time()
+        with self.lock:
+            _, prices, index = self._since(seconds, now)
+            window = prices[index:]
+            if len(window) < 3:
+                return None
+            return float(np.std(np.diff(np.log(window)), ddof=1) * 100)
+
+    def range(self, seconds, now=None):
+        """範圍內的 (最低價, 最高價)，沒有資料時回傳 None"""
+        now = now or time.time()
+        with self.lock:
+            _, prices, index = self._since(seconds, now)
+            window = prices[index:]
+            if not len(window):
+                return None
+            return float(window.min()), float(window.max())
+
+    def summary(self, now=None):
+        """24 小時與 7 天的漲跌、波動與高低價"""
+        now = now or time.time()
+        day_range = self.range(DAY, now)
+        week_range = self.range(WEEK, now)
+        return {
+            'change_24h': round_or_none(self.change(DAY, now)),
+            'change_7d': round_or_none(self.change(WEEK, now)),
+            'volatility_24h': round_or_none(self.volatility(DAY, now)),
+            'volatility_7d': round_or_none(self.volatility(WEEK, now)),
+            'low_24h': day_range[0] if day_range else None,
+            'high_24h': day_range[1] if day_range else None,
+            'low_7d': week_range[0] if week_range else None,
+            'high_7d': week_range[1] if week_range else None
+        }
+
+def round_or_none(value, digits=2):
+    return None if value is None else round(value, digits)
+
+class PriceStore:
+    """所有商品的報價序列，每個商品一個 append-only 檔"""
+
+    def __init__(self, directory=None, capacity=CAPACITY):
+        self.directory = directory
+        self.capacity = capacity
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def get_series(self, symbol):
+        with self.lock:
+            series = self.series.get(symbol)
+            if series is None:
+                if self.directory:
+                    os.makedirs(self.directory, exist_ok=True)
+                    path = os.path.join(self.directory, f'{symbol_code(symbol)}.bin')
+                else:
+                    path = data_path('prices', f'{symbol_code(symbol)}.bin')
+                series = PriceSeries(symbol, path, self.capacity)
+                self.series[symbol] = series
+            return series
+
+    def record(self, symbol, price, ts=None):
+        """記錄一筆報價"""
+        return self.get_series(symbol).append(price, ts)
+
+    def summary(self, symbol, now=None):
+        """商品的漲跌摘要"""
+        return self.get_series(symbol).summary(now)
+
+def get_price_store():
+    """取得行程共用的報價庫"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore()
+    return _store
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+# 各主機的速率限制：(每秒請求數, 突發容量)
+HOST_RATE_LIMITS = {
+    'news.google.com': (0.5, 3),
+    'www.cna.com.tw': (1.0, 3),
+    'www.investing.com': (0.5, 2)
+}
+DEFAULT_RATE_LIMIT = (2.0, 5)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+class TokenBucket:
+    """權杖桶限流器，可同時供多執行緒與 asyncio 任務使用
+
+    reserve() 在鎖內預約一個權杖並回傳需要等待的秒數，實際等待在鎖外進行，
+    因此只有在超過設定速率時才會延遲，且呼叫者依預約順序取得權杖。
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.delayed_calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self):
+        """預約一個權杖，回傳需要等待的秒數"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+            self.calls += 1
+            if wait > 0:
+                self.delayed_calls += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def acquire(self):
+        """阻塞直到取得權杖，回傳實際等待秒數"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """asyncio 版本的 acquire，等待期間不佔用事件迴圈"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self):
+        """限流統計"""
+        with self.lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'calls': self.calls,
+                'delayed_calls': self.delayed_calls,
+                'total_wait': round(self.total_wait, 3),
+                'max_wait': round(self.max_wait, 3)
+            }
+
+def get_host(url_or_host):
+    """從網址取出主機名稱"""
+    if '://' in url_or_host:
+        return urlparse(url_or_host).hostname or url_or_host
+    return url_or_host
+
+def get_limiter(url_or_host):
+    """取得該主機共用的限流器"""
+    host = get_host(url_or_host)
+    limiter = _limiters.get(host)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(host)
+            if limiter is None:
+                rate, burst = HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+                limiter = TokenBucket(rate, burst)
+                _limiters[host] = limiter
+    return limiter
+
+def acquire(url_or_host):
+    """在對該主機發送請求前呼叫，回傳等待秒數"""
+    return get_limiter(url_or_host).acquire()
+
+async def acquire_async(url_or_host):
+    """asyncio 版本的 acquire"""
+    return await get_limiter(url_or_host).acquire_async()
+
+def get_stats():
+    """所有主機的限流統計"""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {host: limiter.stats() for host, limiter in limiters.items()}
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+背景資料收集排程
+依各來源的間隔執行收集，結果寫入共用快照，/start_analysis 直接讀取快照
+快照與威脅指標同時發布到 mmap 共用快照（scraper.shared_snapshot），多個 worker 行程讀取同一個檔案
+快照檔的讀取、合併與寫入持有共用快照的發布鎖，cron 的 --once 與 worker 的即時收集不會互相覆蓋
+
+用法：
+    python -m scraper.scheduler          # 常駐執行
+    python -m scraper.scheduler --once   # 只執行一次到期的來源（可供 cron 呼叫）
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from analyzer import indicator_engine, indicator_history
+from scraper import shared_snapshot, snapshot_archive
+from scraper.data_collector import COLLECTION_DEADLINE, collect_sources_concurrently, get_source_collectors
+from scraper.data_paths import data_path
+
+# 各來源的收集間隔（秒），可用 COLLECT_INTERVAL_<來源> 環境變數調整
+DEFAULT_INTERVALS = {
+    'military': 600,
+    'news': 900,
+    'economic': 1800
+}
+# 快照超過間隔的幾倍時，/start_analysis 不再使用而改為即時收集
+MAX_STALENESS_FACTOR = 3
+
+_snapshot_lock = threading.Lock()
+
+def get_interval(source):
+    """來源的收集間隔（秒）"""
+    default = DEFAULT_INTERVALS.get(source, 900)
+    return float(os.environ.get(f'COLLECT_INTERVAL_{source.upper()}', default))
+
+def get_snapshot_path():
+    """快照檔路徑"""
+    return data_path('snapshot.json')
+
+def load_snapshot():
+    """讀取快照，不存在或損毀時回傳空快照"""
+    try:
+        with open(get_snapshot_path(), 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        snapshot = {}
+    snapshot.setdefault('sources', {})
+    return snapshot
+
+def save_snapshot(snapshot):
+    """以原子方式寫入快照"""
+    path = get_snapshot_path()
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def get_due_sources(snapshot, now=None, force=False):
+    """回傳已到收集時間的來源"""
+    now = now or time.time()
+    due = []
+    for source in get_source_collectors():
+        entry = snapshot['sources'].get(source)
+        if force or entry is None or now - entry.get('collected_at', 0) >= get_interval(source):
+            due.append(source)
+    return due
+
+def run_due_sources(force=False, sources=None, deadline=None):
+    """收集到期的來源並更新快照，回傳執行摘要"""
+    with _snapshot_lock:
+        snapshot = load_snapshot()
+        due = sources or get_due_sources(snapshot, force=force)
+        if not due:
+            return {'status': 'idle', 'collected': [], 'timestamp': datetime.now().isoformat()}
+
+        print(f"排程收集: {', '.join(due)}")
+        collected = collect_sources_concurrently(deadline or COLLECTION_DEADLINE, sources=due, use_cache=False)
+        now = time.time()
+        updated = []
+        with shared_snapshot.locked():
+            # 收集期間其他行程可能已更新快照檔，重新讀取後只合併這次收集的來源
+            snapshot = load_snapshot()
+            for source in due:
+                data = collected.get(source)
+                # 逾時的部分結果不覆蓋上一次的完整資料
+                if data is None or (data.get('partial') and source in snapshot['sources']):
+                    continue
+                snapshot['sources'][source] = {'data': data, 'collected_at': now}
+                updated.append(source)
+                update_engine(source, data, now)
+                # 封存每次的收集結果，供 analyzer.backtest 重播
+                snapshot_archive.archive(source, data, now)
+
+            snapshot['updated_at'] = now
+            save_snapshot(snapshot)
+            publish_snapshot(snapshot)
+        return {
+            'status': 'completed',
+            'collected': updated,
+            'partial_sources': collected.get('collection', {}).get('partial_sources', []),
+            'breakers': collected.get('collection', {}).get('breakers', {}),
+            'timestamp': datetime.now().isoformat()
+        }
+
+def update_engine(source, data, now=None):
+    """將收集結果推送到指標引擎（新聞已在寫入文章庫時推送）"""
+    try:
+        engine = indicator_engine.get_engine()
+        if source == 'military':
+            # 與 calculate_military_threat 相同：回報 success 時計分 data 中的項目
+            engine.report_status('military', data.get('status'))
+            items = data.get('data', []) if data.get('status') == 'success' else data.get('news', [])
+            for item in items:
+                engine.add('military', item, key=item.get('title'), timestamp=now)
+        elif source == 'news':
+            engine.report_status('news', data.get('status'))
+        elif source == 'economic':
+            engine.update_source('economic', data)
+    except Exception as e:
+        print(f"指標引擎更新錯誤: {e}")
+
+def publish_snapshot(snapshot, record=True):
+    """將快照連同威脅指標發布到共用快照，回傳版本（record 為 True 時指標同時寫入指標歷史）"""
+    shared = {'sources': snapshot['sources'], 'updated_at': snapshot.get('updated_at')}
+    try:
+        from analyzer.indicator_calculator import calculate_threat_indicators
+        indicators = calculate_threat_indicators(snapshot_to_collected_data(snapshot), intervals=True)
+        shared['indicators'] = indicator_history.apply_forecast(indicators, record=record)
+    except Exception as e:
+        # 指標計算失敗時仍發布資料，由讀取端自行計算
+        print(f"快照指標計算錯誤: {e}")
+    return shared_snapshot.publish(shared)
+
+def snapshot_to_collected_data(snapshot, now=None):
+    """將快照轉為 collect_all_data_sync 的輸出格式，並附上各來源資料年齡"""
+    now = now or time.time()
+    data = {}
+    ages = {}
+    for source, entry in snapshot['sources'].items():
+        data[source] = entry['data']
+        ages[source] = round(now - entry.get('collected_at', 0), 1)
+    data['timestamp'] = datetime.fromtimestamp(snapshot.get('updated_at', now)).isoformat()
+    data['snapshot'] = {'age': ages}
+    if snapshot.get('version'):
+        data['snapshot']['version'] = snapshot['version']
+        data['snapshot']['updated_at'] = snapshot.get('updated_at')
+    if snapshot.get('indicators'):
+        data['snapshot']['indicators'] = snapshot['indicators']
+    return data
+
+def is_snapshot_usable(snapshot, now=None):
+    """快照包含所有來源且沒有過舊"""
+    now = now or time.time()
+    for source in get_source_collectors():
+        entry = snapshot['sources'].get(source)
+        if entry is None or now - entry.get('collected_at', 0) > get_interval(source) * MAX_STALENESS_FACTOR:
+            return False
+    return True
+
+def read_shared_snapshot():
+    """讀取共用快照並附上版本，尚未發布時回傳 None（回傳的資料由各 worker 共用，不要修改）"""
+    version, shared = shared_snapshot.read()
+    if shared is None:
+        return None
+    snapshot = dict(shared)
+    snapshot['version'] = version
+    return snapshot
+
+def get_collected_data():
+    """取得分析用的資料：優先讀取共用快照，其次快照檔，兩者缺漏或過舊時才即時收集"""
+    snapshot = read_shared_snapshot()
+    if snapshot is not None and is_snapshot_usable(snapshot):
+        return snapshot_to_collected_data(snapshot)
+
+    with shared_snapshot.locked():
+        snapshot = load_snapshot()
+        usable = is_snapshot_usable(snapshot)
+        if usable:
+            # 由其他行程（例如 --once 的 cron）寫入快照檔但尚未發布時，發布給其他 worker（該行程已記錄指標歷史）
+            publish_snapshot(snapshot, record=False)
+    if usable:
+        snapshot = read_shared_snapshot() or snapshot
+    else:
+        print("快照不可用，即時收集資料...")
+        run_due_sources()
+        snapshot = load_snapshot()
+    return snapshot_to_collected_data(snapshot)
+
+def run_forever(poll_interval=30):
+    """常駐模式：定期檢查並收集到期的來源"""
+    print("資料收集排程已啟動")
+    while True:
+        try:
+            result = run_due_sources()
+            if result['collected']:
+                print(f"快照已更新: {', '.join(result['collected'])}")
+        except Exception as e:
+            print(f"排程收集錯誤: {e}")
+        time.sleep(poll_interval)
+
+def main():
+    parser = argparse.ArgumentParser(description='背景資料收集排程')
+    parser.add_argument('--once', action='store_true', help='只執行一次到期的來源')
+    parser.add_argument('--force', action='store_true', help='忽略間隔，收集所有來源')
+    parser.add_argument('--poll', type=float, default=30, help='常駐模式的檢查間隔（秒）')
+    args = parser.parse_args()
+
+    if args.once or args.force:
+        print(json.dumps(run_due_sources(force=args.force), ensure_ascii=False))
+    else:
+        run_forever(args.poll)
+
+if __name__ == '__main__':
+    main()
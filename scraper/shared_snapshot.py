@@ -0,0 +1,219 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from scraper.data_paths import data_path
+
+# 檔頭：識別碼、序號（寫入中為奇數，版本 = 序號 // 2）、本文長度、發布時間
+MAGIC = b'TDSNAP01'
+HEADER = struct.Struct('<8sQQd')
+INITIAL_CAPACITY = 1024 * 1024
+# 讀到寫入中的快照時最多重試的次數
+READ_RETRIES = 200
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+class SharedSnapshot:
+    """以 mmap 檔在多個 worker 行程間共用最新快照（共用檔案，不是零複製）
+
+    發布者以序號鎖（seqlock）寫入：寫入前後各遞增一次序號，讀者看到奇數或前後序號不同時重試。
+    只有持有檔案鎖的發布者會建立或擴大檔案，讀者以唯讀方式對映。
+    共用的只有本文（JSON）的位元組，存放在作業系統的 page cache；每個 worker 行程各自解碼並持有一份物件，
+    版本沒有變更時直接回傳已解碼的物件，每個版本在每個行程只解碼一次。
+    檔案鎖也供排程在讀取、合併與寫入快照檔時跨行程互斥（見 locked）。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_path('snapshot.shm')
+        # 可重入：持有 locked() 時仍可呼叫 publish
+        self.lock = threading.RLock()
+        # 目前執行緒持有檔案鎖的層數，只在第一層取得檔案鎖（同一行程再次 flock 新開的檔案會卡住）
+        self.held = 0
+        self.file = None
+        self.writable = False
+        self.mm = None
+        self.cached_version = None
+        self.cached_value = None
+
+    def _open(self, writable):
+        """開啟檔案；發布者以讀寫模式開啟（必要時建立），讀者以唯讀模式開啟"""
+        if self.file is not None and (self.writable or not writable):
+            return
+        self._close()
+        if writable:
+            self.file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        else:
+            self.file = os.fdopen(os.open(self.path, os.O_RDONLY), 'rb')
+        self.writable = writable
+
+    def _map(self):
+        """以目前的檔案大小對映（不改變檔案大小），檔案還沒有檔頭時回傳 None"""
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            return None
+        if self.mm is None or len(self.mm) != size:
+            if self.mm is not None:
+                self.mm.close()
+            access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+            self.mm = mmap.mmap(self.file.fileno(), size, access=access)
+        return self.mm
+
+    def _reserve(self, min_size):
+        """確保檔案至少有 min_size 位元組（只由持有檔案鎖的發布者呼叫）"""
+        size = os.fstat(self.file.fileno()).st_size
+        if size < min_size:
+            capacity = max(INITIAL_CAPACITY, size)
+            while capacity < min_size:
+                capacity *= 2
+            self.file.truncate(capacity)
+
+    def acquire(self):
+        """取得跨行程的發布鎖（沒有 fcntl 的平台只在行程內互斥），可重入"""
+        self.lock.acquire()
+        try:
+            if not self.held:
+                self._open(writable=True)
+                if fcntl is not None:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            self.held += 1
+        except BaseException:
+            self.lock.release()
+            raise
+
+    def release(self):
+        try:
+            self.held -= 1
+            if not self.held and fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.lock.release()
+
+    def publish(self, value):
+        """寫入新快照，回傳版本"""
+        payload = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        self.acquire()
+        try:
+            self._reserve(HEADER.size + len(payload))
+            mm = self._map()
+            magic, seq, _, _ = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                seq = 0
+            if seq % 2:
+                # 上一個發布者寫到一半就中斷，從下一個偶數序號繼續
+                seq += 1
+            HEADER.pack_into(mm, 0, MAGIC, seq + 1, 0, time.time())
+            mm[HEADER.size:HEADER.size + len(payload)] = payload
+            HEADER.pack_into(mm, 0, MAGIC, seq + 2, len(payload), time.time())
+        finally:
+            self.release()
+        return (seq + 2) // 2
+
+    def read(self):
+        """讀取最新快照，回傳 (版本, 資料)；資料唯讀，不要修改。尚未發布時回傳 (0, None)"""
+        with self.lock:
+            if not os.path.exists(self.path):
+                return 0, None
+            self._open(writable=False)
+            mm = self._map()
+            if mm is None:
+                return 0, None
+            for _ in range(READ_RETRIES):
+                magic, seq, length, _ = HEADER.unpack_from(mm, 0)
+                if magic != MAGIC or seq == 0:
+                    return 0, None
+                if seq % 2:
+                    time.sleep(0.001)
+                    continue
+                version = seq // 2
+                if version == self.cached_version:
+                    return version, self.cached_value
+                if HEADER.size + length > len(mm):
+                    # 發布者擴大了檔案，重新對映
+                    mm = self._map()
+                    continue
+                payload = mm[HEADER.size:HEADER.size + length]
+                if HEADER.unpack_from(mm, 0)[1] != seq:
+                    continue
+                self.cached_value = json.loads(payload)
+                self.cached_version = version
+                return version, self.cached_value
+            print("共用快照持續寫入中，略過")
+            return 0, None
+
+    def version(self):
+        """目前的版本，尚未發布時為 0"""
+        with self.lock:
+            if not os.path.exists(self.path):
+                return 0
+            self._open(writable=False)
+            mm = self._map()
+            if mm is None:
+                return 0
+            magic, seq, _, _ = HEADER.unpack_from(mm, 0)
+            return seq // 2 if magic == MAGIC else 0
+
+    def close(self):
+        with self.lock:
+            if not self.held:
+                self._close()
+
+    def _close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.writable = False
+
+def get_shared_snapshot():
+    """取得行程共用的快照對映（fork 後各 worker 會各自重新開啟）"""
+    global _snapshot
+    pid = os.getpid()
+    if _snapshot is None or _snapshot[0] != pid:
+        with _snapshot_lock:
+            if _snapshot is None or _snapshot[0] != pid:
+                _snapshot = (pid, SharedSnapshot())
+    return _snapshot[1]
+
+def publish(value):
+    """發布快照，失敗時回傳 None"""
+    try:
+        return get_shared_snapshot().publish(value)
+    except (OSError, ValueError, TypeError) as e:
+        print(f"共用快照發布錯誤: {e}")
+        return None
+
+@contextmanager
+def locked():
+    """跨行程持有發布鎖（期間可呼叫 publish）；無法開啟共用快照時只在行程內互斥"""
+    snapshot = get_shared_snapshot()
+    try:
+        snapshot.acquire()
+    except OSError as e:
+        print(f"共用快照鎖定錯誤: {e}")
+        with snapshot.lock:
+            yield
+        return
+    try:
+        yield
+    finally:
+        snapshot.release()
+
+def read():
+    """讀取共用快照，回傳 (版本, 資料)；無法使用時回傳 (0, None)"""
+    try:
+        return get_shared_snapshot().read()
+    except (OSError, ValueError) as e:
+        print(f"共用快照讀取錯誤: {e}")
+        return 0, None
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from scraper.data_paths import data_path
+
+COMPRESS_LEVEL = 6
+# 每次收集都不同、與內容無關的欄位（收集時間、快取狀態與資料年齡、本次新增數），不封存也不計入雜湊
+VOLATILE_KEYS = frozenset({'timestamp', 'cache', 'age', 'new_count'})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS collections (
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (ts, source)
+);
+"""
+
+_archive = None
+_archive_lock = threading.Lock()
+
+def strip_volatile(value):
+    """移除各層 dict 中的 VOLATILE_KEYS，只留下收集到的內容"""
+    if isinstance(value, dict):
+        return {key: strip_volatile(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [strip_volatile(item) for item in value]
+    return value
+
+class SnapshotArchive:
+    """收集結果的歷史封存（SQLite），供回測重播
+
+    每次收集只記錄更新的來源；內容去除 VOLATILE_KEYS 後以雜湊去重並以 zlib 壓縮，
+    沒有變化的來源不會重複儲存。某個時間點的快照為各來源在該時間之前最後一次的收集結果。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_path('snapshot_archive.db')
+        self.local = threading.local()
+        self._connect()
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self.local.conn = conn
+        return conn
+
+    def record(self, source, data, ts=None):
+        """封存一個來源的收集結果（不含 VOLATILE_KEYS）"""
+        payload = json.dumps(strip_volatile(data), ensure_ascii=False, sort_keys=True).encode('utf-8')
+        digest = hashlib.sha1(payload).hexdigest()
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)',
+                         (digest, zlib.compress(payload, COMPRESS_LEVEL)))
+            conn.execute('INSERT OR REPLACE INTO collections (ts, source, hash) VALUES (?, ?, ?)',
+                         (ts or time.time(), source, digest))
+        return digest
+
+    def iter_snapshots(self, since=None, until=None):
+        """依時間順序產生 (時間, 快照)；快照為 {來源: 資料}，未變更的來源與前一個快照共用同一物件（唯讀）"""
+        conn = self._connect()
+        current = {}
+        # 各來源目前的雜湊；只保留每個來源當下的一份解碼結果，雜湊改變時才解碼並替換
+        digests = {}
+        if since is not None:
+            # 起點之前各來源最後一次的結果
+            rows = conn.execute(
+                'SELECT source, hash FROM collections c WHERE ts = '
+                '(SELECT MAX(ts) FROM collections WHERE source = c.source AND ts < ?)', (since,)
+            ).fetchall()
+            for source, digest in rows:
+                digests[source] = digest
+                current[source] = self._blob(digest)
+
+        conditions = []
+        params = []
+        if since is not None:
+            conditions.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('ts < ?')
+            params.append(until)
+        sql = 'SELECT ts, source, hash FROM collections'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY ts'
+
+        last_ts = None
+        for ts, source, digest in conn.execute(sql, params).fetchall():
+            if last_ts is not None and ts != last_ts:
+                yield last_ts, dict(current)
+            if digests.get(source) != digest:
+                digests[source] = digest
+                current[source] = self._blob(digest)
+            last_ts = ts
+        if last_ts is not None:
+            yield last_ts, dict(current)
+
+    def _blob(self, digest):
+        row = self._connect().execute('SELECT data FROM blobs WHERE hash = ?', (digest,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else {}
+
+    def count(self):
+        """封存的收集次數"""
+        return self._connect().execute('SELECT COUNT(DISTINCT ts) FROM collections').fetchone()[0]
+
+    def close(self):
+        """關閉目前執行緒的連線"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+def get_snapshot_archive():
+    """取得行程共用的快照封存"""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = SnapshotArchive()
+    return _archive
+
+def archive(source, data, ts=None):
+    """封存收集結果（封存無法使用時不影響收集）"""
+    try:
+        return get_snapshot_archive().record(source, data, ts)
+    except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+        print(f"快照封存錯誤: {e}")
+        return None
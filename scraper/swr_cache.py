@@ -0,0 +1,163 @@
+import copy
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+from scraper.data_paths import data_path
+
+# 各來源的新鮮時間（秒），可用 CACHE_TTL_<來源> 環境變數調整
+DEFAULT_TTLS = {
+    'military': 300,
+    'news': 600,
+    'economic': 1800
+}
+DEFAULT_TTL = 600
+# 過期超過此秒數後不再先回傳舊資料，而是同步重新收集
+MAX_STALE = 24 * 3600
+
+# 代表資料不可靠的狀態，這類結果不會成為「上次成功資料」
+BAD_STATUSES = {'fallback', 'error', 'timeout'}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_ttl(key):
+    """來源的新鮮時間（秒）"""
+    source = key.split(':', 1)[0]
+    return float(os.environ.get(f'CACHE_TTL_{source.upper()}', DEFAULT_TTLS.get(source, DEFAULT_TTL)))
+
+def is_good(value):
+    """收集結果是否為真實資料（非備用、錯誤或逾時）"""
+    if not isinstance(value, dict):
+        return value is not None
+    return 'error' not in value and value.get('status') not in BAD_STATUSES and not value.get('partial')
+
+class SWRCache:
+    """Stale-while-revalidate 快取
+
+    新鮮資料直接回傳；過期資料先回傳，同時只啟動一個背景更新；
+    收集失敗時以上次成功的資料取代寫死的備用數值。上次成功的資料會寫入磁碟，冷啟動後仍可使用。
+    每個 key 存成目錄中的一個檔案，寫入時只改寫該 key 的檔案。
+    """
+
+    def __init__(self, path=None, max_stale=MAX_STALE):
+        self.path = path or data_path('swr_cache')
+        self.max_stale = max_stale
+        self.lock = threading.Lock()
+        self.refreshing = set()
+        self.entries = self._load()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, f"{quote(key, safe='')}.json")
+
+    def _load(self):
+        entries = {}
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.path, name), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                entries[entry['key']] = {'value': entry['value'], 'stored_at': entry['stored_at']}
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        return entries
+
+    def _save(self, key, entry):
+        """以原子方式寫入單一 key 的檔案"""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'value': entry['value'], 'stored_at': entry['stored_at']}, f,
+                          ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"快取寫入錯誤: {e}")
+
+    def get(self, key, loader):
+        """依新鮮度回傳 (資料, 快取資訊)"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+
+        if entry is not None:
+            age = now - entry['stored_at']
+            if age < get_ttl(key):
+                return copy.deepcopy(entry['value']), {'status': 'hit', 'age': round(age, 1)}
+            if age < get_ttl(key) + self.max_stale:
+                self._refresh_in_background(key, loader)
+                return copy.deepcopy(entry['value']), {'status': 'stale', 'age': round(age, 1)}
+
+        return self.refresh(key, loader)
+
+    def refresh(self, key, loader):
+        """同步收集並更新快取，失敗時回傳上次成功的資料"""
+        value = loader()
+        return self.put(key, value)
+
+    def put(self, key, value):
+        """寫入新的收集結果，回傳 (應使用的資料, 快取資訊)"""
+        now = time.time()
+        if is_good(value):
+            # 存入副本，呼叫端修改回傳的資料不影響快取
+            entry = {'value': copy.deepcopy(value), 'stored_at': now}
+            with self.lock:
+                self.entries[key] = entry
+                self._save(key, entry)
+            return value, {'status': 'miss', 'age': 0.0}
+
+        last_good = self.get_last_good(key)
+        if last_good is not None:
+            value, stored_at = last_good
+            return value, {'status': 'last_good', 'age': round(now - stored_at, 1)}
+        return value, {'status': 'miss', 'age': 0.0}
+
+    def get_last_good(self, key):
+        """上次成功的資料與其時間，沒有時回傳 None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            return copy.deepcopy(entry['value']), entry['stored_at']
+
+    def _refresh_in_background(self, key, loader):
+        """同一個 key 同時只有一個背景更新"""
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                self.refresh(key, loader)
+            except Exception as e:
+                print(f"背景更新錯誤 {key}: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"swr-refresh-{key}", daemon=True).start()
+
+def get_cache():
+    """取得行程共用的快取"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SWRCache()
+    return _cache
+
+def with_cache_info(value, info):
+    """在收集結果中附上快取狀態與資料年齡"""
+    if isinstance(value, dict):
+        value = dict(value)
+        value['cache'] = info
+    return value
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+啟動與導入耗時分析
+STARTUP_PROFILE=1 時記錄每個模組的導入耗時（自身與累計），以及啟動各階段的耗時與記憶體
+
+用法：
+    python startup_profiler.py vercel_app        # 分析導入 vercel_app 的成本
+    STARTUP_PROFILE=1 python vercel_app.py       # 啟動時輸出報告，延遲載入時也會輸出
+只使用標準函式庫，必須在其他模組之前導入。
+"""
+
+import contextlib
+import importlib
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_started = time.perf_counter()
+_timer = None
+
+class ImportTimer:
+    """sys.meta_path 上的 finder，包裝每個新模組的 exec_module 以計時"""
+
+    def __init__(self):
+        self.records = {}
+        self.stages = []
+        self.local = threading.local()
+
+    def find_spec(self, fullname, path=None, target=None):
+        # 交給其他 finder 尋找，避免遞迴
+        if getattr(self.local, 'finding', False):
+            return None
+        self.local.finding = True
+        try:
+            spec = None
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+        finally:
+            self.local.finding = False
+
+        loader = spec.loader if spec is not None else None
+        # 內建與凍結模組的 loader 是類別本身，不能修改
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+            loader.exec_module = self._timed(fullname, loader.exec_module)
+        return spec
+
+    def _timed(self, fullname, exec_module):
+        def timed_exec_module(module):
+            stack = self.local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                self.records[fullname] = (elapsed - children, elapsed)
+        return timed_exec_module
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """記錄一個啟動階段的耗時"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - started))
+
+    def report(self, limit=25, title='啟動分析'):
+        """輸出最耗時的模組（依累計時間）與各階段耗時"""
+        print(f"===== {title}：啟動至今 {(time.perf_counter() - _started) * 1000:.1f} ms，"
+              f"記憶體峰值 {get_peak_memory_mb():.1f} MB，導入 {len(self.records)} 個模組 =====")
+        print(f"{'自身(ms)':>10}{'累計(ms)':>10}  模組")
+        ranked = sorted(self.records.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (self_time, cumulative) in ranked[:limit]:
+            print(f"{self_time * 1000:>10.1f}{cumulative * 1000:>10.1f}  {name}")
+        for name, elapsed in self.stages:
+            print(f"階段 {name}: {elapsed * 1000:.1f} ms")
+
+def get_peak_memory_mb():
+    """行程的記憶體峰值（MB），無法取得時回傳 0"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以位元組為單位，Linux 以 KB 為單位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def is_enabled():
+    """是否啟用啟動分析（STARTUP_PROFILE 環境變數）"""
+    return os.environ.get('STARTUP_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+def install():
+    """開始記錄之後的模組導入"""
+    global _timer
+    if _timer is None:
+        _timer = ImportTimer()
+        sys.meta_path.insert(0, _timer)
+    return _timer
+
+def install_from_env():
+    """STARTUP_PROFILE 啟用時開始記錄"""
+    if is_enabled():
+        install()
+
+@contextlib.contextmanager
+def stage(name):
+    """記錄一個啟動階段；未啟用時不做任何事"""
+    if _timer is None:
+        yield
+        return
+    with _timer.stage(name):
+        yield
+
+def report(limit=25, title='啟動分析'):
+    """輸出報告；未啟用時不做任何事"""
+    if _timer is not None:
+        _timer.report(limit, title)
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # 讓被分析的模組導入 startup_profiler 時使用同一份記錄
+    sys.modules.setdefault('startup_profiler', sys.modules[__name__])
+    install()
+    for name in sys.argv[1:]:
+        with stage(f'import {name}'):
+            importlib.import_module(name)
+    report(limit=40)
+
+if __name__ == '__main__':
+    main()
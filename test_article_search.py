@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試文章全文搜尋
+筆數上限應夾在 1 與 MAX_LIMIT 之間，負數或 0 不可變成不限筆數
+"""
+
+import sys
+import os
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scraper import article_search, article_store
+
+def make_store(monkeypatch, tmp_path, count):
+    """建立暫存的文章資料庫並寫入 count 篇含相同關鍵字的文章"""
+    store = article_store.ArticleStore(str(tmp_path / 'articles.db'))
+    monkeypatch.setattr(article_store, '_store', store)
+    store.upsert_articles([
+        {'title': f'共軍台海演習 第{i}篇', 'description': '國防部嚴密監控', 'url': f'https://a.example/{i}',
+         'source': '測試'}
+        for i in range(count)
+    ], category='military')
+    return store
+
+def test_limit_lower_bound(monkeypatch, tmp_path):
+    """limit 為負數或 0 時只回傳一篇"""
+    make_store(monkeypatch, tmp_path, 5)
+    assert len(article_search.search('台海演習', limit=5)) == 5
+    assert len(article_search.search('台海演習', limit=-1)) == 1
+    assert len(article_search.search('台海演習', limit=0)) == 1
+
+def test_limit_upper_bound(monkeypatch, tmp_path):
+    """limit 超過 MAX_LIMIT 時只回傳 MAX_LIMIT 篇"""
+    make_store(monkeypatch, tmp_path, article_search.MAX_LIMIT + 5)
+    assert len(article_search.search('台海演習', limit=10 ** 6)) == article_search.MAX_LIMIT
+
+def test_tokenize_bigrams():
+    """中文切成相鄰兩字，英數字以詞為單位；查詢的每個詞都需出現"""
+    assert article_search.tokenize('台海 F-16') == ['台海', 'f', '16']
+    assert article_search.tokenize('共軍演習') == ['共軍', '軍演', '演習']
+    assert article_search.build_match('台海演習 軍') == '"台海 海演 演習" AND "軍"*'
+
+def test_search_window_and_category(monkeypatch, tmp_path):
+    """時間範圍與分類篩選，最相關（標題命中）的在前"""
+    store = article_store.ArticleStore(str(tmp_path / 'articles.db'))
+    monkeypatch.setattr(article_store, '_store', store)
+    store.upsert_articles([
+        {'title': '央行升息 台股震盪', 'description': '共軍演習影響有限', 'url': 'https://a.example/1',
+         'published_date': '2020-01-01T00:00:00'},
+        {'title': '共軍演習 國防部監控', 'url': 'https://a.example/2', 'category': 'military'},
+        {'title': '經濟部：共軍演習衝擊供應鏈', 'url': 'https://a.example/3', 'category': 'economic'},
+    ])
+    titles = [result['title'] for result in article_search.search('共軍演習')]
+    assert titles[-1] == '央行升息 台股震盪'
+    assert len(article_search.search('共軍演習', hours=24)) == 2
+    assert [result['title'] for result in article_search.search('共軍演習', category='economic')] == \
+        ['經濟部：共軍演習衝擊供應鏈']
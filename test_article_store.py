@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試文章庫
+網址與標題去重、每日重複出現的例行標題，以及舊版資料庫的遷移
+"""
+
+import sys
+import os
+import sqlite3
+import time
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scraper import article_store
+from scraper.article_store import TITLE_BUCKET, ArticleStore
+
+def article(title, url, published_at):
+    return {'title': title, 'url': url, 'source': '國防部', 'published_date': published_at}
+
+def test_duplicates_within_bucket(tmp_path):
+    """相同網址或同一天的相同標題只存一篇，再次出現時更新 seen_count"""
+    store = ArticleStore(str(tmp_path / 'articles.db'))
+    now = time.time()
+    first = article('國防部即時軍事動態', 'https://a.example/1', now)
+    assert len(store.upsert_articles([first])) == 1
+    assert store.upsert_articles([dict(first, url='https://a.example/1?utm_source=x')]) == []
+    assert store.upsert_articles([article('國防部即時軍事動態 - 中央社', 'https://b.example/1', now)]) == []
+    assert store.count() == 1
+    assert store.query()[0]['seen_count'] == 3
+
+def test_recurring_title_on_later_day(tmp_path, monkeypatch):
+    """每天重複的例行標題在不同日期各存一篇，時間窗查詢讀得到最新的一篇"""
+    store = ArticleStore(str(tmp_path / 'articles.db'))
+    monkeypatch.setattr(article_store, '_store', store)
+    now = time.time()
+    old = article('國防部每日簡報', 'https://a.example/day1', now - 3 * TITLE_BUCKET)
+    today = article('國防部每日簡報', 'https://a.example/day4', now)
+    store.upsert_articles([old])
+    assert store.filter_new([today]) == [today]
+    assert len(store.upsert_articles([today])) == 1
+    assert store.filter_new([today]) == []
+    news = article_store.load_news_data(hours=48)
+    assert [item['url'] for item in news['data']] == ['https://a.example/day4']
+
+def test_migrates_global_title_index(tmp_path):
+    """舊版資料庫的全域標題唯一索引改為每個時間區間"""
+    path = str(tmp_path / 'articles.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE articles (
+        id INTEGER PRIMARY KEY, canonical_url TEXT, title_hash TEXT NOT NULL, url TEXT, title TEXT NOT NULL,
+        description TEXT, source TEXT, category TEXT, published_at REAL NOT NULL, collected_at REAL NOT NULL,
+        last_seen_at REAL NOT NULL, seen_count INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE UNIQUE INDEX idx_articles_title_hash ON articles(title_hash);
+    """)
+    now = time.time()
+    conn.execute("INSERT INTO articles (title_hash, title, published_at, collected_at, last_seen_at) "
+                 "VALUES (?, '國防部每日簡報', ?, ?, ?)",
+                 (article_store.title_hash('國防部每日簡報'), now - 3 * TITLE_BUCKET, now, now))
+    conn.commit()
+    conn.close()
+
+    store = ArticleStore(path)
+    assert store.query()[0]['title'] == '國防部每日簡報'
+    assert len(store.upsert_articles([article('國防部每日簡報', '', now)])) == 1
+    indexes = {row[1] for row in store._connect().execute('PRAGMA index_list(articles)')}
+    assert 'idx_articles_title_hash' not in indexes
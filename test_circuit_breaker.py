@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試斷路器
+連續失敗或失敗率過高時斷路、冷卻後只放行一個試探請求、試探失敗時冷卻時間加倍，以及試探名額的釋放
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from scraper import circuit_breaker
+from scraper.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可控制的 monotonic 時鐘"""
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+def fail():
+    raise ConnectionError('連線失敗')
+
+def trip(breaker):
+    """連續失敗直到斷路"""
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+def test_opens_after_consecutive_failures(clock):
+    """連續失敗達門檻時斷路，斷路期間請求不送出"""
+    breaker = CircuitBreaker('a.example', failure_threshold=3, cooldown=30)
+    breaker.call(lambda: 'ok')
+    trip(breaker)
+    assert breaker.state == OPEN
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 1)
+    assert calls == []
+    assert breaker.stats()['rejected'] == 1
+    assert breaker.stats()['retry_in'] == 30.0
+
+def test_opens_on_failure_rate(clock):
+    """沒有連續失敗但近期失敗率達 FAILURE_RATE 時也斷路"""
+    breaker = CircuitBreaker('a.example', failure_threshold=100)
+    for i in range(circuit_breaker.MIN_CALLS - 1):
+        if i % 2:
+            breaker.record_failure(0.1)
+        else:
+            breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+
+def test_half_open_probe_success_closes(clock):
+    """冷卻結束後只放行一個試探請求，成功則恢復並重設冷卻時間"""
+    breaker = CircuitBreaker('a.example', cooldown=30)
+    trip(breaker)
+    clock[0] += 29
+    assert breaker.is_open()
+    assert not breaker.allow()
+    clock[0] += 1
+    assert not breaker.is_open()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # 試探進行中，其他請求被拒絕
+    assert breaker.is_open()
+    assert not breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.cooldown == 30
+    assert breaker.call(lambda: 'ok') == 'ok'
+
+def test_probe_failure_doubles_cooldown(clock):
+    """試探失敗時重新斷路且冷卻時間加倍，最長 MAX_COOLDOWN；恢復後回到原本的冷卻時間"""
+    breaker = CircuitBreaker('a.example', cooldown=30)
+    trip(breaker)
+    expected = 30
+    for _ in range(8):
+        clock[0] += breaker.cooldown
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+        expected = min(expected * 2, circuit_breaker.MAX_COOLDOWN)
+        assert breaker.state == OPEN
+        assert breaker.cooldown == expected
+    assert breaker.cooldown == circuit_breaker.MAX_COOLDOWN
+    clock[0] += breaker.cooldown
+    breaker.call(lambda: 'ok')
+    assert (breaker.state, breaker.cooldown) == (CLOSED, 30)
+
+def test_failure_response_counts_as_failure(clock):
+    """is_failure 為 True 的回應視為失敗，但仍回傳給呼叫端"""
+    breaker = CircuitBreaker('a.example', failure_threshold=2)
+    blocked = SimpleNamespace(status_code=429)
+    for _ in range(2):
+        assert breaker.call(lambda: blocked, is_failure=circuit_breaker.is_failure_response) is blocked
+    assert breaker.state == OPEN
+    assert not circuit_breaker.is_failure_response(SimpleNamespace(status_code=404))
+
+def test_interrupted_probe_releases_slot(clock):
+    """試探請求被非 Exception 的中斷結束時釋放名額，下一個請求可以試探"""
+    breaker = CircuitBreaker('a.example', cooldown=30)
+    trip(breaker)
+    clock[0] += 30
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        breaker.call(interrupted)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+def test_breaker_per_host(monkeypatch):
+    """同一主機共用斷路器"""
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    breaker = circuit_breaker.get_breaker('https://www.cna.com.tw/list/aall.aspx')
+    assert circuit_breaker.get_breaker('www.cna.com.tw') is breaker
+    assert circuit_breaker.get_breaker('https://example.com') is not breaker
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試綜合威脅機率的信賴區間
+區間應可重現、以回報的綜合機率為中心，並標示使用預設值的來源
+"""
+
+import sys
+import os
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from analyzer.confidence import SOURCES, confidence_intervals
+from analyzer.indicator_calculator import WEIGHTS, calculate_threat_indicators
+
+SCORES = {'military': 55.0, 'economic': 43.0, 'news': 60.0, 'stock': 15.0}
+LIVE = {source: 'success' for source in SOURCES}
+SAMPLES = 20000
+
+def point(scores, weights=WEIGHTS):
+    return sum(scores[source] * weights[source] for source in SOURCES)
+
+def test_same_seed_same_interval():
+    """相同的種子產生相同的區間，不同的種子結果不同"""
+    first = confidence_intervals(SCORES, LIVE, WEIGHTS, samples=SAMPLES, seed=7)
+    assert confidence_intervals(SCORES, LIVE, WEIGHTS, samples=SAMPLES, seed=7) == first
+    assert confidence_intervals(SCORES, LIVE, WEIGHTS, samples=SAMPLES, seed=8) != first
+
+def test_live_interval_contains_point():
+    """所有來源皆為即時資料時，區間包含回報的綜合機率"""
+    interval = confidence_intervals(SCORES, LIVE, WEIGHTS, samples=SAMPLES)
+    assert interval['low'] <= point(SCORES) <= interval['high']
+    assert interval['fallback_sources'] == []
+
+@pytest.mark.parametrize('statuses', [{}, {'military': 'success'}, {'news': 'error', 'stock': 'success'}])
+def test_fallback_interval_is_centered(statuses):
+    """使用預設值的來源以回報值為中心抽樣，綜合機率位於區間中央"""
+    result = calculate_threat_indicators(
+        {source: {'status': status} for source, status in statuses.items()}, intervals=True
+    )
+    interval = result['confidence_interval']
+    overall = result['overall_threat_probability']
+    assert interval['low'] <= overall <= interval['high']
+    assert abs(interval['median'] - overall) <= 0.5
+    assert abs((interval['low'] + interval['high']) / 2 - overall) <= 0.5
+    assert interval['fallback_sources'] == [source for source in SOURCES if statuses.get(source) != 'success']
+
+def test_zero_weights():
+    """權重全為 0 時綜合機率恆為 0，不產生 NaN"""
+    interval = confidence_intervals(SCORES, LIVE, {source: 0.0 for source in SOURCES}, samples=SAMPLES)
+    assert (interval['low'], interval['high'], interval['mean'], interval['std']) == (0.0, 0.0, 0.0, 0.0)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試 RSS 增量收集
+條件式請求標頭、高水位與最近 entry id、狀態檔的讀寫，以及 304 時不解析也不輸出舊文章
+"""
+
+import sys
+import os
+import time
+from types import SimpleNamespace
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from scraper import article_store, data_collector, feed_state, page_cache
+
+FEED_URL = 'https://www.cna.com.tw/rss/pol.xml'
+
+def entry(entry_id, hour, title=None):
+    return {'id': entry_id, 'title': title or entry_id, 'link': f'https://a.example/{entry_id}',
+            'published_parsed': time.gmtime(1_700_000_000 + hour * 3600)}
+
+@pytest.fixture
+def states(tmp_path, monkeypatch):
+    """以暫存目錄存放狀態檔"""
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    feed_state.reset_states()
+    yield
+    feed_state.reset_states()
+
+def test_conditional_headers(states):
+    """有 ETag 或 Last-Modified 時送出對應的條件式標頭；新回應沒有時保留舊值"""
+    state = feed_state.get_feed_state(FEED_URL)
+    assert feed_state.conditional_headers(state) == {}
+    feed_state.update_state(state, {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}, [])
+    assert feed_state.conditional_headers(state) == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    feed_state.update_state(state, {}, [])
+    assert state['etag'] == '"v1"'
+
+def test_watermark_selects_only_new_entries(states):
+    """只回傳比高水位新且未見過的 entry，依發布時間新到舊排序"""
+    state = feed_state.get_feed_state(FEED_URL)
+    first = feed_state.select_new_entries(state, [entry('a', 1), entry('c', 3), entry('b', 2)])
+    assert [item['id'] for item in first] == ['c', 'b', 'a']
+    feed_state.update_state(state, {}, first)
+    assert (state['last_entry_id'], state['recent_ids']) == ('c', ['c', 'b', 'a'])
+
+    # 已見過的 entry、比高水位舊的 entry 略過；沒有發布時間的 entry 以 id 判斷
+    undated = {'id': 'u', 'title': 'u'}
+    second = feed_state.select_new_entries(state, [entry('c', 3), entry('old', 0), entry('d', 4), undated])
+    assert [item['id'] for item in second] == ['d', 'u']
+    feed_state.update_state(state, {}, second)
+    assert feed_state.select_new_entries(state, [undated]) == []
+
+def test_recent_ids_are_limited(states, monkeypatch):
+    """最近 entry id 只保留 RECENT_IDS_LIMIT 個"""
+    monkeypatch.setattr(feed_state, 'RECENT_IDS_LIMIT', 3)
+    state = feed_state.get_feed_state(FEED_URL)
+    feed_state.update_state(state, {}, [entry(str(i), i) for i in range(5)])
+    assert state['recent_ids'] == ['0', '1', '2']
+
+def test_state_round_trip(states):
+    """狀態寫入檔案後，重新讀取時還原"""
+    state = feed_state.get_feed_state(FEED_URL)
+    feed_state.update_state(state, {'ETag': '"v1"'}, [entry('a', 1)])
+    feed_state.save_states()
+    feed_state.reset_states()
+    assert feed_state.get_feed_state(FEED_URL) == state
+
+def test_not_modified_skips_parsing(states, tmp_path, monkeypatch):
+    """第二次收集送出條件式請求，304 時不解析、不輸出；有新 entry 時只輸出新的"""
+    monkeypatch.setattr(article_store, '_store', article_store.ArticleStore(str(tmp_path / 'articles.db')))
+    monkeypatch.setattr(page_cache, '_cache', page_cache.PageCache(str(tmp_path / 'page_cache.db')))
+    monkeypatch.setattr(data_collector.parse_pool, 'get_pool', lambda: None)
+
+    feeds = {}
+    requests = []
+    parsed = []
+
+    def fetch(url, headers=None):
+        requests.append((url, headers))
+        if url != FEED_URL:
+            return SimpleNamespace(status_code=404, headers={}, content=b'')
+        if headers.get('If-None-Match') == feeds['etag']:
+            return SimpleNamespace(status_code=304, headers={}, content=b'')
+        return SimpleNamespace(status_code=200, headers={'ETag': feeds['etag'], 'Content-Type': 'application/xml'},
+                               content=feeds['etag'].encode('utf-8'))
+
+    def parse_feed(content, content_type=None):
+        parsed.append(content)
+        return {'title': '中央社', 'entries': feeds['entries']}
+
+    monkeypatch.setattr(data_collector, 'fetch', fetch)
+    monkeypatch.setitem(data_collector.parse_pool.PARSERS, 'rss', parse_feed)
+
+    feeds.update(etag='"v1"', entries=[entry('a', 1, '台海情勢升溫'), entry('b', 2, '兩岸交流暫停')])
+    first = data_collector.scrape_rss_news()
+    assert [article['title'] for article in first['opinion']] == ['兩岸交流暫停', '台海情勢升溫']
+    store = article_store.get_article_store()
+    store.upsert_articles(first['opinion'])
+
+    requests.clear()
+    assert data_collector.scrape_rss_news() is None
+    assert (FEED_URL, {'If-None-Match': '"v1"'}) in requests
+    assert len(parsed) == 1
+
+    feeds.update(etag='"v2"', entries=feeds['entries'] + [entry('c', 3, '中國軍機擾台')])
+    third = data_collector.scrape_rss_news()
+    assert [article['title'] for article in third['opinion']] == ['中國軍機擾台']
+    assert feed_state.get_feed_state(FEED_URL)['etag'] == '"v2"'
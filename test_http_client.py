@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試共用 HTTP 連線
+429/5xx 的重試與退避、POST 不重試、fork 後重新建立 Session，以及串流讀取的位元組上限與提前停止
+"""
+
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from scraper import html_parser, http_client
+from scraper.html_parser import EarlyStop
+from scraper.http_client import JitteredRetry
+
+PRICE_PAGE = '<html><body><span data-test="instrument-price-last">2,345.60</span>'.encode('utf-8')
+
+class Handler(BaseHTTPRequestHandler):
+    """依序回傳 server.statuses 中的狀態碼，用完後回傳 200"""
+
+    def respond(self):
+        self.server.requests.append((self.command, self.path))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = self.server.body
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = respond
+    do_POST = respond
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    """本機測試伺服器；退避時間縮短，並使用新的 Session"""
+    monkeypatch.setattr(http_client, 'BACKOFF_FACTOR', 0.01)
+    monkeypatch.setattr(http_client.http_replay, 'get_mode', lambda: None)
+    http_client.close_session()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.statuses = []
+    httpd.requests = []
+    httpd.body = '國防部'.encode('utf-8')
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    http_client.close_session()
+
+def test_retries_server_errors(server):
+    """429 與 5xx 重試後取得成功的回應"""
+    server.statuses = [503, 429]
+    response = http_client.get(server.url + '/a')
+    assert response.status_code == 200
+    assert response.text == '國防部'
+    assert len(server.requests) == 3
+
+def test_gives_up_after_max_retries(server):
+    """超過重試次數時回傳最後一次的錯誤回應，不拋出例外"""
+    server.statuses = [502] * (http_client.MAX_RETRIES + 5)
+    response = http_client.get(server.url + '/a')
+    assert response.status_code == 502
+    assert len(server.requests) == http_client.MAX_RETRIES + 1
+
+def test_post_is_not_retried(server):
+    """POST 非冪等，錯誤回應不重試"""
+    server.statuses = [503]
+    assert http_client.post(server.url + '/a').status_code == 503
+    assert server.requests == [('POST', '/a')]
+
+def test_backoff_is_capped_and_jittered():
+    """退避時間介於指數退避的一半與全部之間，且不超過 MAX_BACKOFF"""
+    retry = JitteredRetry(total=10, backoff_factor=1)
+    assert retry.get_backoff_time() == 0
+    for errors in range(1, 8):
+        retry = retry.increment(method='GET', url='/')
+        if errors == 1:
+            # urllib3 在第一次重試前不等待
+            assert retry.get_backoff_time() == 0
+            continue
+        expected = min(2 ** (errors - 1), http_client.MAX_BACKOFF)
+        for _ in range(20):
+            assert expected / 2 <= retry.get_backoff_time() <= expected
+
+def test_session_is_rebuilt_after_fork(monkeypatch):
+    """同一行程共用 Session，pid 改變（fork 後）時重新建立"""
+    http_client.close_session()
+    first = http_client.get_session()
+    assert http_client.get_session() is first
+    monkeypatch.setattr(http_client.os, 'getpid', lambda: -1)
+    assert http_client.get_session() is not first
+    http_client.close_session()
+
+def test_get_capped_truncates_at_max_bytes(server):
+    """本文超過 max_bytes 時只保留上限內的內容並標記提前停止"""
+    server.body = b'x' * 200_000
+    response = http_client.get_capped(server.url + '/a', max_bytes=50_000)
+    assert response.content == b'x' * 50_000
+    assert response.stopped_early
+
+    server.body = b'y' * 1000
+    response = http_client.get_capped(server.url + '/a', max_bytes=50_000)
+    assert response.content == b'y' * 1000
+    assert not response.stopped_early
+
+def test_get_capped_stops_when_enough(server):
+    """報價節點出現後停止讀取，已讀內容可以解析出價格"""
+    server.body = PRICE_PAGE + b'<div>' + b'x' * 500_000 + b'</div></body></html>'
+    response = http_client.get_capped(server.url + '/a', stop_when=html_parser.investing_price_found())
+    assert response.stopped_early
+    assert len(response.content) < 200_000
+    assert html_parser.parse_investing_price(response.content) == '2,345.60'
+
+def test_early_stop_checkpoints():
+    """只在幾何遞增的檢查點解析；解析錯誤視為內容不足"""
+    checked = []
+
+    def is_enough(content, content_type):
+        checked.append(len(content))
+        if len(content) > 5000:
+            raise ValueError('內容不完整')
+        return False
+
+    stop = EarlyStop(is_enough, first_check=1000)
+    buffer = bytearray()
+    for _ in range(100):
+        buffer += b'x' * 100
+        assert not stop(buffer)
+    assert checked == [1000, 2000, 4000, 8000]
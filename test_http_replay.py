@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試 HTTP 錄製與回放
+錄製後不連線即可回放相同的回應、串流請求只錄製讀取的部分，以及注入的錯誤與夾具版本檢查
+"""
+
+import sys
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+import requests
+
+from scraper import http_client, http_replay
+
+BODY = '<html><body>國防部即時軍事動態</body></html>'.encode('big5')
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=big5')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """本機測試伺服器；錄製設定只在測試中有效"""
+    monkeypatch.setattr(http_replay, '_config', dict(http_replay._config))
+    http_replay.configure(None, fixture_dir=str(tmp_path), latency=0, error_rate=0)
+    http_client.close_session()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.requests = []
+    httpd.body = BODY
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    http_client.close_session()
+
+def test_record_then_replay(server):
+    """錄製的回應在回放模式下不連線即可取得，狀態碼、標頭與本文相同"""
+    http_replay.configure('record')
+    recorded = http_client.get(server.url + '/list?b=2&a=1')
+    assert recorded.content == BODY
+    assert len(server.requests) == 1
+
+    http_replay.configure('replay')
+    # 查詢參數順序不影響夾具
+    replayed = http_client.get(server.url + '/list?a=1&b=2')
+    assert len(server.requests) == 1
+    assert replayed.status_code == 200
+    assert replayed.content == BODY
+    assert replayed.text == recorded.text
+    assert replayed.headers['ETag'] == '"v1"'
+    assert 'Content-Length' not in replayed.headers
+
+def test_streamed_request_records_capped_body(server):
+    """串流請求只錄製上限內讀取的本文，回放時可再次串流讀取"""
+    server.body = b'x' * 100_000
+    http_replay.configure('record')
+    assert len(http_client.get_capped(server.url + '/big', max_bytes=40_000).content) == 40_000
+
+    http_replay.configure('replay')
+    replayed = http_client.get_capped(server.url + '/big', max_bytes=1_000_000)
+    assert replayed.content == b'x' * 40_000
+    assert not replayed.stopped_early
+    assert len(server.requests) == 1
+
+def test_missing_fixture_and_injected_errors(server):
+    """沒有錄製的請求與注入的錯誤都以連線錯誤呈現"""
+    http_replay.configure('replay')
+    with pytest.raises(requests.ConnectionError):
+        http_client.get(server.url + '/unknown')
+
+    http_replay.save_fixture('GET', server.url + '/a', 200, {}, b'ok')
+    assert http_client.get(server.url + '/a').content == b'ok'
+    http_replay.configure('replay', error_rate=1, seed=1)
+    with pytest.raises(requests.ConnectionError):
+        http_client.get(server.url + '/a')
+    assert server.requests == []
+
+def test_fixture_version_mismatch(server, tmp_path):
+    """夾具版本不符時視為沒有錄製"""
+    key = http_replay.save_fixture('GET', server.url + '/a', 200, {}, b'ok')
+    assert http_replay.load_fixture('GET', server.url + '/a')['body'] == b'ok'
+    meta_path = tmp_path / f'{key}.json'
+    meta = json.loads(meta_path.read_text(encoding='utf-8'))
+    meta['version'] = http_replay.FIXTURE_VERSION + 1
+    meta_path.write_text(json.dumps(meta), encoding='utf-8')
+    assert http_replay.load_fixture('GET', server.url + '/a') is None
+
+def test_unknown_mode_is_rejected(server):
+    """未知的模式拋出 ValueError"""
+    with pytest.raises(ValueError):
+        http_replay.configure('playback')
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試增量指標引擎
+時間窗內的項目與來源狀態相同時，引擎與 calculate_threat_indicators 的結果應相同
+"""
+
+import sys
+import os
+import time
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from analyzer.indicator_calculator import calculate_threat_indicators
+from analyzer.indicator_engine import IndicatorEngine
+from scraper import near_duplicate, scheduler
+
+SCORES = ('military_threat', 'economic_pressure', 'news_alert', 'stock_impact', 'overall_threat_probability')
+
+MILITARY_ITEMS = [
+    {'title': '共軍軍演 戰機逼近', 'source': '國防部'},
+    {'title': '國防部例行記者會', 'source': '國防部'},
+]
+
+ARTICLES = [
+    {'title': '兩岸緊張情勢升高 美方關注', 'description': None, 'url': 'https://a.example/1'},
+    {'title': '共軍台海周邊演習 國防部嚴密監控', 'description': '衝突風險', 'url': 'https://a.example/2'},
+    {'title': '國防部嚴密監控共軍台海周邊演習', 'description': '衝突風險', 'url': 'https://b.example/2'},
+    {'title': '央行宣布升息半碼', 'description': '', 'url': 'https://a.example/3'},
+]
+
+CASES = [
+    # 即時軍事收集器沒有回報狀態，新聞收集失敗改用備用資料
+    ({'news': MILITARY_ITEMS}, 'fallback'),
+    ({'status': 'error', 'error': '逾時'}, 'success'),
+    ({'status': 'success', 'data': MILITARY_ITEMS}, 'empty'),
+    ({'status': 'success', 'data': []}, 'success'),
+]
+
+@pytest.mark.parametrize('military, news_status', CASES)
+def test_engine_matches_scalar(military, news_status, monkeypatch, tmp_path):
+    """各種來源狀態下引擎與單筆計算一致（含描述為 None 與轉載的新聞）"""
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(near_duplicate, '_detector', None)
+    engine = IndicatorEngine()
+    monkeypatch.setattr(scheduler.indicator_engine, 'get_engine', lambda: engine)
+
+    now = time.time()
+    articles = [dict(article, published_at=now - i, canonical_url=article['url'])
+                for i, article in enumerate(ARTICLES)] if news_status == 'success' else []
+    economic = {'status': 'success', 'data': {'GC=F': {}, 'ZW=F': {}}}
+    news = {'status': news_status, 'data': near_duplicate.NearDuplicateDetector().collapse(articles)}
+
+    engine.add_articles(articles)
+    scheduler.update_engine('military', military, now)
+    scheduler.update_engine('news', news, now)
+    scheduler.update_engine('economic', economic, now)
+
+    expected = calculate_threat_indicators({'military': military, 'economic': economic, 'news': news})
+    actual = engine.indicators()
+    for name in SCORES:
+        assert actual[name] == expected[name], name
+    assert actual['data_sources'] == expected['data_sources']
+
+def test_none_description_is_scored():
+    """描述為 None 的新聞照常計分，不會讓整個指標退回錯誤預設值"""
+    news = {'status': 'success', 'data': [{'title': '兩岸衝突', 'description': None}]}
+    assert calculate_threat_indicators({'news': news})['news_alert'] == 3.0
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試指標歷史
+多行程共用檔案時的同步、截斷後的寫入，以及滾動統計與逐筆重算的一致性
+"""
+
+import sys
+import os
+import threading
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from analyzer.indicator_history import (COLUMNS, DAY, MIN_TREND_SAMPLES, REBASE_EVERY, TS_DTYPE, VALUE_DTYPE,
+                                        IndicatorHistory, RollingStats)
+
+START = 1_700_000_000.0
+
+def indicators(value):
+    return {column: float(value) for column in COLUMNS}
+
+def record_in_thread(history, values, ts):
+    """在另一個執行緒記錄，逾時表示死結"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(history.record(values, ts=ts)), daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive(), 'record 沒有結束（死結）'
+    return result[0]
+
+def truncate(directory, count):
+    """模擬其他行程重建檔案：所有欄位截斷為 count 筆"""
+    for column, dtype in [('ts', TS_DTYPE)] + [(column, VALUE_DTYPE) for column in COLUMNS]:
+        with open(os.path.join(directory, f'{column}.bin'), 'r+b') as f:
+            f.truncate(count * dtype.itemsize)
+
+def test_other_process_appends_are_seen(tmp_path):
+    """另一個實例附加的樣本，讀取端不需重建也看得到"""
+    writer = IndicatorHistory(str(tmp_path))
+    reader = IndicatorHistory(str(tmp_path))
+    for i in range(5):
+        writer.record(indicators(10 + i), ts=START + i * 3600)
+    assert reader.trend()['samples'] == 5
+    assert len(reader.query(1, now=START + 5 * 3600)['ts']) == 5
+    # 讀取端寫入時以檔案中最新的時間判斷順序
+    assert reader.record(indicators(1), ts=START + 3600) is False
+    assert reader.record(indicators(1), ts=START + 10 * 3600) is True
+    assert writer.trend()['samples'] == 6
+
+def test_truncate_then_record(tmp_path):
+    """檔案被其他行程截斷後寫入不會死結，並以檔案內容重新載入"""
+    history = IndicatorHistory(str(tmp_path))
+    for i in range(5):
+        history.record(indicators(i), ts=START + i * 3600)
+    truncate(str(tmp_path), 2)
+    assert record_in_thread(history, indicators(9), START + 10 * 3600) is True
+    assert history.count == 3
+    assert IndicatorHistory(str(tmp_path)).trend()['samples'] == 3
+
+def test_recreated_file_is_reloaded(tmp_path):
+    """檔案重建後筆數恢復到原本以上時，依最後一筆時間發現並重新載入"""
+    history = IndicatorHistory(str(tmp_path))
+    for i in range(3):
+        history.record(indicators(i), ts=START + i * 3600)
+    truncate(str(tmp_path), 0)
+    other = IndicatorHistory(str(tmp_path))
+    for i in range(4):
+        other.record(indicators(50), ts=START + (100 + i) * 3600)
+    trend = history.trend()
+    assert trend['samples'] == 4
+    assert trend['rolling_mean'] == 50
+
+def test_torn_append_is_truncated(tmp_path):
+    """中斷的寫入（部分欄位多一筆）在載入時截斷到完整的筆數"""
+    history = IndicatorHistory(str(tmp_path))
+    for i in range(3):
+        history.record(indicators(i), ts=START + i * 3600)
+    with open(os.path.join(str(tmp_path), 'ts.bin'), 'ab') as f:
+        f.write(np.array([START + 5 * 3600], dtype=TS_DTYPE).tobytes())
+    with open(os.path.join(str(tmp_path), f'{COLUMNS[0]}.bin'), 'ab') as f:
+        f.write(np.array([1.0], dtype=VALUE_DTYPE).tobytes())
+
+    # 其他實例看到不完整的一筆時只讀入完整的部分
+    assert history.trend()['samples'] == 3
+    reloaded = IndicatorHistory(str(tmp_path))
+    assert reloaded.count == 3
+    assert os.path.getsize(os.path.join(str(tmp_path), 'ts.bin')) == 3 * TS_DTYPE.itemsize
+    assert os.path.getsize(os.path.join(str(tmp_path), f'{COLUMNS[0]}.bin')) == 3 * VALUE_DTYPE.itemsize
+    assert reloaded.record(indicators(4), ts=START + 4 * 3600) is True
+
+def test_rolling_stats_matches_brute_force():
+    """累計和維護的平均、變異數與斜率與時間窗內樣本逐筆重算相同（含重新計算累計和之後）"""
+    rng = np.random.default_rng(0)
+    width = 3
+    stats = RollingStats(width, window=2 * DAY)
+    timestamps = START + np.cumsum(rng.uniform(600, 3 * 3600, REBASE_EVERY + 200))
+    values = rng.normal(50, 10, (len(timestamps), width))
+    for i, (ts, row) in enumerate(zip(timestamps, values)):
+        stats.add(float(ts), row)
+        if i % 97 and i != len(timestamps) - 1:
+            continue
+        inside = timestamps[:i + 1] >= ts - 2 * DAY
+        window_ts, window_values = timestamps[:i + 1][inside], values[:i + 1][inside]
+        assert stats.n == len(window_ts)
+        np.testing.assert_allclose(stats.mean(), window_values.mean(axis=0), rtol=1e-9)
+        if len(window_ts) >= 2:
+            np.testing.assert_allclose(stats.variance(), window_values.var(axis=0, ddof=1), rtol=1e-6)
+        if len(window_ts) >= MIN_TREND_SAMPLES:
+            # 斜率由相減的累計和得出，重新計算累計和之前會累積約 1e-6 的相對誤差
+            slope = np.polyfit((window_ts - window_ts[0]) / DAY, window_values, 1)[0]
+            np.testing.assert_allclose(stats.slope(), slope, rtol=1e-5, atol=1e-9)
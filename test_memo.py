@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試記憶快取
+TTL 到期、LRU 淘汰、相同鍵同時只計算一次，以及收集資料的識別
+"""
+
+import sys
+import os
+import threading
+import time
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from analyzer import memo
+from analyzer.memo import MemoCache, data_fingerprint
+
+def test_ttl_expiry(monkeypatch):
+    """超過 TTL 的結果重新計算"""
+    now = [1000.0]
+    monkeypatch.setattr(memo.time, 'time', lambda: now[0])
+    cache = MemoCache(ttl=10)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_compute('a', compute) == 1
+    now[0] += 9
+    assert cache.get_or_compute('a', compute) == 1
+    now[0] += 2
+    assert cache.get_or_compute('a', compute) == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 2, 1)
+
+def test_lru_eviction():
+    """超過筆數上限時淘汰最久未使用的鍵"""
+    cache = MemoCache(max_entries=2)
+    cache.get_or_compute('a', lambda: 'a')
+    cache.get_or_compute('b', lambda: 'b')
+    cache.get_or_compute('a', lambda: 'stale')
+    cache.get_or_compute('c', lambda: 'c')
+    assert cache.get_or_compute('a', lambda: 'new') == 'a'
+    assert cache.get_or_compute('b', lambda: 'new') == 'new'
+    assert cache.stats()['size'] == 2
+
+def test_results_are_copies():
+    """呼叫端修改回傳值不影響快取"""
+    cache = MemoCache()
+    cache.get_or_compute('a', lambda: {'items': [1]})['items'].append(2)
+    cache.get_or_compute('a', lambda: None)['items'].append(3)
+    assert cache.get_or_compute('a', lambda: None) == {'items': [1]}
+
+def test_single_flight():
+    """多個執行緒同時要求相同的鍵時只計算一次，其他執行緒等待結果"""
+    cache = MemoCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('a', compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert results == ['value'] * 8
+    assert cache.stats()['misses'] == 1
+
+def test_failed_compute_releases_waiters():
+    """計算失敗時例外傳給呼叫端，等待中的執行緒改由自己重新計算"""
+    cache = MemoCache()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('失敗')
+
+    errors = []
+
+    def owner():
+        try:
+            cache.get_or_compute('a', fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=owner)
+    thread.start()
+    started.wait(5)
+    waiter_result = []
+    waiter = threading.Thread(target=lambda: waiter_result.append(cache.get_or_compute('a', lambda: 'retry')))
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    thread.join(5)
+    waiter.join(5)
+    assert len(errors) == 1
+    assert waiter_result == ['retry']
+    with pytest.raises(ValueError):
+        cache.get_or_compute('b', lambda: int('x'))
+    assert cache.get_or_compute('b', lambda: 'ok') == 'ok'
+
+def test_data_fingerprint():
+    """快照以版本與更新時間識別；其他資料以內容雜湊識別，與 dict 順序及 timestamp 無關"""
+    assert data_fingerprint({'snapshot': {'version': 3, 'updated_at': 5.0}}) == 'snapshot:3:5.0'
+    assert (data_fingerprint({'snapshot': {'version': 3, 'updated_at': 5.0}}) !=
+            data_fingerprint({'snapshot': {'version': 3, 'updated_at': 6.0}}))
+    first = {'military': {'status': 'success', 'data': [1]}, 'news': {'a': 1, 'b': 2}, 'timestamp': 'x'}
+    second = {'news': {'b': 2, 'a': 1}, 'military': {'data': [1], 'status': 'success'}, 'timestamp': 'y'}
+    assert data_fingerprint(first) == data_fingerprint(second)
+    assert data_fingerprint(first) != data_fingerprint(dict(first, news={'a': 2}))
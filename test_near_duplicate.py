@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試近似重複新聞合併
+轉載的同一則新聞應合併，只差關鍵字的不同事件不可合併
+"""
+
+import sys
+import os
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analyzer.indicator_calculator import calculate_news_alert
+from scraper import article_store, data_collector
+from scraper.near_duplicate import NearDuplicateDetector
+
+REPOSTS = [
+    ('共軍台海周邊演習 國防部嚴密監控', '國防部嚴密監控共軍台海周邊演習'),
+    ('台股大漲200點 台積電領軍', '台積電領軍 台股大漲200點｜財經'),
+    ('美國宣布對台軍售18億美元', '美宣布對台軍售18億美元 中方強烈反對'),
+    ('賴清德：台灣不會屈服於壓力', '快訊》賴清德：台灣不會屈服於壓力'),
+]
+
+DIFFERENT_EVENTS = [
+    ('台股大漲200點', '台股大跌200點'),
+    ('共軍台海周邊演習', '共軍南海周邊演習'),
+    ('美國宣布對台軍售18億美元', '美國宣布對日軍售18億美元'),
+    ('國防部偵獲共機32架次', '國防部偵獲共機12架次'),
+    ('央行宣布升息半碼', '央行宣布降息半碼'),
+]
+
+def collapse(*titles):
+    detector = NearDuplicateDetector()
+    return detector.collapse([{'title': title, 'source': f'來源{i}'} for i, title in enumerate(titles)])
+
+def test_reposts_merge():
+    """轉載的標題合併為同一則"""
+    for first, second in REPOSTS:
+        assert len(collapse(first, second)) == 1, (first, second)
+
+def test_different_events_stay_apart():
+    """只差中間一兩個字的不同事件不可合併"""
+    for first, second in DIFFERENT_EVENTS:
+        assert len(collapse(first, second)) == 2, (first, second)
+
+def test_reposts_score_once(monkeypatch):
+    """同一則新聞的兩篇轉載在新聞示警指標中只計分一次"""
+    story = {'title': '共軍台海周邊演習 國防部嚴密監控', 'description': '緊張情勢升高', 'source': '甲'}
+    repost = {'title': '國防部嚴密監控共軍台海周邊演習', 'description': '緊張情勢升高', 'source': '乙'}
+
+    def stored(articles):
+        monkeypatch.setattr(article_store, 'load_news_data',
+                            lambda: {'status': 'success', 'data': [dict(article) for article in articles]})
+        monkeypatch.setattr(data_collector.near_duplicate, '_detector', None)
+        return data_collector.load_stored_news([])
+
+    single = stored([story])
+    both = stored([story, repost])
+    assert len(both['data']) == 1
+    assert calculate_news_alert(both) == calculate_news_alert(single)
+
+def test_recollapse_is_idempotent():
+    """同一批文章在下一次收集再出現時，群組的文章數與來源不會增加"""
+    detector = NearDuplicateDetector()
+    batch = [
+        {'title': '共軍台海周邊演習 國防部嚴密監控', 'source': '甲', 'url': 'https://a.example/1'},
+        {'title': '國防部嚴密監控共軍台海周邊演習', 'source': '乙', 'url': 'https://b.example/1'},
+    ]
+    first = detector.collapse(batch)
+    second = detector.collapse(batch)
+    assert first == second
+    cluster = detector.clusters[first[0]['story_id']]
+    assert cluster.article_count == 2
+    assert cluster.sources == {'甲', '乙'}
+
+def test_source_count_is_per_batch():
+    """來源數只計算這一批中的來源，不累計先前的收集"""
+    detector = NearDuplicateDetector()
+    detector.collapse([
+        {'title': '共軍台海周邊演習 國防部嚴密監控', 'source': '甲', 'url': 'https://a.example/1'},
+        {'title': '國防部嚴密監控共軍台海周邊演習', 'source': '乙', 'url': 'https://b.example/1'},
+    ])
+    later = detector.collapse([{'title': '快訊》共軍台海周邊演習 國防部嚴密監控', 'source': '丙',
+                                'url': 'https://c.example/1'}])
+    assert later[0]['source_count'] == 1
+    assert later[0]['sources'] == ['丙']
+
+def test_collection_collapses_once(monkeypatch):
+    """每次新聞收集只執行一次轉載合併"""
+    calls = []
+    collapse_articles = data_collector.near_duplicate.collapse_articles
+    monkeypatch.setattr(data_collector.near_duplicate, '_detector', None)
+    monkeypatch.setattr(data_collector.near_duplicate, 'collapse_articles',
+                        lambda articles: calls.append(len(articles)) or collapse_articles(articles))
+    articles = [
+        {'title': '美國宣布對台軍售18億美元', 'source': '甲', 'url': 'https://a.example/1'},
+        {'title': '美宣布對台軍售18億美元 中方強烈反對', 'source': '乙', 'url': 'https://b.example/1'},
+    ]
+    monkeypatch.setattr(data_collector, 'scrape_google_news', lambda: {'diplomatic_news': articles})
+    monkeypatch.setattr(data_collector, 'filter_new_articles', lambda articles: articles)
+    monkeypatch.setattr(data_collector, 'store_articles', lambda articles: len(articles))
+    # 文章庫的時間窗內只有這次寫入的文章
+    monkeypatch.setattr(article_store, 'load_news_data',
+                        lambda: {'status': 'success', 'data': [dict(article) for article in articles]})
+
+    result = data_collector.collect_news_data_sync()
+    assert calls == [2]
+    assert len(result['data']) == 1
+    assert result['data'][0]['source_count'] == 2
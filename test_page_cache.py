@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試頁面快取
+本文未變更時命中、解析器鍵區分結果，以及超過大小上限時依最久未使用淘汰
+"""
+
+import sys
+import os
+import json
+import sqlite3
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scraper import page_cache
+from scraper.page_cache import PageCache, body_hash, parser_key
+
+PAGE = '<html><body>國防部</body></html>'.encode('utf-8')
+
+def use_cache(monkeypatch, tmp_path, max_bytes=page_cache.MAX_BYTES):
+    cache = PageCache(str(tmp_path / 'page_cache.db'), max_bytes=max_bytes)
+    monkeypatch.setattr(page_cache, '_cache', cache)
+    return cache
+
+def test_unchanged_body_hits(monkeypatch, tmp_path):
+    """相同本文命中上次的解析結果，本文改變時未命中"""
+    cache = use_cache(monkeypatch, tmp_path)
+    assert page_cache.lookup('cna_list', PAGE) == (False, None)
+    page_cache.store('cna_list', PAGE, [('標題', 'https://a.example/1')])
+    # tuple 以 list 取回
+    assert page_cache.lookup('cna_list', PAGE) == (True, [['標題', 'https://a.example/1']])
+    assert page_cache.lookup('cna_list', PAGE + b' ') == (False, None)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['parses']) == (1, 2, 1)
+
+def test_parser_key_separates_results(monkeypatch, tmp_path):
+    """解析器、編碼標頭或參數不同時不共用結果；參數順序不影響"""
+    use_cache(monkeypatch, tmp_path)
+    page_cache.store('investing_price', PAGE, {'price': 1}, 'text/html', {'name': '黃金', 'max_items': 3})
+    assert page_cache.lookup('investing_price', PAGE, 'text/html', {'max_items': 3, 'name': '黃金'})[0]
+    assert not page_cache.lookup('cna_list', PAGE, 'text/html', {'name': '黃金', 'max_items': 3})[0]
+    assert not page_cache.lookup('investing_price', PAGE, 'text/html; charset=big5',
+                                 {'name': '黃金', 'max_items': 3})[0]
+    assert not page_cache.lookup('investing_price', PAGE, 'text/html', {'name': '小麥', 'max_items': 3})[0]
+    assert parser_key('rss') != parser_key('rss', kwargs={'limit': 1})
+
+def test_eviction_is_least_recently_used(tmp_path):
+    """超過上限時先淘汰最久未使用的結果，命中會更新使用時間"""
+    result = 'x' * 100
+    size = len(json.dumps(result))
+    cache = PageCache(str(tmp_path / 'page_cache.db'), max_bytes=3 * size)
+    digests = [body_hash(bytes([i])) for i in range(4)]
+    for digest in digests[:3]:
+        cache.put_parse(digest, 'k', result)
+    # 使用第一筆，之後寫入第四筆時應淘汰第二筆
+    assert cache.get_parse(digests[0], 'k')[0]
+    cache.put_parse(digests[3], 'k', result)
+    assert [cache.get_parse(digest, 'k')[0] for digest in digests] == [True, False, True, True]
+    assert cache.total_size() == 3 * size
+
+def test_size_tracks_replacements(tmp_path):
+    """覆寫同一筆結果時大小以新結果計算"""
+    cache = PageCache(str(tmp_path / 'page_cache.db'), max_bytes=1000)
+    cache.put_parse('a', 'k', 'x' * 400)
+    cache.put_parse('a', 'k', 'x' * 10)
+    cache.put_parse('b', 'k', 'x' * 500)
+    assert cache.get_parse('a', 'k')[0] and cache.get_parse('b', 'k')[0]
+    assert cache.total_size() == cache.size == 12 + 502
+
+def test_old_bodies_table_is_dropped(tmp_path):
+    """舊版快取的本文表在開啟時移除"""
+    path = str(tmp_path / 'page_cache.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE bodies (hash TEXT PRIMARY KEY, data BLOB)')
+    conn.commit()
+    conn.close()
+    PageCache(path)
+    tables = {row[0] for row in sqlite3.connect(path).execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {'parses'}
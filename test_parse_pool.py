@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試解析行程池
+行程池與同行程解析的結果相同、小內容不送到行程池、頁面快取命中時不解析，以及行程池故障時改為同行程解析
+"""
+
+import sys
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from scraper import page_cache, parse_pool
+
+def filler(size):
+    """模擬頁面中大量的導覽列與腳本，讓內容超過 INLINE_MAX_BYTES"""
+    return ''.join(f'<div class="nav"><a href="/c/{i}">分類 {i}</a><script>var x{i} = "{"x" * 80}";</script></div>'
+                   for i in range(size))
+
+def pages():
+    """各解析器的模擬頁面"""
+    cna = ''.join(f'<div class="item"><a href="/news/aipl/{i}.aspx"><h2>兩岸情勢新聞標題 {i}</h2></a></div>'
+                  for i in range(10))
+    google = ''.join(f'<article><a href="./articles/{i}">x</a><h3>台海局勢報導第 {i} 則</h3>'
+                     f'<time datetime="2025-01-01T00:00:00Z"></time><span class="WG9SHc">來源 {i}</span></article>'
+                     for i in range(10))
+    items = ''.join(f'<item><title>兩岸情勢 第 {i} 則</title><link>https://a.example/{i}</link><guid>{i}</guid>'
+                    f'<pubDate>Wed, 01 Jan 2025 0{i}:00:00 GMT</pubDate><description>{"內容" * 2000}</description></item>'
+                    for i in range(10))
+    html = '<html><head><meta charset="utf-8"></head><body>{}{}</body></html>'
+    return {
+        'cna_list': (html.format(filler(400), f'<div class="mainList">{cna}</div>').encode('utf-8'), {}),
+        'google_news': (html.format(filler(400), google).encode('utf-8'), {'limit': 5}),
+        'investing_price': (html.format(filler(400), '<span data-test="instrument-price-last">2,345.60</span>')
+                            .encode('utf-8'), {}),
+        'rss': (('<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel><title>模擬來源</title>'
+                 f'{items}</channel></rss>').encode('utf-8'), {})
+    }
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """使用暫存的頁面快取，結束時關閉行程池"""
+    cache = page_cache.PageCache(str(tmp_path / 'page_cache.db'))
+    monkeypatch.setattr(page_cache, '_cache', cache)
+    yield cache
+    parse_pool.shutdown_pool()
+
+def test_pool_matches_inline(cache, monkeypatch):
+    """每個解析器在工作行程中的結果與同行程解析相同"""
+    monkeypatch.setenv('PARSE_WORKERS', '2')
+    pool = parse_pool.get_pool()
+    submitted = []
+    submit = pool.submit
+    monkeypatch.setattr(pool, 'submit', lambda *args: submitted.append(args[1]) or submit(*args))
+    for parser_id, (content, kwargs) in pages().items():
+        assert len(content) > parse_pool.INLINE_MAX_BYTES
+        expected = parse_pool.run_parser(parser_id, content, 'text/html; charset=utf-8', kwargs)
+        assert expected
+        future = parse_pool.submit(parser_id, content, 'text/html; charset=utf-8', **kwargs)
+        assert parse_pool.result(parser_id, future, content, 'text/html; charset=utf-8', **kwargs) == expected
+    assert submitted == list(pages())
+
+def test_small_content_is_parsed_inline(cache, monkeypatch):
+    """小於 INLINE_MAX_BYTES 的內容不使用行程池"""
+    def no_pool():
+        raise AssertionError('不應使用行程池')
+
+    monkeypatch.setattr(parse_pool, 'get_pool', no_pool)
+    content = '<span data-test="instrument-price-last">2,345.60</span>'.encode('utf-8')
+    assert parse_pool.parse('investing_price', content) == '2,345.60'
+
+def test_cache_hit_skips_parsing(cache, monkeypatch):
+    """相同本文第二次解析時由頁面快取取得結果"""
+    calls = []
+
+    def parser(content, content_type=None):
+        calls.append(content)
+        return ['結果']
+
+    monkeypatch.setitem(parse_pool.PARSERS, 'cna_list', parser)
+    assert parse_pool.parse('cna_list', b'<html></html>') == ['結果']
+    future = parse_pool.submit('cna_list', b'<html></html>')
+    assert isinstance(future, parse_pool.CachedFuture)
+    assert parse_pool.result('cna_list', future, b'<html></html>') == ['結果']
+    assert len(calls) == 1
+
+def test_broken_pool_falls_back_inline(cache, monkeypatch):
+    """送出或等待時行程池故障，改在目前行程解析並關閉行程池"""
+    content, kwargs = pages()['investing_price']
+
+    class BrokenPool:
+        def submit(self, *args):
+            raise BrokenProcessPool('工作行程結束')
+
+    monkeypatch.setattr(parse_pool, 'get_pool', lambda: BrokenPool())
+    monkeypatch.setattr(parse_pool, '_slots', parse_pool.threading.BoundedSemaphore(1))
+    shutdowns = []
+    monkeypatch.setattr(parse_pool, 'shutdown_pool', lambda: shutdowns.append(1))
+    assert parse_pool.parse('investing_price', content) == '2,345.60'
+
+    broken = Future()
+    broken.set_exception(BrokenProcessPool('工作行程結束'))
+    assert parse_pool.result('investing_price', broken, content + b' ') == '2,345.60'
+    assert shutdowns == [1, 1]
+    # 名額已釋放
+    assert parse_pool._slots.acquire(blocking=False)
+
+def test_unknown_parser():
+    """未知的解析器拋出 ValueError"""
+    with pytest.raises(ValueError):
+        parse_pool.submit('unknown', b'')
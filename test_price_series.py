@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試商品報價序列
+環形緩衝區繞回後的順序、時間範圍查詢，以及多個行程共用檔案時的壓縮
+"""
+
+import sys
+import os
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from scraper import price_series
+from scraper.price_series import DAY, RECORD_DTYPE, PriceSeries
+
+START = 1_700_000_000.0
+HOUR = 3600
+
+def test_ring_buffer_wraparound():
+    """超過容量後只保留最近的報價，且 window 依時間排序"""
+    series = PriceSeries('黃金', capacity=8)
+    for i in range(21):
+        assert series.append(100 + i, ts=START + i * HOUR)
+    ts, prices = series.window()
+    assert list(prices) == [100.0 + i for i in range(13, 21)]
+    assert np.all(np.diff(ts) > 0)
+    assert series.latest() == (START + 20 * HOUR, 120.0)
+    # 時間倒退或無效價格忽略
+    assert not series.append(1, ts=START)
+    assert not series.append(float('nan'), ts=START + 30 * HOUR)
+
+def test_range_queries_match_brute_force():
+    """漲跌、波動與高低價與直接篩選時間範圍的結果相同"""
+    rng = np.random.default_rng(0)
+    series = PriceSeries('小麥', capacity=64)
+    timestamps = START + np.cumsum(rng.uniform(0.5, 3, 100)) * HOUR
+    prices = 600 * np.exp(np.cumsum(rng.normal(0, 0.01, 100)))
+    for ts, price in zip(timestamps, prices):
+        series.append(price, ts=ts)
+    timestamps, prices = timestamps[-64:], prices[-64:]
+    now = timestamps[-1] + HOUR
+
+    inside = timestamps >= now - DAY
+    base = prices[timestamps <= now - DAY][-1]
+    assert series.change(DAY, now) == (prices[-1] - base) / base * 100
+    assert series.range(DAY, now) == (prices[inside].min(), prices[inside].max())
+    expected = np.std(np.diff(np.log(prices[inside])), ddof=1) * 100
+    assert abs(series.volatility(DAY, now) - expected) < 1e-9
+
+    # 剛好落在範圍起點的報價作為基準
+    assert series.change(now - timestamps[10], now) == (prices[-1] - prices[10]) / prices[10] * 100
+    # 範圍早於所有報價時沒有基準
+    assert series.change(30 * DAY, now) is None
+
+def test_compaction_keeps_other_process_records(tmp_path, monkeypatch):
+    """壓縮以檔案內容改寫，保留其他行程附加的報價"""
+    monkeypatch.setattr(price_series, 'COMPACT_FACTOR', 2)
+    path = str(tmp_path / 'gold.bin')
+    first = PriceSeries('黃金', path, capacity=4)
+    second = PriceSeries('黃金', path, capacity=4)
+    for i in range(8):
+        series = first if i % 2 else second
+        series.append(100 + i, ts=START + i * HOUR)
+    assert len(np.fromfile(path, dtype=RECORD_DTYPE)) == 8
+
+    # 第 9 筆超過門檻，由 first 壓縮
+    first.append(108, ts=START + 9 * HOUR)
+    records = np.fromfile(path, dtype=RECORD_DTYPE)
+    assert list(records['price']) == [105.0, 106.0, 107.0, 108.0]
+    assert list(first.window()[1]) == [105.0, 106.0, 107.0, 108.0]
+    assert list(PriceSeries('黃金', path, capacity=4).window()[1]) == [105.0, 106.0, 107.0, 108.0]
+
+def test_load_orders_interleaved_records(tmp_path):
+    """檔案中順序交錯或重複的紀錄在載入時排序並去除重複時間"""
+    path = str(tmp_path / 'wheat.bin')
+    records = np.array([(START + 2, 3.0), (START, 1.0), (START + 1, 2.0), (START + 1, 2.5)], dtype=RECORD_DTYPE)
+    records.tofile(path)
+    ts, prices = PriceSeries('小麥', path, capacity=8).window()
+    assert list(ts - START) == [0.0, 1.0, 2.0]
+    assert list(prices) == [1.0, 2.0, 3.0]
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試權杖桶限流器
+突發容量內不等待、超過速率時依預約順序延遲、權杖隨時間補充，以及各主機共用限流器
+"""
+
+import sys
+import os
+import asyncio
+import threading
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from scraper import rate_limiter
+from scraper.rate_limiter import TokenBucket
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可控制的 monotonic 時鐘"""
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_burst_then_rate(clock):
+    """突發容量內不等待，之後每個預約多等 1/rate 秒"""
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert [bucket.reserve() for _ in range(3)] == [0.5, 1.0, 1.5]
+    stats = bucket.stats()
+    assert (stats['calls'], stats['delayed_calls'], stats['total_wait'], stats['max_wait']) == (6, 3, 3.0, 1.5)
+
+def test_refill_is_capped_at_burst(clock):
+    """權杖依經過時間補充，但不超過突發容量"""
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+    clock[0] += 1
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 1.0
+    # 補回欠下的權杖後，閒置再久也只累積 burst 個
+    clock[0] += 100
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+def test_concurrent_reservations_are_serialized(clock):
+    """多執行緒同時預約時，等待時間各不相同且依序排列"""
+    bucket = TokenBucket(rate=10, burst=1)
+    waits = []
+    lock = threading.Lock()
+
+    def run():
+        wait = bucket.reserve()
+        with lock:
+            waits.append(wait)
+
+    threads = [threading.Thread(target=run) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert sorted(round(wait, 6) for wait in waits) == [round(i / 10, 6) for i in range(20)]
+
+def test_acquire_sleeps_only_when_needed(clock, monkeypatch):
+    """acquire 與 acquire_async 只在需要時等待預約的秒數"""
+    slept = []
+    monkeypatch.setattr(rate_limiter.time, 'sleep', slept.append)
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(rate_limiter.asyncio, 'sleep', fake_sleep)
+    bucket = TokenBucket(rate=4, burst=1)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.25
+    assert asyncio.run(bucket.acquire_async()) == 0.5
+    assert slept == [0.25, 0.5]
+
+def test_limiter_per_host(monkeypatch):
+    """同一主機共用限流器，並套用該主機的速率設定"""
+    monkeypatch.setattr(rate_limiter, '_limiters', {})
+    limiter = rate_limiter.get_limiter('https://news.google.com/rss?q=1')
+    assert rate_limiter.get_limiter('news.google.com') is limiter
+    assert (limiter.rate, limiter.burst) == rate_limiter.HOST_RATE_LIMITS['news.google.com']
+    other = rate_limiter.get_limiter('https://example.com/a')
+    assert other is not limiter
+    assert (other.rate, other.burst) == rate_limiter.DEFAULT_RATE_LIMIT
+    assert set(rate_limiter.get_stats()) == {'news.google.com', 'example.com'}
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試共用快照
+序號鎖的重試、檔案擴大後重新對映、跨行程的發布鎖，以及排程合併快照檔時不覆蓋其他行程的來源
+"""
+
+import sys
+import os
+import json
+import mmap
+import multiprocessing
+import threading
+import time
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fcntl
+
+from scraper import scheduler, shared_snapshot
+from scraper.shared_snapshot import HEADER, INITIAL_CAPACITY, MAGIC, SharedSnapshot
+
+def publish_many(path, count):
+    """子行程：連續發布 count 個大小不同的快照"""
+    publisher = SharedSnapshot(path)
+    for i in range(count):
+        publisher.publish({'n': i, 'pad': 'x' * (i % 40 * 500), 'check': i})
+
+def try_lock(path, queue):
+    """子行程：以不等待的方式嘗試取得發布鎖"""
+    with open(path, 'rb') as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            queue.put(True)
+        except BlockingIOError:
+            queue.put(False)
+
+def test_round_trip(tmp_path):
+    """發布後版本遞增；同一版本只解碼一次，回傳同一個物件"""
+    path = str(tmp_path / 'snapshot.shm')
+    reader = SharedSnapshot(path)
+    assert reader.read() == (0, None)
+    assert not os.path.exists(path)
+
+    publisher = SharedSnapshot(path)
+    assert publisher.publish({'a': 1}) == 1
+    assert publisher.publish({'a': 2}) == 2
+    version, first = reader.read()
+    assert (version, first) == (2, {'a': 2})
+    assert reader.read()[1] is first
+    assert reader.version() == 2
+
+def test_reader_waits_for_writer(tmp_path):
+    """序號為奇數（寫入中）時讀者重試，寫入完成後讀到新的快照"""
+    path = str(tmp_path / 'snapshot.shm')
+    publisher = SharedSnapshot(path)
+    publisher.publish({'a': 1})
+    with open(path, 'r+b') as f:
+        mm = mmap.mmap(f.fileno(), 0)
+        _, seq, length, ts = HEADER.unpack_from(mm, 0)
+        HEADER.pack_into(mm, 0, MAGIC, seq + 1, length, ts)
+        mm.close()
+
+    # 發布者略過寫入中的序號，新的版本為 3
+    timer = threading.Timer(0.02, lambda: SharedSnapshot(path).publish({'a': 2}))
+    timer.start()
+    assert SharedSnapshot(path).read() == (3, {'a': 2})
+    timer.join()
+
+def test_reader_gives_up_on_stuck_writer(tmp_path, monkeypatch):
+    """寫入者中斷在寫入中時，讀者重試有上限"""
+    path = str(tmp_path / 'snapshot.shm')
+    SharedSnapshot(path).publish({'a': 1})
+    with open(path, 'r+b') as f:
+        mm = mmap.mmap(f.fileno(), 0)
+        HEADER.pack_into(mm, 0, MAGIC, 3, 0, 0.0)
+        mm.close()
+    monkeypatch.setattr(shared_snapshot, 'READ_RETRIES', 3)
+    assert SharedSnapshot(path).read() == (0, None)
+    # 下一個發布者從下一個偶數序號繼續
+    assert SharedSnapshot(path).publish({'a': 3}) == 3
+
+def test_remap_on_grow(tmp_path):
+    """發布者擴大檔案後，已對映的讀者重新對映並讀到完整的快照"""
+    path = str(tmp_path / 'snapshot.shm')
+    publisher = SharedSnapshot(path)
+    reader = SharedSnapshot(path)
+    publisher.publish({'small': True})
+    assert reader.read()[1] == {'small': True}
+    assert os.path.getsize(path) == INITIAL_CAPACITY
+
+    big = {'pad': 'x' * (INITIAL_CAPACITY + 10)}
+    publisher.publish(big)
+    assert os.path.getsize(path) == 2 * INITIAL_CAPACITY
+    assert reader.read() == (2, big)
+
+def test_concurrent_publisher_never_tears(tmp_path):
+    """其他行程連續發布時，讀到的快照永遠完整且版本不倒退"""
+    path = str(tmp_path / 'snapshot.shm')
+    SharedSnapshot(path).publish({'n': -1, 'check': -1})
+    process = multiprocessing.get_context('fork').Process(target=publish_many, args=(path, 300))
+    process.start()
+    reader = SharedSnapshot(path)
+    last_version = 0
+    while process.is_alive():
+        version, value = reader.read()
+        assert value['n'] == value['check']
+        assert version >= last_version
+        last_version = version
+    process.join()
+    assert reader.read() == (301, {'n': 299, 'pad': 'x' * (299 % 40 * 500), 'check': 299})
+
+def test_locked_is_reentrant_and_cross_process(tmp_path, monkeypatch):
+    """持有發布鎖時可以發布，其他行程無法取得發布鎖"""
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(shared_snapshot, '_snapshot', None)
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    path = str(tmp_path / 'snapshot.shm')
+
+    with shared_snapshot.locked():
+        assert shared_snapshot.publish({'a': 1}) == 1
+        process = context.Process(target=try_lock, args=(path, queue))
+        process.start()
+        process.join()
+        assert queue.get() is False
+    process = context.Process(target=try_lock, args=(path, queue))
+    process.start()
+    process.join()
+    assert queue.get() is True
+
+def test_run_due_sources_keeps_other_sources(tmp_path, monkeypatch):
+    """收集期間其他行程寫入的來源，在合併後仍保留"""
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(shared_snapshot, '_snapshot', None)
+    monkeypatch.setattr(scheduler, 'update_engine', lambda *args: None)
+    monkeypatch.setattr(scheduler.snapshot_archive, 'archive', lambda *args: None)
+    monkeypatch.setattr(scheduler, 'publish_snapshot', lambda snapshot, record=True: shared_snapshot.publish(snapshot))
+
+    def collect(deadline, sources=None, use_cache=True):
+        # 模擬 cron 行程在收集期間寫入另一個來源
+        other = scheduler.load_snapshot()
+        other['sources']['economic'] = {'data': {'status': 'success'}, 'collected_at': time.time()}
+        scheduler.save_snapshot(other)
+        return {source: {'status': 'success', 'data': []} for source in sources}
+
+    monkeypatch.setattr(scheduler, 'collect_sources_concurrently', collect)
+    result = scheduler.run_due_sources(sources=['military'])
+    assert result['collected'] == ['military']
+    with open(scheduler.get_snapshot_path(), 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    assert set(saved['sources']) == {'military', 'economic'}
+    assert set(shared_snapshot.read()[1]['sources']) == {'military', 'economic'}
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試快照封存
+內容相同（只有收集時間或快取狀態不同）的收集結果只存一份，以及依時間重播快照
+"""
+
+import sys
+import os
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scraper.snapshot_archive import SnapshotArchive, strip_volatile
+
+def news(titles, run):
+    """模擬一次新聞收集結果，每次執行的時間與快取資訊都不同"""
+    return {
+        'status': 'success',
+        'data': [{'title': title, 'timestamp': f'2024-01-0{run}T00:00:00'} for title in titles],
+        'new_count': run,
+        'timestamp': f'2024-01-0{run}T00:00:00',
+        'cache': {'status': 'miss', 'age': 0.0},
+    }
+
+def blob_count(archive):
+    return archive._connect().execute('SELECT COUNT(*) FROM blobs').fetchone()[0]
+
+def test_volatile_fields_are_deduplicated(tmp_path):
+    """只有時間戳與快取資訊不同的結果共用同一份內容，內容改變時才新增"""
+    archive = SnapshotArchive(str(tmp_path / 'archive.db'))
+    first = archive.record('news', news(['演習'], 1), ts=1)
+    assert archive.record('news', news(['演習'], 2), ts=2) == first
+    assert blob_count(archive) == 1
+    assert archive.record('news', news(['演習', '軍售'], 3), ts=3) != first
+    assert blob_count(archive) == 2
+    assert archive.count() == 3
+    # 封存的內容不含變動欄位
+    assert archive._blob(first) == {'status': 'success', 'data': [{'title': '演習'}]}
+
+def test_strip_volatile_is_recursive():
+    """巢狀 dict 與 list 中的變動欄位都移除，其他欄位不變"""
+    value = {'gold_price': {'price': 1, 'age': 3.0}, 'items': [{'a': 1, 'timestamp': 'x'}], 'timestamp': 'y'}
+    assert strip_volatile(value) == {'gold_price': {'price': 1}, 'items': [{'a': 1}]}
+
+def test_iter_snapshots(tmp_path):
+    """快照為各來源在該時間之前最後一次的結果；since 之前的結果作為起點"""
+    archive = SnapshotArchive(str(tmp_path / 'archive.db'))
+    archive.record('news', {'n': 1}, ts=10)
+    archive.record('economic', {'e': 1}, ts=10)
+    archive.record('news', {'n': 2}, ts=20)
+    archive.record('economic', {'e': 2}, ts=30)
+
+    snapshots = list(archive.iter_snapshots())
+    assert snapshots == [
+        (10, {'news': {'n': 1}, 'economic': {'e': 1}}),
+        (20, {'news': {'n': 2}, 'economic': {'e': 1}}),
+        (30, {'news': {'n': 2}, 'economic': {'e': 2}}),
+    ]
+    # 未變更的來源與前一個快照共用同一物件
+    assert snapshots[1][1]['economic'] is snapshots[0][1]['economic']
+
+    assert list(archive.iter_snapshots(since=15, until=30)) == [(20, {'news': {'n': 2}, 'economic': {'e': 1}})]
+    assert list(archive.iter_snapshots(since=40)) == []
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試 SWR 快取
+過期資料先回傳並只啟動一個背景更新、失敗時使用上次成功資料，以及逐 key 寫入磁碟
+"""
+
+import sys
+import os
+import threading
+import time
+
+# 添加當前目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scraper import swr_cache
+from scraper.swr_cache import SWRCache
+
+def test_fresh_hit_and_stale_serve(tmp_path, monkeypatch):
+    """新鮮時直接命中；過期後先回傳舊資料，背景更新完成後回傳新資料"""
+    monkeypatch.setenv('CACHE_TTL_MILITARY', '10')
+    now = [1000.0]
+    monkeypatch.setattr(swr_cache.time, 'time', lambda: now[0])
+    cache = SWRCache(str(tmp_path / 'swr_cache'))
+    assert cache.get('military', lambda: {'n': 1}) == ({'n': 1}, {'status': 'miss', 'age': 0.0})
+    now[0] += 5
+    assert cache.get('military', lambda: {'n': 2}) == ({'n': 1}, {'status': 'hit', 'age': 5.0})
+
+    done = threading.Event()
+
+    def loader():
+        done.set()
+        return {'n': 2}
+
+    now[0] += 10
+    assert cache.get('military', loader) == ({'n': 1}, {'status': 'stale', 'age': 15.0})
+    assert done.wait(5)
+    for _ in range(100):
+        if not cache.refreshing:
+            break
+        time.sleep(0.01)
+    assert cache.get('military', loader)[0] == {'n': 2}
+
+def test_single_background_refresh(tmp_path, monkeypatch):
+    """多個執行緒同時讀到過期資料時，只啟動一個背景更新"""
+    monkeypatch.setenv('CACHE_TTL_NEWS', '0')
+    cache = SWRCache(str(tmp_path / 'swr_cache'))
+    cache.put('news', {'n': 1})
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return {'n': 2}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('news', loader))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    release.set()
+    assert [info['status'] for _, info in results] == ['stale'] * 8
+    for _ in range(100):
+        if not cache.refreshing:
+            break
+        time.sleep(0.01)
+    assert calls == [1]
+
+def test_failure_uses_last_good(tmp_path):
+    """收集失敗時回傳上次成功的資料，失敗結果不覆蓋快取"""
+    cache = SWRCache(str(tmp_path / 'swr_cache'))
+    cache.put('economic', {'status': 'success', 'price': 1})
+    value, info = cache.refresh('economic', lambda: {'status': 'fallback', 'price': 0})
+    assert value == {'status': 'success', 'price': 1}
+    assert info['status'] == 'last_good'
+    assert cache.get_last_good('economic')[0] == {'status': 'success', 'price': 1}
+
+def test_put_stores_a_copy(tmp_path):
+    """呼叫端修改寫入或取得的資料不影響快取"""
+    cache = SWRCache(str(tmp_path / 'swr_cache'))
+    value = {'items': [1]}
+    returned, _ = cache.put('news', value)
+    returned['items'].append(2)
+    cache.get_last_good('news')[0]['items'].append(3)
+    assert cache.get_last_good('news')[0] == {'items': [1]}
+
+def test_entries_persist_per_key(tmp_path):
+    """每個 key 寫入自己的檔案，冷啟動後讀回所有 key"""
+    path = str(tmp_path / 'swr_cache')
+    cache = SWRCache(path)
+    cache.put('military', {'n': 1})
+    cache.put('price:黃金', {'price': 2000})
+    assert len(os.listdir(path)) == 2
+    before = os.path.getmtime(cache._entry_path('military'))
+    time.sleep(0.01)
+    cache.put('price:黃金', {'price': 2001})
+    assert os.path.getmtime(cache._entry_path('military')) == before
+
+    reloaded = SWRCache(path)
+    assert reloaded.get_last_good('military')[0] == {'n': 1}
+    assert reloaded.get_last_good('price:黃金')[0] == {'price': 2001}
@@ -1,38 +1,47 @@
 # 修復版本：同步處理，適用於 Serverless 環境
 import os
 import sys
+import hmac
+import importlib
 import json
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 
-print("開始導入 Flask 相關模組...")
+# 添加父目錄到路徑以便導入模組
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# STARTUP_PROFILE=1 時記錄各模組導入耗時
+import startup_profiler
+startup_profiler.install_from_env()
+
 try:
     from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, has_request_context
     from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-    print("Flask 模組導入成功")
 except Exception as e:
     print(f"Flask 模組導入失敗: {e}")
     sys.exit(1)
 
-try:
-    import requests
-    from urllib.parse import urlencode
-    print("其他基礎模組導入成功")
-except Exception as e:
-    print(f"基礎模組導入失敗: {e}")
-    sys.exit(1)
+from urllib.parse import urlencode
 
-# 添加父目錄到路徑以便導入模組
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# 收集、指標與報告模組會載入 requests、bs4、numpy、openai 等較重的套件，
+# 只在第一次需要的路由中才導入，首頁與登入頁的冷啟動不需要它們
 
-print("開始導入自定義模組...")
-try:
-    from analyzer.indicator_calculator import calculate_threat_indicators
-    print("indicator_calculator 導入成功")
-except Exception as e:
-    print(f"indicator_calculator 導入失敗: {e}")
-    # 創建一個備用函數
-    def calculate_threat_indicators(data):
+def lazy_import(name):
+    """第一次使用時才導入模組（STARTUP_PROFILE 啟用時輸出導入耗時）"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with startup_profiler.stage(f'延遲導入 {name}'):
+        module = importlib.import_module(name)
+    startup_profiler.report(limit=15, title=f'延遲導入 {name}')
+    return module
+
+def calculate_threat_indicators(data):
+    try:
+        calculator = lazy_import('analyzer.memo')
+    except Exception as e:
+        print(f"memo 導入失敗: {e}")
         return {
             'military_threat': 30.0,
             'economic_pressure': 25.0,
@@ -47,14 +56,36 @@ except Exception as e:
             'calculation_time': datetime.now().isoformat(),
             'error': f'模組導入失敗: {e}'
         }
+    # 相同的收集資料直接使用記憶的指標
+    indicators = calculator.cached_threat_indicators(data, intervals=True)
+    try:
+        history = lazy_import('analyzer.indicator_history')
+    except Exception as e:
+        print(f"indicator_history 導入失敗: {e}")
+        return indicators
+    # 三個月機率改由指標歷史的趨勢推估（不寫入歷史，由排程收集時記錄）
+    return history.apply_forecast(indicators)
 
-try:
-    from analyzer.report_generator import generate_ai_report
-    print("report_generator 導入成功")
-except Exception as e:
-    print(f"report_generator 導入失敗: {e}")
-    # 創建一個備用函數
-    def generate_ai_report(data, indicators, model):
+def get_live_indicators():
+    try:
+        engine = lazy_import('analyzer.indicator_engine')
+    except Exception as e:
+        print(f"indicator_engine 導入失敗: {e}")
+        return {'error': f'模組導入失敗: {e}'}
+    live = engine.get_engine()
+    result = live.indicators(intervals=True)
+    result['engine'] = live.stats()
+    result['memo'] = lazy_import('analyzer.memo').stats()
+    return result
+
+def search_articles(query, hours=None, limit=20, category=None):
+    return lazy_import('scraper.article_search').search(query, hours=hours, limit=limit, category=category)
+
+def generate_ai_report(data, indicators, model):
+    try:
+        generator = lazy_import('analyzer.report_generator')
+    except Exception as e:
+        print(f"report_generator 導入失敗: {e}")
         return {
             'content': f"# 備用報告\n\n由於模組導入問題，使用備用報告。\n\n綜合威脅機率：{indicators['overall_threat_probability']}%",
             'model_used': model,
@@ -62,20 +93,37 @@ except Exception as e:
             'source': 'fallback',
             'error': f'模組導入失敗: {e}'
         }
+    return generator.generate_ai_report(data, indicators, model)
 
-try:
-    from scraper.data_collector import collect_all_data_sync
-    print("data_collector 導入成功")
-except Exception as e:
-    print(f"data_collector 導入失敗: {e}")
-    # 創建一個備用函數
-    def collect_all_data_sync():
+def collect_all_data_sync():
+    try:
+        collector = lazy_import('scraper.data_collector')
+    except Exception as e:
+        print(f"data_collector 導入失敗: {e}")
         return {
             "military": {"status": "error", "error": f"模組導入失敗: {e}"},
             "news": {"status": "error", "error": f"模組導入失敗: {e}"},
             "economic": {"status": "error", "error": f"模組導入失敗: {e}"},
             "timestamp": datetime.now().isoformat()
         }
+    return collector.collect_all_data_sync()
+
+def get_collected_data():
+    try:
+        scheduler = lazy_import('scraper.scheduler')
+    except Exception as e:
+        print(f"scheduler 導入失敗: {e}")
+        # 無法讀取快照時直接即時收集
+        return collect_all_data_sync()
+    return scheduler.get_collected_data()
+
+def run_due_sources(force=False):
+    try:
+        scheduler = lazy_import('scraper.scheduler')
+    except Exception as e:
+        print(f"scheduler 導入失敗: {e}")
+        return {'status': 'error', 'error': f'模組導入失敗: {e}'}
+    return scheduler.run_due_sources(force=force)
 
 # 設定模板和靜態文件路徑
 template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
@@ -240,12 +288,13 @@ def google_callback():
     }
     
     try:
-        token_response = requests.post('https://oauth2.googleapis.com/token', data=token_data)
+        http_client = lazy_import('scraper.http_client')
+        token_response = http_client.post('https://oauth2.googleapis.com/token', data=token_data)
         token_json = token_response.json()
         access_token = token_json['access_token']
         
         # 獲取用戶信息
-        user_response = requests.get(
+        user_response = http_client.get(
             'https://www.googleapis.com/oauth2/v2/userinfo',
             headers={'Authorization': f'Bearer {access_token}'}
         )
@@ -305,13 +354,13 @@ def start_analysis():
         
         # 在 Serverless 環境中直接同步執行分析
         try:
-            print("開始收集資料...")
-            # 收集資料
-            data = collect_all_data_sync()
+            print("開始讀取資料快照...")
+            # 讀取背景排程收集的快照（快照不可用時才即時收集）
+            data = get_collected_data()
             print("資料收集完成，開始計算威脅指標...")
             
-            # 計算威脅指標
-            indicators = calculate_threat_indicators(data)
+            # 計算威脅指標（共用快照已附上發布時計算的指標時直接使用）
+            indicators = data.get('snapshot', {}).get('indicators') or calculate_threat_indicators(data)
             print("威脅指標計算完成，開始生成AI報告...")
             
             # 生成AI報告
@@ -354,10 +403,67 @@ def start_analysis():
     except Exception as e:
         return jsonify({'error': f'分析啟動失敗: {str(e)}'}), 500
 
+@app.route('/api/indicators')
+@login_required
+def live_indicators():
+    """由指標引擎的累計值讀取目前指標（不重新掃描文章）"""
+    try:
+        return jsonify(get_live_indicators())
+    except Exception as e:
+        print(f"指標讀取錯誤: {e}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
+
+@app.route('/api/search')
+@login_required
+def api_search():
+    """全文搜尋已收集的文章標題與描述（BM25 排序），預設只搜尋最近 48 小時"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '請提供搜尋字詞 q'}), 400
+    try:
+        hours = float(request.args.get('hours', 48)) or None
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({'error': 'hours 與 limit 必須是數字'}), 400
+    
+    started = time.perf_counter()
+    try:
+        results = search_articles(query, hours=hours, limit=limit, category=request.args.get('category') or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"文章搜尋錯誤: {e}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
+    return jsonify({
+        'query': query,
+        'count': len(results),
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@app.route('/cron/collect', methods=['GET', 'POST'])
+def cron_collect():
+    """由 Vercel Cron 或外部排程觸發，收集到期的來源並更新快照"""
+    cron_secret = os.environ.get('CRON_SECRET')
+    if not cron_secret:
+        # 未設定密鑰時停用端點，避免任何人觸發強制收集
+        return jsonify({'error': '排程端點未啟用'}), 404
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization.encode('utf-8'), f'Bearer {cron_secret}'.encode('utf-8')):
+        return jsonify({'error': '未授權'}), 401
+    
+    try:
+        return jsonify(run_due_sources(force=request.args.get('force') == '1'))
+    except Exception as e:
+        print(f"排程收集錯誤: {e}")
+        return jsonify({'status': 'error', 'error': str(e)}), 500
+
 # get_report 路由已移除，因為改為同步處理，直接在 start_analysis 中返回結果
 
 # Vercel 需要的應用實例
 application = app
 
+startup_profiler.report(title='vercel_app 啟動')
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file